@@ -1,25 +1,31 @@
 from typing import List, Dict, Tuple, Optional, Any
 from app.models.schemas import UserProfile, Recommendation
 from app.rules.deductions import analyze_tax_situation
+import asyncio
 import uuid
 import os
 import json
-from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.output_parsers import PydanticOutputParser, JsonOutputParser
+from langchain_core.runnables import RunnableLambda, RunnableParallel
 from app.utils.logger import setup_logger
+from app.utils.llm import build_chat_model, with_llm_retry
+from app.utils.single_flight import single_flight, profile_key
+from app.utils.prompts import register_prompt
 
 logger = setup_logger("agents")
 
 # Phase 11: Switch to OpenRouter (Grok)
 # We use the standard ChatOpenAI client but point it to OpenRouter
-llm = ChatOpenAI(
-    model="x-ai/grok-4.1-fast:free",
-    openai_api_key=os.getenv("OPENROUTER_API_KEY"),
-    base_url="https://openrouter.ai/api/v1", # Correct param for newer langchain versions
-    temperature=0.1
-)
+llm = build_chat_model("x-ai/grok-4.1-fast:free", temperature=0.1)
+
+# How a chat turn is split into LLM calls:
+#   "fused"      - one structured call returns the knowledge update and the decision
+#   "concurrent" - extractor and decider run in parallel; the decider sees the
+#                  knowledge base as it was before this message
+#   "sequential" - extractor, then decider (two round trips)
+ORCHESTRATOR_MODE = os.getenv("ORCHESTRATOR_MODE", "fused")
 
 class KnowledgeUpdate(BaseModel):
     """
@@ -36,84 +42,104 @@ class OrchestratorResponse(BaseModel):
     reply_to_user: str = Field(description="The message to show to the user.")
     next_action: str = Field(description="The next system action: 'continue_interview', 'trigger_analysis', 'show_results'")
 
+class FusedTurn(BaseModel):
+    """
+    Knowledge extraction and decision produced by a single LLM call.
+    """
+    extracted_info: Dict[str, Any] = Field(description="Key-value pairs of financial facts extracted from the user message. E.g., {'rent_amount': 150000, 'has_parents': True, 'interested_in_stocks': True}")
+    user_intent: str = Field(description="The intent of the user message. E.g., 'provide_info', 'ask_question', 'agree_to_analysis', 'upload_file'")
+    thought_process: str = Field(description="Internal reasoning about what to do next.")
+    reply_to_user: str = Field(description="The message to show to the user.")
+    next_action: str = Field(description="The next system action: 'continue_interview', 'trigger_analysis', 'show_results'")
+
+    def knowledge(self) -> KnowledgeUpdate:
+        return KnowledgeUpdate(extracted_info=self.extracted_info, user_intent=self.user_intent)
+
+    def decision(self) -> OrchestratorResponse:
+        return OrchestratorResponse(thought_process=self.thought_process, reply_to_user=self.reply_to_user, next_action=self.next_action)
+
 class OrchestratorAgent:
-    def __init__(self):
+    EXTRACTION_INSTRUCTION = (
+        "You are an expert financial analyst. Extract ALL relevant financial details, preferences, and personal context from the user's message into a structured JSON dictionary. "
+        "Also determine the user's intent. "
+        "Current Knowledge Base: {kb} "
+        "Handle Indian numbering (lakhs, cr) by converting to integers."
+    )
+    FUSED_INSTRUCTION = (
+        "\n\nEACH TURN, IN ONE ANSWER:\n"
+        "STEP 1 - EXTRACT: Put ALL relevant financial details, preferences, and personal context from the user's message into 'extracted_info' "
+        "(handle Indian numbering such as lakhs and cr by converting to integers) and the user's intent into 'user_intent' "
+        "('provide_info', 'ask_question', 'agree_to_analysis', 'upload_file').\n"
+        "STEP 2 - DECIDE: Treat the extracted facts as already added to the Knowledge Base and follow the interview script."
+    )
+    JSON_KEYS_INSTRUCTION = "\nRespond ONLY with a JSON object with the keys {keys}."
+
+    def __init__(self, mode: str = ORCHESTRATOR_MODE):
+        self.mode = mode
         self.extractor_llm = llm.with_structured_output(KnowledgeUpdate)
         self.decider_llm = llm.with_structured_output(OrchestratorResponse)
+        self.fused_llm = llm.with_structured_output(FusedTurn)
+        # JSON-mode decider used for streaming: JsonOutputParser yields partial
+        # dicts, so reply_to_user can be forwarded while it is being generated.
+        self.decider_stream_llm = llm.bind(response_format={"type": "json_object"})
 
-    def process_message(self, profile: UserProfile, user_message: str) -> Tuple[str, UserProfile]:
-        """
-        Main orchestration loop:
-        1. Extract Knowledge -> Update Knowledge Base
-        2. Decide Action -> (Interview / Analyze / Report)
-        3. Generate Response
-        """
-        logger.info(f"🤖 AGENT: Processing message from User: '{user_message}'")
-        logger.debug(f"Current Profile Status: {profile.status}")
-        
-        # Fallback for empty message
-        if not user_message:
-            logger.warning("Received empty user message.")
-            return "I didn't catch that. Could you please say it again?", profile
+        # Prompts and chains are built once and reused for every message
+        extraction_prompt = ChatPromptTemplate.from_messages([
+            ("system", self.EXTRACTION_INSTRUCTION),
+            ("user", "{message}")
+        ])
+        decision_prompt = ChatPromptTemplate.from_messages([
+            ("system", "{system_instruction}"),
+            ("user", "{message}")
+        ])
+        self.extraction_prompt = register_prompt("orchestrator_extraction", extraction_prompt, ["kb", "message"])
+        self.decision_prompt = register_prompt("orchestrator_decision", decision_prompt, ["system_instruction", "message"])
+        self.fused_prompt = register_prompt("orchestrator_fused", decision_prompt, ["system_instruction", "message"])
+        # A failed extraction must not block the reply, so it degrades to an empty update
+        self.extraction_chain = with_llm_retry(self.extraction_prompt | self.extractor_llm).with_fallbacks(
+            [RunnableLambda(self._extraction_failed)], exception_key="exception"
+        )
+        self.decision_chain = with_llm_retry(self.decision_prompt | self.decider_llm)
+        self.fused_chain = with_llm_retry(self.fused_prompt | self.fused_llm)
+        self.concurrent_chain = RunnableParallel(knowledge=self.extraction_chain, decision=self.decision_chain)
+        self.decision_stream_chain = self.decision_prompt | self.decider_stream_llm | JsonOutputParser()
+        self.fused_stream_chain = self.fused_prompt | self.decider_stream_llm | JsonOutputParser()
 
-        knowledge_update = KnowledgeUpdate(extracted_info={}, user_intent="unknown")
-
-        # --- Step 1: Dynamic Knowledge Extraction ---
-        # Skip extraction for system start signal
-        if user_message != "<START>":
-            extraction_prompt = ChatPromptTemplate.from_messages([
-                ("system", "You are an expert financial analyst. Extract ALL relevant financial details, preferences, and personal context from the user's message into a structured JSON dictionary. "
-                           "Also determine the user's intent. "
-                           "Current Knowledge Base: {kb} "
-                           "Handle Indian numbering (lakhs, cr) by converting to integers."),
-                ("user", "{message}")
-            ])
-            
-            try:
-                logger.debug("🧠 EXTRACTOR: Invoking LLM...")
-                kb_json = json.dumps(profile.financial_knowledge_base, default=str)
-                
-                knowledge_update: KnowledgeUpdate = (extraction_prompt | self.extractor_llm).invoke({
-                    "kb": kb_json,
-                    "message": user_message
-                })
-                logger.info(f"📥 EXTRACTED: {knowledge_update.extracted_info}")
-                logger.info(f"🎯 INTENT: {knowledge_update.user_intent}")
-                
-                # Update Knowledge Base
-                profile.financial_knowledge_base.update(knowledge_update.extracted_info)
-                
-                # Sync specific legacy fields for backward compatibility with Rule Engine
-                kb = profile.financial_knowledge_base
-                
-                # Rent
-                if "rent_amount" in kb: profile.rent_annually = int(kb["rent_amount"]) * 12
-                elif "monthly_rent" in kb: profile.rent_annually = int(kb["monthly_rent"]) * 12
-                elif "rent" in kb: profile.rent_annually = int(kb["rent"]) * 12
-                
-                # 80C
-                if "80c_investments" in kb: profile.investments_80c = int(kb["80c_investments"])
-                elif "investments_80c" in kb: profile.investments_80c = int(kb["investments_80c"])
-                
-                # Health
-                if "health_insurance" in kb: profile.health_premium = int(kb["health_insurance"])
-                elif "health_insurance_premium" in kb: profile.health_premium = int(kb["health_insurance_premium"])
-                elif "health_premium" in kb: profile.health_premium = int(kb["health_premium"])
-                
-            except Exception as e:
-                logger.error(f"❌ Extraction Error: {e}", exc_info=True)
-                # Continue execution even if extraction fails
+    def _extraction_failed(self, inputs: dict) -> KnowledgeUpdate:
+        logger.error(f"❌ Extraction Error: {inputs['exception']}")
+        return KnowledgeUpdate(extracted_info={}, user_intent="unknown")
 
-        # --- Step 2: Decision & Response ---
+    def _apply_knowledge(self, profile: UserProfile, knowledge_update: KnowledgeUpdate):
+        logger.info(f"📥 EXTRACTED: {knowledge_update.extracted_info}")
+        logger.info(f"🎯 INTENT: {knowledge_update.user_intent}")
         
-        # Heuristic: Check if we have core info
-        has_core_info = (profile.rent_annually is not None and 
-                         profile.investments_80c is not None and 
-                         profile.health_premium is not None)
+        # Update Knowledge Base
+        profile.financial_knowledge_base.update(knowledge_update.extracted_info)
         
+        # Sync specific legacy fields for backward compatibility with Rule Engine
+        kb = profile.financial_knowledge_base
+        
+        try:
+            # Rent
+            if "rent_amount" in kb: profile.rent_annually = int(kb["rent_amount"]) * 12
+            elif "monthly_rent" in kb: profile.rent_annually = int(kb["monthly_rent"]) * 12
+            elif "rent" in kb: profile.rent_annually = int(kb["rent"]) * 12
+        
+            # 80C
+            if "80c_investments" in kb: profile.investments_80c = int(kb["80c_investments"])
+            elif "investments_80c" in kb: profile.investments_80c = int(kb["investments_80c"])
+        
+            # Health
+            if "health_insurance" in kb: profile.health_premium = int(kb["health_insurance"])
+            elif "health_insurance_premium" in kb: profile.health_premium = int(kb["health_insurance_premium"])
+            elif "health_premium" in kb: profile.health_premium = int(kb["health_premium"])
+        except (TypeError, ValueError) as e:
+            # The extracted facts stay in the knowledge base even if a value is not numeric
+            logger.error(f"❌ Extraction Error: {e}", exc_info=True)
+
+    def _system_instruction(self, profile: UserProfile, knowledge_update: KnowledgeUpdate) -> str:
         # Define the persona and rules
-        # Define the persona and rules
-        system_instruction = (
+        return (
             "You are TaxNova, an intelligent Agentic CA. You are orchestrating a tax consultation. "
             f"Current Flow Status: {profile.status}. "
             f"User Intent: {knowledge_update.user_intent}. "
@@ -133,47 +159,30 @@ class OrchestratorAgent:
             "6. If user agrees to analysis, set next_action='trigger_analysis'.\n"
             "7. If status is 'report', explain the key observations briefly and ask if they want to deep dive.\n"
         )
+
+    def _apply_decision(self, profile: UserProfile, decision: OrchestratorResponse) -> str:
+        logger.info(f"🤔 THOUGHT: {decision.thought_process}")
+        logger.info(f"👉 ACTION: {decision.next_action}")
+        logger.info(f"🗣️ REPLY: {decision.reply_to_user}")
         
-        decision_prompt = ChatPromptTemplate.from_messages([
-            ("system", "{system_instruction}"),
-            ("user", "{message}")
-        ])
-        
-        try:
-            logger.debug("🧠 DECIDER: Invoking LLM...")
-            # If <START>, we pass a dummy message to the LLM to trigger the greeting
-            msg_to_llm = "Start the conversation." if user_message == "<START>" else user_message
+        # Handle Actions
+        if decision.next_action == "trigger_analysis":
+            profile.status = "analyzing"
+            logger.info("🚀 Triggering analysis mode based on agent decision.")
+            # Trigger analysis immediately
+            obs, recs = observation_agent.analyze(profile)
+            profile.observations = obs
+            profile.recommendations = recs
+            profile.status = "report" # Move to report mode
             
-            decision: OrchestratorResponse = (decision_prompt | self.decider_llm).invoke({
-                "system_instruction": system_instruction,
-                "message": msg_to_llm
-            })
-            logger.info(f"🤔 THOUGHT: {decision.thought_process}")
-            logger.info(f"👉 ACTION: {decision.next_action}")
-            logger.info(f"🗣️ REPLY: {decision.reply_to_user}")
-            
-            # Handle Actions
-            if decision.next_action == "trigger_analysis":
-                profile.status = "analyzing"
-                logger.info("🚀 Triggering analysis mode based on agent decision.")
-                # Trigger analysis immediately
-                obs, recs = observation_agent.analyze(profile)
-                profile.observations = obs
-                profile.recommendations = recs
-                profile.status = "report" # Move to report mode
-                
-                # Generate a summary message for the chat
-                response_text = "I've completed the analysis! 📊\n\n" \
-                                "I found some significant opportunities to save tax. " \
-                                "You can see the detailed observations on the dashboard. " \
-                                "Would you like me to explain the key findings?"
-            else:
-                response_text = decision.reply_to_user
-            
-        except Exception as e:
-            logger.error(f"❌ Decision Error: {e}", exc_info=True)
-            response_text = "I'm having trouble connecting to my brain right now. Could you please repeat that?"
+            # Generate a summary message for the chat
+            return "I've completed the analysis! 📊\n\n" \
+                   "I found some significant opportunities to save tax. " \
+                   "You can see the detailed observations on the dashboard. " \
+                   "Would you like me to explain the key findings?"
+        return decision.reply_to_user
 
+    def _record_turn(self, profile: UserProfile, user_message: str, response_text: str):
         # Update history
         # If it was <START>, we record it as an empty user string so frontend can hide it
         recorded_user_msg = "" if user_message == "<START>" else user_message
@@ -182,9 +191,150 @@ class OrchestratorAgent:
             "user": recorded_user_msg,
             "agent": response_text
         })
+
+    def _turn_inputs(self, profile: UserProfile, user_message: str, fused: bool = False, stream: bool = False) -> dict:
+        """Prompt variables shared by the extraction, decision and fused chains."""
+        if fused:
+            knowledge_update = KnowledgeUpdate(extracted_info={}, user_intent="determine it in STEP 1")
+        else:
+            knowledge_update = KnowledgeUpdate(extracted_info={}, user_intent="unknown")
+        system_instruction = self._system_instruction(profile, knowledge_update)
+        if fused:
+            system_instruction += self.FUSED_INSTRUCTION
+        if stream:
+            keys = list((FusedTurn if fused else OrchestratorResponse).model_fields)
+            system_instruction += self.JSON_KEYS_INSTRUCTION.format(keys=", ".join(f"'{k}'" for k in keys))
+        return {
+            "kb": json.dumps(profile.financial_knowledge_base, default=str),
+            "system_instruction": system_instruction,
+            # If <START>, we pass a dummy message to the LLM to trigger the greeting
+            "message": "Start the conversation." if user_message == "<START>" else user_message,
+        }
+
+    def _mode_for(self, user_message: str) -> str:
+        # Nothing to extract from the system start signal
+        return "decide_only" if user_message == "<START>" else self.mode
+
+    def _decide(self, profile: UserProfile, user_message: str) -> OrchestratorResponse:
+        mode = self._mode_for(user_message)
+        logger.debug(f"🧠 ORCHESTRATOR: Invoking LLM ({mode})...")
+
+        if mode == "fused":
+            turn: FusedTurn = self.fused_chain.invoke(self._turn_inputs(profile, user_message, fused=True))
+            self._apply_knowledge(profile, turn.knowledge())
+            return turn.decision()
+
+        if mode == "concurrent":
+            results = self.concurrent_chain.invoke(self._turn_inputs(profile, user_message))
+            self._apply_knowledge(profile, results["knowledge"])
+            return results["decision"]
+
+        if mode == "sequential":
+            knowledge_update = self.extraction_chain.invoke(self._turn_inputs(profile, user_message))
+            self._apply_knowledge(profile, knowledge_update)
+            inputs = self._turn_inputs(profile, user_message)
+            inputs["system_instruction"] = self._system_instruction(profile, knowledge_update)
+            return self.decision_chain.invoke(inputs)
+
+        return self.decision_chain.invoke(self._turn_inputs(profile, user_message))
+
+    def process_message(self, profile: UserProfile, user_message: str) -> Tuple[str, UserProfile]:
+        """
+        Main orchestration loop:
+        1. Extract Knowledge -> Update Knowledge Base
+        2. Decide Action -> (Interview / Analyze / Report)
+        3. Generate Response
+        Steps 1 and 2 share a single LLM call unless ORCHESTRATOR_MODE says otherwise.
+        """
+        logger.info(f"🤖 AGENT: Processing message from User: '{user_message}'")
+        logger.debug(f"Current Profile Status: {profile.status}")
+        
+        # Fallback for empty message
+        if not user_message:
+            logger.warning("Received empty user message.")
+            return "I didn't catch that. Could you please say it again?", profile
+
+        try:
+            decision = self._decide(profile, user_message)
+            response_text = self._apply_decision(profile, decision)
+            
+        except Exception as e:
+            logger.error(f"❌ Decision Error: {e}", exc_info=True)
+            response_text = "I'm having trouble connecting to my brain right now. Could you please repeat that?"
+
+        self._record_turn(profile, user_message, response_text)
         
         return response_text, profile
 
+    async def astream_message(self, profile: UserProfile, user_message: str):
+        """
+        Streaming variant of process_message. Yields (event, data) tuples:
+        `knowledge_extracted`, `agent_started`, `token` (reply text as it is
+        generated) and finally `result` with the agent reply. `profile` is
+        mutated, so callers should pass a copy and persist it only after the
+        `result` event.
+        """
+        logger.info(f"🤖 AGENT (stream): Processing message from User: '{user_message}'")
+
+        if not user_message:
+            yield "result", {"agent_reply": "I didn't catch that. Could you please say it again?"}
+            return
+
+        mode = self._mode_for(user_message)
+        knowledge_update = None
+        extraction = None
+
+        if mode == "sequential":
+            yield "agent_started", {"agent": "extractor"}
+            knowledge_update = await self.extraction_chain.ainvoke(self._turn_inputs(profile, user_message))
+            self._apply_knowledge(profile, knowledge_update)
+            yield "knowledge_extracted", knowledge_update.dict()
+        elif mode == "concurrent":
+            yield "agent_started", {"agent": "extractor"}
+            extraction = asyncio.create_task(self.extraction_chain.ainvoke(self._turn_inputs(profile, user_message)))
+
+        yield "agent_started", {"agent": "decider"}
+        try:
+            inputs = self._turn_inputs(profile, user_message, fused=mode == "fused", stream=True)
+            if knowledge_update is not None:
+                inputs["system_instruction"] = self._system_instruction(profile, knowledge_update) + \
+                    self.JSON_KEYS_INSTRUCTION.format(keys="'thought_process', 'reply_to_user', 'next_action'")
+
+            sent = ""
+            partial = {}
+            stream_chain = self.fused_stream_chain if mode == "fused" else self.decision_stream_chain
+            async for partial in stream_chain.astream(inputs):
+                reply = partial.get("reply_to_user") if isinstance(partial, dict) else None
+                if isinstance(reply, str) and len(reply) > len(sent):
+                    yield "token", {"text": reply[len(sent):]}
+                    sent = reply
+
+            if mode == "fused":
+                turn = FusedTurn(**partial)
+                knowledge_update, decision = turn.knowledge(), turn.decision()
+            else:
+                decision = OrchestratorResponse(**partial)
+            if extraction is not None:
+                knowledge_update = await extraction
+                extraction = None
+            if mode in ("fused", "concurrent"):
+                self._apply_knowledge(profile, knowledge_update)
+                yield "knowledge_extracted", knowledge_update.dict()
+
+            if decision.next_action == "trigger_analysis":
+                yield "agent_started", {"agent": "observation"}
+            response_text = await asyncio.to_thread(self._apply_decision, profile, decision)
+
+        except Exception as e:
+            logger.error(f"❌ Decision Error: {e}", exc_info=True)
+            response_text = "I'm having trouble connecting to my brain right now. Could you please repeat that?"
+        finally:
+            if extraction is not None:
+                extraction.cancel()
+
+        self._record_turn(profile, user_message, response_text)
+        yield "result", {"agent_reply": response_text}
+
 class TaxObservation(BaseModel):
     title: str
     description: str
@@ -205,24 +355,26 @@ class AnalysisOutput(BaseModel):
 class ObservationAgent:
     def __init__(self):
         self.analyzer_llm = llm.with_structured_output(AnalysisOutput)
-
-    def analyze(self, profile: UserProfile) -> Tuple[List[Dict], List[Recommendation]]:
-        # Hybrid approach: Use rule engine for hard math, LLM for insights
-        
-        math_analysis = analyze_tax_situation(profile)
-        
-        prompt = ChatPromptTemplate.from_messages([
+        prompt = register_prompt("observation", ChatPromptTemplate.from_messages([
             ("system", "You are an expert Tax Consultant. Analyze the user's financial profile and the calculated tax metrics. "
                        "Generate insightful observations and actionable recommendations to save tax. "
                        "Focus on Section 80C, 80D, HRA, and New vs Old regime. "
                        "Use the provided math analysis as the ground truth for numbers."),
             ("user", "Profile: {profile}\nMath Analysis: {math}\n\nGenerate observations and recommendations.")
-        ])
+        ]), ["profile", "math"])
+        self.chain = with_llm_retry(prompt | self.analyzer_llm)
+
+    def analyze(self, profile: UserProfile) -> Tuple[List[Dict], List[Recommendation]]:
+        # Concurrent analyses of the same profile state share one LLM call
+        return single_flight.do(profile_key("observation", profile), self._analyze, profile)
+
+    def _analyze(self, profile: UserProfile) -> Tuple[List[Dict], List[Recommendation]]:
+        # Hybrid approach: Use rule engine for hard math, LLM for insights
         
-        chain = prompt | self.analyzer_llm
+        math_analysis = analyze_tax_situation(profile)
         
         try:
-            result: AnalysisOutput = chain.invoke({
+            result: AnalysisOutput = self.chain.invoke({
                 "profile": profile.dict(),
                 "math": math_analysis
             })
@@ -1,9 +1,10 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
 from typing import List
 from app.models.schemas import UserProfile
+from app.utils.llm import build_chat_model, with_llm_retry
+from app.utils.prompts import register_prompt
 import os
 
 # Define the output schema for a loophole idea
@@ -20,10 +21,11 @@ class LoopholeResponse(BaseModel):
 
 # Initialize the LLM
 # User requested direct OpenAI usage for better schema adherence
-llm = ChatOpenAI(
-    model="gpt-4o",
-    openai_api_key=os.getenv("OPENAI_API_KEY"),
-    temperature=0.7
+llm = build_chat_model(
+    "gpt-4o",
+    temperature=0.7,
+    provider="openai",
+    cache=False  # Creative output, every call should produce fresh ideas
 )
 
 # System Prompt with the "Loophole" knowledge
@@ -63,12 +65,12 @@ Return a JSON object with a list of strategies.
 # Use structured output for strict schema adherence
 structured_llm = llm.with_structured_output(LoopholeResponse)
 
-prompt = ChatPromptTemplate.from_messages([
+prompt = register_prompt("loopholes", ChatPromptTemplate.from_messages([
     ("system", SYSTEM_PROMPT),
     ("user", "Analyze my profile and give me the loopholes.")
-])
+]), ["user_profile"])
 
-chain = prompt | structured_llm
+chain = with_llm_retry(prompt | structured_llm)
 
 def generate_loopholes(profile: UserProfile) -> List[dict]:
     try:
@@ -1,16 +1,13 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from app.models.schemas import UserProfile
+from app.utils.llm import build_chat_model, with_llm_retry
+from app.utils.prompts import register_prompt
 import os
 import json
 
 # Initialize LLM (GPT-4o for high quality formatting)
-llm = ChatOpenAI(
-    model="gpt-4o",
-    openai_api_key=os.getenv("OPENAI_API_KEY"),
-    temperature=0.3
-)
+llm = build_chat_model("gpt-4o", temperature=0.3, provider="openai")
 
 REPORT_SYSTEM_PROMPT = """You are the "Reporter Agent" for TaxNova. 
 Your goal is to generate a comprehensive, professional, and visually appealing HTML report for the user's tax consultation.
@@ -41,12 +38,12 @@ Return ONLY valid HTML code.
 - Make it look like a premium consulting report.
 """
 
-prompt = ChatPromptTemplate.from_messages([
+prompt = register_prompt("report", ChatPromptTemplate.from_messages([
     ("system", REPORT_SYSTEM_PROMPT),
     ("user", "Generate the tax report for this profile: {profile_json}")
-])
+]), ["profile_json"])
 
-chain = prompt | llm | StrOutputParser()
+chain = with_llm_retry(prompt | llm | StrOutputParser())
 
 def generate_report_html(profile: UserProfile) -> str:
     try:
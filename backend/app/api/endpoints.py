@@ -9,8 +9,9 @@ from app.agents.langgraph_pipeline import interview_agent, observation_agent
 from app.rules.deductions import analyze_tax_situation
 from app.utils.pdf_gen import generate_pdf_plan
 from pydantic import BaseModel
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from app.utils.logger import setup_logger
+from app.utils.single_flight import single_flight, profile_key
 
 logger = setup_logger("endpoints")
 
@@ -148,12 +149,7 @@ async def get_profile(job_id: str):
         raise HTTPException(status_code=404, detail="Profile not found")
     return profiles_db[job_id]
 
-@router.post("/chat")
-async def chat_with_agent(
-    job_id: str = Form(...),
-    user_message: str = Form(""),
-    file: Optional[UploadFile] = File(None)
-):
+def _get_or_load_profile(job_id: str) -> UserProfile:
     # Load if not in memory
     if job_id not in profiles_db:
         loaded = load_profile(job_id)
@@ -161,37 +157,48 @@ async def chat_with_agent(
             profiles_db[job_id] = loaded
         else:
             raise HTTPException(status_code=404, detail="Job ID not found")
+    return profiles_db[job_id]
+
+async def _attach_uploaded_file(profile: UserProfile, file: UploadFile, job_id: str, user_message: str) -> str:
+    """Parses a file uploaded in chat, syncs it to the KB and returns the augmented message."""
+    logger.info(f"Processing file upload in chat for job_id: {job_id}")
+    content = await file.read()
+    # Mock parsing for now, or use the same OCR logic
+    # In a real app, we'd detect file type. Assuming PDF/Text.
+    parsed_text = f"[User uploaded file: {file.filename}]" 
+    try:
+        # Reuse mock OCR or simple text extraction
+        parsed_data = await mock_ocr_parse(content)
+        parsed_text += f"\nExtracted Data: {json.dumps(parsed_data.dict(), indent=2)}"
+        
+        # Sync extracted data to KB
+        if parsed_data:
+            profile.financial_knowledge_base.update({
+                "gross_salary": parsed_data.gross_salary,
+                "basic_salary": parsed_data.basic_salary,
+                "hra_received": parsed_data.hra_received,
+                "pf_deducted": parsed_data.pf,
+                "allowances": parsed_data.allowances
+            })
             
-    profile = profiles_db[job_id]
+    except Exception as e:
+        logger.error(f"File parsing failed: {e}")
+        parsed_text += f"\n(Parsing failed: {str(e)})"
+        
+    # Append file context to user message
+    return f"{user_message}\n\n{parsed_text}".strip()
+
+@router.post("/chat")
+async def chat_with_agent(
+    job_id: str = Form(...),
+    user_message: str = Form(""),
+    file: Optional[UploadFile] = File(None)
+):
+    profile = _get_or_load_profile(job_id)
     
     # Handle File Upload in Chat
     if file:
-        logger.info(f"Processing file upload in chat for job_id: {job_id}")
-        content = await file.read()
-        # Mock parsing for now, or use the same OCR logic
-        # In a real app, we'd detect file type. Assuming PDF/Text.
-        parsed_text = f"[User uploaded file: {file.filename}]" 
-        try:
-            # Reuse mock OCR or simple text extraction
-            parsed_data = await mock_ocr_parse(content)
-            parsed_text += f"\nExtracted Data: {json.dumps(parsed_data.dict(), indent=2)}"
-            
-            # Sync extracted data to KB
-            if parsed_data:
-                profile.financial_knowledge_base.update({
-                    "gross_salary": parsed_data.gross_salary,
-                    "basic_salary": parsed_data.basic_salary,
-                    "hra_received": parsed_data.hra_received,
-                    "pf_deducted": parsed_data.pf,
-                    "allowances": parsed_data.allowances
-                })
-                
-        except Exception as e:
-            logger.error(f"File parsing failed: {e}")
-            parsed_text += f"\n(Parsing failed: {str(e)})"
-            
-        # Append file context to user message
-        user_message = f"{user_message}\n\n{parsed_text}".strip()
+        user_message = await _attach_uploaded_file(profile, file, job_id, user_message)
 
     logger.info(f"Processing message for job_id: {job_id}. Message length: {len(user_message)}")
     try:
@@ -210,6 +217,43 @@ async def chat_with_agent(
         "profile": updated_profile
     }
 
+@router.post("/chat/stream")
+async def chat_with_agent_stream(
+    job_id: str = Form(...),
+    user_message: str = Form(""),
+    file: Optional[UploadFile] = File(None)
+):
+    """
+    Streaming variant of /chat over Server-Sent Events. Emits agent progress
+    (`agent_started`, `knowledge_extracted`), reply `token`s, and a final
+    `result` with the same payload as /chat. The agent works on a copy of the
+    profile, which replaces the stored one only once the turn has completed.
+    """
+    profile = _get_or_load_profile(job_id).copy(deep=True)
+    
+    # Read the upload now; the request body is closed once streaming starts
+    if file:
+        user_message = await _attach_uploaded_file(profile, file, job_id, user_message)
+
+    async def event_stream():
+        try:
+            async for event, data in interview_agent.astream_message(profile, user_message):
+                if event == "result":
+                    # Persist only the completed turn
+                    profiles_db[job_id] = profile
+                    save_profile(profile)
+                    data = {**data, "profile": json.loads(profile.json())}
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        except Exception as e:
+            logger.error(f"Agent streaming failed: {e}", exc_info=True)
+            yield f"event: error\ndata: {json.dumps({'detail': f'Agent Error: {str(e)}'})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/observations/{job_id}")
 async def get_observations(job_id: str):
     if job_id not in profiles_db:
@@ -338,11 +382,14 @@ async def download_plan(job_id: str):
         
     profile = profiles_db[job_id]
     
-    # 1. Generate HTML Report via Agent
-    html_content = generate_report_html(profile)
-    
-    # 2. Convert to PDF
-    pdf_content = generate_pdf_plan(html_content)
+    def build_plan_pdf(profile: UserProfile) -> bytes:
+        # 1. Generate HTML Report via Agent
+        html_content = generate_report_html(profile)
+        # 2. Convert to PDF
+        return generate_pdf_plan(html_content)
+
+    # Double-clicks and parallel tabs share one report pipeline
+    pdf_content = await single_flight.ado(profile_key("report", profile), build_plan_pdf, profile)
     
     return Response(
         content=pdf_content,
@@ -385,6 +432,18 @@ async def get_agent_status(job_id: str):
     
     return status
 
+@router.get("/metrics")
+async def get_metrics():
+    from app.utils.llm_cache import llm_cache
+    from app.utils.llm import breakers
+    from app.utils.prompts import prompt_stats
+    return {
+        "llm_cache": llm_cache.stats(),
+        "llm_circuit_breakers": {name: b.stats() for name, b in breakers.items()},
+        "single_flight": single_flight.stats(),
+        "prompt_sizes": prompt_stats.stats(),
+    }
+
 @router.post("/analyze/loopholes/{job_id}")
 async def analyze_loopholes(job_id: str):
     from app.agents.loophole_agent import generate_loopholes, LoopholeIdea
@@ -396,7 +455,7 @@ async def analyze_loopholes(job_id: str):
     
     # Generate loopholes
     try:
-        strategies_data = generate_loopholes(profile)
+        strategies_data = await single_flight.ado(profile_key("loopholes", profile), generate_loopholes, profile)
         # Convert dicts to Pydantic models
         strategies = [LoopholeStrategy(**s) for s in strategies_data]
         
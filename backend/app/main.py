@@ -1,11 +1,18 @@
+from dotenv import load_dotenv
+
+# Before the app imports: their settings are read from the environment at import time
+load_dotenv()
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
 import os
 import time
 from app.utils.logger import setup_logger
+from langchain_core.globals import set_llm_cache
+from app.utils.llm_cache import llm_cache
 
-load_dotenv()
+# Cache deterministic LLM calls (model + prompt fingerprint) across requests
+set_llm_cache(llm_cache)
 
 logger = setup_logger("main")
 
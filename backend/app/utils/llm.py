@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from typing import Any
+
+import openai
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+from app.utils.logger import setup_logger
+
+logger = setup_logger("llm")
+
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Per-attempt timeout and retry policy for every chain
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "45"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# Rate limits, 5xx and network trouble are worth another attempt; bad
+# requests and auth errors are not.
+TRANSIENT_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider that is currently failing."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures and fails
+    fast for `reset_timeout` seconds, then lets one trial call through.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = LLM_BREAKER_THRESHOLD, reset_timeout: float = LLM_BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"⚡ Circuit breaker '{self.name}' opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Ends a call that recorded no outcome (cancelled, or failed with an
+        unexpected error). A half-open trial counts as a failure so the slot
+        is freed; otherwise nothing changes.
+        """
+        with self._lock:
+            trial = self._trial_in_flight
+        if trial:
+            self.record_failure()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+class CircuitBreakerCallback(BaseCallbackHandler):
+    """Hooks a CircuitBreaker into a chat model's start/end/error events."""
+
+    raise_error = True
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, **kwargs: Any) -> None:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"LLM provider '{self.breaker.name}' is degraded, failing fast")
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        self.breaker.record_success()
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        if isinstance(error, TRANSIENT_ERRORS):
+            self.breaker.record_failure()
+        elif isinstance(error, openai.APIStatusError):
+            # The provider answered; the request itself was bad (400, 401, ...)
+            self.breaker.record_success()
+        else:
+            # Cancelled or failed locally: only free a half-open trial slot
+            self.breaker.release()
+
+
+breakers = {
+    "openrouter": CircuitBreaker("openrouter"),
+    "openai": CircuitBreaker("openai"),
+}
+
+
+def build_chat_model(model: str, temperature: float, provider: str = "openrouter", **kwargs: Any) -> ChatOpenAI:
+    """
+    Creates a ChatOpenAI client for OpenRouter or OpenAI with a bounded
+    per-attempt timeout and the provider's circuit breaker attached.
+    Retries are left to with_llm_retry() so there is a single retry policy.
+    """
+    if provider == "openrouter":
+        api_key = os.getenv("OPENROUTER_API_KEY")
+        base_url = OPENROUTER_BASE_URL
+    else:
+        api_key = os.getenv("OPENAI_API_KEY")
+        base_url = OPENAI_BASE_URL
+
+    return ChatOpenAI(
+        model=model,
+        openai_api_key=api_key,
+        base_url=base_url,
+        temperature=temperature,
+        timeout=LLM_TIMEOUT,
+        max_retries=0,
+        callbacks=[CircuitBreakerCallback(breakers[provider])],
+        **kwargs,
+    )
+
+
+def with_llm_retry(chain: Runnable) -> Runnable:
+    """Retries transient provider errors with jittered exponential backoff."""
+    return chain.with_retry(
+        retry_if_exception_type=TRANSIENT_ERRORS,
+        wait_exponential_jitter=True,
+        stop_after_attempt=LLM_MAX_ATTEMPTS,
+    )
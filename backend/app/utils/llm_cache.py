@@ -0,0 +1,139 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+from app.utils.logger import setup_logger
+
+logger = setup_logger("llm_cache")
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))
+# Path of the SQLite file for the on-disk tier. Empty disables it.
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+
+_WHITESPACE = re.compile(r"\s+")
+# Only plain generations are ever written, so only those are revived.
+_ALLOWED_OBJECTS = [Generation, ChatGeneration, AIMessage]
+
+
+def make_cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Fingerprints a prompt for a given model configuration. LangChain's
+    llm_string already covers the model name, temperature and bound tools.
+    """
+    normalized = _WHITESPACE.sub(" ", prompt).strip()
+    return hashlib.sha256(f"{llm_string}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+class TwoTierLLMCache(BaseCache):
+    """
+    LangChain cache with a bounded in-memory LRU in front of an optional
+    SQLite table whose entries expire after `ttl` seconds.
+
+    Installed globally with set_llm_cache(); models that must not be cached
+    (e.g. the temperature 0.7 loophole generator) opt out with cache=False.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_SIZE, db_path: str = LLM_CACHE_DB, ttl: float = LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _remember(self, key: str, value: RETURN_VAL_TYPE):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = make_cache_key(prompt, llm_string)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        if self.db_path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+            if row and time.time() - row[1] <= self.ttl:
+                try:
+                    with warnings.catch_warnings():
+                        warnings.simplefilter("ignore")
+                        generations = loads(row[0], allowed_objects=_ALLOWED_OBJECTS)
+                except Exception as e:
+                    logger.warning(f"Discarding unreadable cache entry: {e}")
+                else:
+                    self._remember(key, generations)
+                    with self._lock:
+                        self.hits += 1
+                        self.disk_hits += 1
+                    return generations
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = make_cache_key(prompt, llm_string)
+        self._remember(key, return_val)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, response, created_at) VALUES (?, ?, ?)",
+                        (key, dumps(return_val), time.time()),
+                    )
+            except Exception as e:
+                logger.warning(f"Could not persist cache entry: {e}")
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_enabled": bool(self.db_path),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+llm_cache = TwoTierLLMCache()
@@ -1,15 +1,31 @@
 import io
 import json
 from pypdf import PdfReader
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from app.models.schemas import ParsedPayroll
 import os
 from app.utils.logger import setup_logger
+from app.utils.llm import build_chat_model, with_llm_retry
+from app.utils.prompts import register_prompt
 
 logger = setup_logger("ocr")
 
+llm = build_chat_model("x-ai/grok-4.1-fast:free", temperature=0)
+
+parser = PydanticOutputParser(pydantic_object=ParsedPayroll)
+
+prompt = register_prompt("payroll_extraction", ChatPromptTemplate.from_messages([
+    ("system", "You are an expert data extraction AI. Extract payroll details from the provided text. "
+               "Return the output strictly in JSON format matching the schema. "
+               "Handle Indian number formats (lakhs) by converting to integers. "
+               "If a field is missing, make a reasonable estimate or set to 0.\n"
+               "{format_instructions}"),
+    ("user", "Payroll Document Text:\n{text}")
+]), ["format_instructions", "text"])
+
+chain = with_llm_retry(prompt | llm | parser)
+
 async def mock_ocr_parse(file_content: bytes) -> ParsedPayroll:
     """
     Parses PDF content using LLM (Grok) via OpenRouter.
@@ -33,26 +49,7 @@ async def mock_ocr_parse(file_content: bytes) -> ParsedPayroll:
             # Fallback or error? For now, let's try to proceed or return default
             
         # 2. LLM Extraction
-        llm = ChatOpenAI(
-            model="x-ai/grok-4.1-fast:free",
-            openai_api_key=os.getenv("OPENROUTER_API_KEY"),
-            base_url="https://openrouter.ai/api/v1",
-            temperature=0
-        )
-        
-        parser = PydanticOutputParser(pydantic_object=ParsedPayroll)
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are an expert data extraction AI. Extract payroll details from the provided text. "
-                       "Return the output strictly in JSON format matching the schema. "
-                       "Handle Indian number formats (lakhs) by converting to integers. "
-                       "If a field is missing, make a reasonable estimate or set to 0.\n"
-                       "{format_instructions}"),
-            ("user", "Payroll Document Text:\n{text}")
-        ])
-        
         logger.info("Invoking LLM for parsing...")
-        chain = prompt | llm | parser
         parsed_data = chain.invoke({
             "text": text,
             "format_instructions": parser.get_format_instructions()
@@ -0,0 +1,71 @@
+import threading
+from bisect import bisect_left
+from typing import Iterable
+
+from langchain_core.prompt_values import PromptValue
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableLambda
+
+# Upper bounds (in estimated tokens) of the prompt size histogram buckets
+PROMPT_TOKEN_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), no tokenizer needed."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+class PromptSizeStats:
+    """Histogram of rendered prompt sizes (estimated tokens) per prompt name."""
+
+    def __init__(self, buckets: tuple = PROMPT_TOKEN_BUCKETS):
+        self.buckets = buckets
+        self._prompts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, tokens: int):
+        with self._lock:
+            entry = self._prompts.setdefault(name, {"count": 0, "total": 0, "max": 0, "histogram": [0] * (len(self.buckets) + 1)})
+            entry["count"] += 1
+            entry["total"] += tokens
+            entry["max"] = max(entry["max"], tokens)
+            entry["histogram"][bisect_left(self.buckets, tokens)] += 1
+
+    def stats(self) -> dict:
+        labels = [f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"]
+        with self._lock:
+            return {
+                name: {
+                    "renders": entry["count"],
+                    "avg_tokens": round(entry["total"] / entry["count"]),
+                    "max_tokens": entry["max"],
+                    "histogram": {label: n for label, n in zip(labels, entry["histogram"]) if n},
+                }
+                for name, entry in self._prompts.items()
+            }
+
+
+prompt_stats = PromptSizeStats()
+prompt_registry = {}
+
+
+def register_prompt(name: str, template: ChatPromptTemplate, variables: Iterable[str]) -> Runnable:
+    """
+    Registers a prompt template built once at import time. Fails at startup
+    if the template's placeholders differ from the variables the agent fills
+    in, and returns the template wrapped so every rendered prompt's estimated
+    token count lands in the size histogram.
+    """
+    expected = set(variables)
+    actual = set(template.input_variables) | set(template.partial_variables)
+    if actual != expected:
+        raise ValueError(
+            f"Prompt '{name}' expects {sorted(actual)}, caller provides {sorted(expected)}"
+        )
+    prompt_registry[name] = template
+
+    def record(prompt_value: PromptValue) -> PromptValue:
+        prompt_stats.record(name, estimate_tokens(prompt_value.to_string()))
+        return prompt_value
+
+    return template | RunnableLambda(record, name=f"{name}_size")
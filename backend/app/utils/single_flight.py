@@ -0,0 +1,84 @@
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger("single_flight")
+
+
+def input_hash(*parts: Any) -> str:
+    """Stable hash of the inputs that determine an operation's result."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def profile_key(operation: str, profile) -> tuple:
+    """(operation, job_id, hash of the profile state the operation reads)."""
+    return (operation, profile.job_id, input_hash(profile.json()))
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight work: while `fn` runs for `key`, other
+    callers with the same key wait for its result instead of starting the
+    same LLM / PDF pipeline again. Nothing is kept once the call finishes.
+
+    The agents are synchronous, so the shared result is a thread-safe
+    concurrent Future: `do()` blocks (worker threads, sync code paths) and
+    `ado()` awaits it, running the leader's call in a worker thread so the
+    event loop stays free.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key: Hashable):
+        """Returns (future, is_leader)."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                logger.info(f"🔗 Coalesced duplicate request {key[:2]}")
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.calls += 1
+            return future, True
+
+    def _run(self, key: Hashable, future: Future, fn: Callable, *args: Any, **kwargs: Any):
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def do(self, key: Hashable, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        future, leader = self._join(key)
+        if leader:
+            return self._run(key, future, fn, *args, **kwargs)
+        return future.result()
+
+    async def ado(self, key: Hashable, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        future, leader = self._join(key)
+        if leader:
+            return await asyncio.to_thread(self._run, key, future, fn, *args, **kwargs)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "calls": self.calls, "coalesced": self.coalesced}
+
+
+single_flight = SingleFlight()
@@ -1,27 +1,23 @@
 import json
 from backend_sme.utils.openrouter_llm import call_llm
+from backend_sme.utils.conversation_memory import format_history
+from backend_sme.utils.single_flight import single_flight, input_hash
+from backend_sme.utils.prompt_registry import prompt_registry
 from backend_sme.models.schemas import DeductionResponse
-import os
 
-def run_deduction_agent(file_content: str, chat_history: list = None) -> DeductionResponse:
-    # Load prompt template
-    prompt_path = os.path.join(os.path.dirname(__file__), "../prompts/deduction_prompt.txt")
-    with open(prompt_path, "r") as f:
-        template = f.read()
-
-    # Format chat history for context
-    history_text = ""
-    if chat_history and len(chat_history) > 1:
-        for msg in chat_history[:-1]:  # Exclude current message
-            role = "User" if msg["role"] == "user" else "Assistant"
-            history_text += f"{role}: {msg['content']}\n"
+def build_deduction_prompt(file_content: str, chat_history: list = None, memory_context: str = None) -> str:
+    # Format chat history for context, unless the caller already built it
+    if memory_context is not None:
+        history_text = memory_context
+    else:
+        history_text = ""
+        if chat_history and len(chat_history) > 1:
+            history_text = format_history(chat_history[:-1])  # Exclude current message
 
     # Inject data
-    prompt = template.replace("{{parsed_data}}", file_content).replace("{{chat_history}}", history_text if history_text else "No previous conversation.")
-
-    # Call LLM
-    response_str = call_llm(prompt)
+    return prompt_registry.render("deduction_prompt", parsed_data=file_content, chat_history=history_text if history_text else "No previous conversation.")
 
+def parse_deduction_response(response_str: str) -> DeductionResponse:
     # Parse JSON response
     # Basic cleanup to handle potential markdown code blocks from LLM
     cleaned_response = response_str.replace("```json", "").replace("```", "").strip()
@@ -34,3 +30,10 @@ def run_deduction_agent(file_content: str, chat_history: list = None) -> Deducti
         print(f"Failed to parse LLM response: {response_str}")
         return DeductionResponse(deductions=[], estimated_tax_saved=0)
 
+async def run_deduction_agent(file_content: str, chat_history: list = None, memory_context: str = None) -> DeductionResponse:
+    prompt = build_deduction_prompt(file_content, chat_history, memory_context)
+
+    # Call LLM; identical requests already in flight share one call
+    response_str = await single_flight.do(("deduction_agent", input_hash(prompt)), lambda: call_llm(prompt))
+
+    return parse_deduction_response(response_str)
@@ -0,0 +1,156 @@
+import math
+import os
+import re
+from collections import Counter
+from pydantic import BaseModel
+
+# Predictions at or above this confidence skip the orchestrator LLM call
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8"))
+
+INTENTS = ("DEDUCTION_ANALYSIS", "GST_MATCHING", "GENERAL_QUERY")
+
+# Column names that identify a document type from its CSV header row
+HEADER_SIGNATURES = {
+    "GST_MATCHING": {
+        "gstin", "gstin of supplier", "trade/legal name", "invoice number", "invoice no", "invoice date",
+        "invoice value", "taxable value", "taxable amount", "igst", "cgst", "sgst", "cess",
+        "vendor name", "supplier name", "place of supply",
+    },
+    "DEDUCTION_ANALYSIS": {
+        "date", "txn date", "value date", "description", "narration", "particulars", "reference",
+        "ref no", "cheque no", "debit", "credit", "withdrawal", "deposit", "balance", "amount",
+    },
+}
+MIN_HEADER_MATCHES = 3
+
+# Seed vocabulary per intent; IDF weighting down-weights words shared by intents
+SEED_TERMS = {
+    "DEDUCTION_ANALYSIS": (
+        "deduction deductions deductible expense expenses expenditure tax save saving savings "
+        "bank statement statements spending spend spent claim section 80c 37 business "
+        "transactions debit card ledger write off depreciation"
+    ),
+    "GST_MATCHING": (
+        "gst itc input tax credit match matching reconcile reconciliation gstr gstr2b gstr2a 2b 2a "
+        "gstr-2b gstr-2a invoice invoices purchase register supplier suppliers gstin vendor mismatch"
+    ),
+    "GENERAL_QUERY": (
+        "hello hi hey thanks thank what is how does explain help who are you deadline due date "
+        "regime meaning difference"
+    ),
+}
+# Number of matched terms needed before keyword confidence can reach 1.0
+KEYWORD_SATURATION = 2
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9\-/]*")
+
+
+class IntentPrediction(BaseModel):
+    intent: str
+    confidence: float
+    source: str  # "headers", "keywords" or "none"
+
+
+def _tokenize(text: str) -> list:
+    return _TOKEN.findall(text.lower())
+
+
+def _build_weights() -> dict:
+    vocab = {intent: Counter(_tokenize(terms)) for intent, terms in SEED_TERMS.items()}
+    document_frequency = Counter(term for counts in vocab.values() for term in counts)
+    n = len(vocab)
+    return {
+        intent: {term: tf * (math.log(n / document_frequency[term]) + 1) for term, tf in counts.items()}
+        for intent, counts in vocab.items()
+    }
+
+
+TERM_WEIGHTS = _build_weights()
+
+
+def _header_rows(file_preview: str) -> list:
+    """First non-empty line of every '--- File: name ---' block."""
+    headers = []
+    for block in re.split(r"--- File: .*? ---", file_preview)[1:]:
+        for line in block.splitlines():
+            if line.strip():
+                headers.append(line)
+                break
+    return headers
+
+
+def classify_headers(file_preview: str):
+    """Returns (intent, number of files) voted by header signatures, or (None, 0)."""
+    votes = Counter()
+    for header in _header_rows(file_preview):
+        columns = {col.strip().strip('"').lower() for col in header.split(",")}
+        matches = {intent: len(columns & signature) for intent, signature in HEADER_SIGNATURES.items()}
+        intent, count = max(matches.items(), key=lambda item: item[1])
+        if count >= MIN_HEADER_MATCHES:
+            votes[intent] += 1
+    if not votes:
+        return None, 0
+    ranked = votes.most_common()
+    if len(ranked) > 1 and ranked[0][1] == ranked[1][1]:
+        return None, 0  # e.g. one bank statement + one GSTR file
+    return ranked[0]
+
+
+def classify_keywords(message: str) -> IntentPrediction:
+    tokens = _tokenize(message)
+    scores = {}
+    hits = {}
+    for intent, weights in TERM_WEIGHTS.items():
+        matched = [t for t in tokens if t in weights]
+        scores[intent] = sum(weights[t] for t in matched)
+        hits[intent] = len(set(matched))
+
+    total = sum(scores.values())
+    if not total:
+        return IntentPrediction(intent="GENERAL_QUERY", confidence=0.0, source="none")
+    best = max(scores, key=scores.get)
+    confidence = scores[best] / total * min(1.0, hits[best] / KEYWORD_SATURATION)
+    return IntentPrediction(intent=best, confidence=round(confidence, 3), source="keywords")
+
+
+def classify_intent(user_message: str, file_content_preview: str) -> IntentPrediction:
+    """
+    Local intent classifier: recognizes uploaded documents from their CSV
+    header row (GSTR-2B / purchase register vs bank statement), otherwise
+    scores the user message against weighted seed keywords. Low confidence
+    means the orchestrator LLM should decide.
+    """
+    keywords = classify_keywords(user_message)
+    header_intent, _ = classify_headers(file_content_preview or "")
+
+    if header_intent:
+        if keywords.confidence >= INTENT_CONFIDENCE_THRESHOLD and keywords.intent not in (header_intent, "GENERAL_QUERY"):
+            # The message asks for something else than the files suggest
+            return IntentPrediction(intent=header_intent, confidence=0.5, source="headers")
+        return IntentPrediction(intent=header_intent, confidence=0.95, source="headers")
+    return keywords
+
+
+class IntentRoutingStats:
+    """Counts how often the local classifier answered vs. the LLM fallback."""
+
+    def __init__(self):
+        self.local = Counter()
+        self.llm = Counter()
+
+    def record(self, path: str, intent: str):
+        (self.local if path == "local" else self.llm)[intent] += 1
+
+    def stats(self) -> dict:
+        local = sum(self.local.values())
+        llm = sum(self.llm.values())
+        return {
+            "local": local,
+            "llm": llm,
+            "local_rate": round(local / (local + llm), 4) if local + llm else 0.0,
+            "local_by_intent": dict(self.local),
+            "llm_by_intent": dict(self.llm),
+        }
+
+
+routing_stats = IntentRoutingStats()
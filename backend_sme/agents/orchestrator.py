@@ -1,42 +1,64 @@
 import json
-import os
 from backend_sme.utils.openrouter_llm import call_llm
+from backend_sme.utils.resilience import LLMError
+from backend_sme.utils.conversation_memory import format_history
+from backend_sme.utils.prompt_registry import prompt_registry
+from backend_sme.agents.intent_classifier import classify_intent, routing_stats, INTENT_CONFIDENCE_THRESHOLD
 from pydantic import BaseModel
+from typing import Optional
 
 class OrchestratorResponse(BaseModel):
     intent: str
     reason: str
+    confidence: Optional[float] = None
 
-def run_orchestrator_agent(user_message: str, file_content_preview: str, chat_history: list = None) -> OrchestratorResponse:
-    # Load prompt template
-    prompt_path = os.path.join(os.path.dirname(__file__), "../prompts/orchestrator_prompt.txt")
-    with open(prompt_path, "r") as f:
-        template = f.read()
+async def run_orchestrator_agent(user_message: str, file_content_preview: str, chat_history: list = None, memory_context: str = None) -> OrchestratorResponse:
+    # Fast path: obvious intents (known file headers, clear keywords) are decided locally
+    prediction = classify_intent(user_message, file_content_preview)
+    if prediction.confidence >= INTENT_CONFIDENCE_THRESHOLD:
+        routing_stats.record("local", prediction.intent)
+        return OrchestratorResponse(
+            intent=prediction.intent,
+            reason=f"Classified locally from {prediction.source} (confidence {prediction.confidence:.2f}).",
+            confidence=prediction.confidence,
+        )
 
-    # Format chat history for context
-    history_text = ""
-    if chat_history and len(chat_history) > 1:  # More than just current message
-        # Exclude the last message (current user message) as it's already in user_message
-        for msg in chat_history[:-1]:
-            role = "User" if msg["role"] == "user" else "Assistant"
-            history_text += f"{role}: {msg['content']}\n"
+    # Format chat history for context, unless the caller already built it
+    if memory_context is not None:
+        history_text = memory_context
+    else:
+        history_text = ""
+        if chat_history and len(chat_history) > 1:  # More than just current message
+            # Exclude the last message (current user message) as it's already in user_message
+            history_text = format_history(chat_history[:-1])
     
     # Debug logging
     print(f"[ORCHESTRATOR DEBUG] Received history length: {len(chat_history) if chat_history else 0}")
     print(f"[ORCHESTRATOR DEBUG] Formatted history text: {history_text[:200] if history_text else 'No previous conversation.'}")
     
     # Inject data
-    prompt = template.replace("{{user_message}}", user_message).replace("{{file_preview}}", file_content_preview).replace("{{chat_history}}", history_text if history_text else "No previous conversation.")
+    prompt = prompt_registry.render(
+        "orchestrator_prompt",
+        user_message=user_message,
+        file_preview=file_content_preview,
+        chat_history=history_text if history_text else "No previous conversation.",
+    )
 
     # Call LLM
-    response_str = call_llm(prompt)
+    try:
+        response_str = await call_llm(prompt)
+    except LLMError as e:
+        print(f"Orchestrator LLM call failed: {e}")
+        return OrchestratorResponse(intent="GENERAL_QUERY", reason="The assistant is temporarily unavailable. Please try again shortly.")
 
     # Parse JSON response
     cleaned_response = response_str.replace("```json", "").replace("```", "").strip()
     
     try:
         data = json.loads(cleaned_response)
-        return OrchestratorResponse(**data)
+        result = OrchestratorResponse(**data)
+        routing_stats.record("llm", result.intent)
+        return result
     except json.JSONDecodeError:
         print(f"Failed to parse Orchestrator LLM response: {response_str}")
         # Default fallback
@@ -0,0 +1,105 @@
+import re
+from array import array
+from typing import Dict, Iterable, List, NamedTuple
+
+import numpy as np
+
+from backend_sme.deductions.dictionary import canonical_merchant
+from backend_sme.deductions.merchants import normalize_description
+from backend_sme.deductions.statements import Transaction
+
+UNKNOWN_PERIOD = "unknown"
+SUMMARY_HEADER = "Merchant,Month,Payments,Total,Min,Max,Example"
+
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+# Distinct descriptions remembered per aggregation (statements repeat them a lot)
+_CACHE_SIZE = 100000
+
+
+class MerchantMonth(NamedTuple):
+    merchant: str
+    month: str  # YYYY-MM, or "unknown" if the date was not readable
+    payments: int
+    total: float
+    smallest: float
+    largest: float
+    example: str  # first bank description of the merchant
+
+
+def merchant_key(description: str) -> str:
+    """Merchant a bank description is grouped under: canonical_merchant(), else the whole normalized text."""
+    return canonical_merchant(description) or normalize_description(description).strip()
+
+
+def aggregate_debits(transactions: Iterable[Transaction]) -> List[MerchantMonth]:
+    """
+    Debits grouped by merchant and month, with the number of payments and
+    their total, smallest and largest amount. Credits are skipped. Rows are
+    only coded in the loop; the groups are reduced with numpy. Merchants
+    come by total spent (largest first), each with its months in order.
+    """
+    merchants: Dict[str, int] = {}
+    months: Dict[str, int] = {}
+    examples: List[str] = []
+    codes: Dict[str, int] = {}  # description -> merchant code
+    merchant_codes, month_codes, amounts = array("q"), array("q"), array("d")
+    for transaction in transactions:
+        if not transaction.debit:
+            continue
+        code = codes.get(transaction.description)
+        if code is None:
+            key = merchant_key(transaction.description)
+            code = merchants.get(key)
+            if code is None:
+                code = merchants[key] = len(merchants)
+                examples.append(transaction.description)
+            if len(codes) < _CACHE_SIZE:
+                codes[transaction.description] = code
+        period = transaction.date[:7] if _ISO_DATE.match(transaction.date) else UNKNOWN_PERIOD
+        month = months.get(period)
+        if month is None:
+            month = months[period] = len(months)
+        merchant_codes.append(code)
+        month_codes.append(month)
+        amounts.append(transaction.debit)
+    if not amounts:
+        return []
+
+    merchant_of = np.frombuffer(merchant_codes, dtype=np.int64)
+    debits = np.frombuffer(amounts, dtype=np.float64)
+    groups, group_of = np.unique(merchant_of * len(months) + np.frombuffer(month_codes, dtype=np.int64),
+                                 return_inverse=True)
+    payments = np.bincount(group_of)
+    totals = np.bincount(group_of, weights=debits)
+    smallest = np.full(len(groups), np.inf)
+    largest = np.zeros(len(groups))
+    np.minimum.at(smallest, group_of, debits)
+    np.maximum.at(largest, group_of, debits)
+    spent = np.bincount(merchant_of, weights=debits)
+
+    names = list(merchants)
+    periods = list(months)
+    order = sorted(range(len(groups)), key=lambda g: (
+        -spent[groups[g] // len(months)], names[groups[g] // len(months)], periods[groups[g] % len(months)],
+    ))
+    return [
+        MerchantMonth(
+            merchant=names[groups[g] // len(months)],
+            month=periods[groups[g] % len(months)],
+            payments=int(payments[g]),
+            total=round(float(totals[g]), 2),
+            smallest=float(smallest[g]),
+            largest=float(largest[g]),
+            example=examples[groups[g] // len(months)],
+        )
+        for g in order
+    ]
+
+
+def summary_rows(summary: List[MerchantMonth]) -> List[str]:
+    """Lines of the summary table under SUMMARY_HEADER."""
+    return [
+        f"{row.merchant},{row.month},{row.payments},{row.total:.2f},{row.smallest:.2f},{row.largest:.2f},"
+        f"{row.example.replace(',', ' ')}"
+        for row in summary
+    ]
@@ -0,0 +1,299 @@
+import asyncio
+import os
+import sqlite3
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from backend_sme.agents.deduction_agent import run_deduction_agent
+from backend_sme.deductions.aggregate import SUMMARY_HEADER, aggregate_debits, merchant_key, summary_rows
+from backend_sme.deductions.dedup import TransactionDeduplicator
+from backend_sme.deductions.dictionary import MerchantDictionary, merchant_dictionary
+from backend_sme.deductions.merchants import Merchant, MerchantMatcher, merchant_matcher, normalize_description
+from backend_sme.deductions.statements import Transaction, iter_transactions, open_statement
+from backend_sme.models.schemas import DeductionItem, DeductionResponse
+from backend_sme.utils.file_parser import FILE_PARSE_MAX_CHARS, parse_file_content
+from backend_sme.utils.tokens import estimate_tokens
+
+# Marginal tax rate used to turn locally found deductions into tax saved
+DEDUCTION_TAX_RATE = float(os.getenv("DEDUCTION_TAX_RATE", "0.30"))
+# Estimated tokens of document per deduction agent call; larger inputs are split into chunks
+DEDUCTION_CHUNK_TOKENS = int(os.getenv("DEDUCTION_CHUNK_TOKENS", "6000"))
+# Chunks of one analysis sent to the agent at the same time
+DEDUCTION_CHUNK_WORKERS = int(os.getenv("DEDUCTION_CHUNK_WORKERS", "8"))
+
+UNKNOWN_HEADER = "Date,Description,Reference,Debit"
+
+
+class Classification(NamedTuple):
+    known: Dict[Merchant, list]  # merchant -> [total spent, payments]
+    unknown: List[Transaction]  # debits no merchant pattern matched
+    excluded: int  # debits of known non-deductible kinds (withdrawals, transfers, taxes)
+    rows: int
+
+
+class Section(NamedTuple):
+    title: str  # file name, and what the lines are
+    header: str  # CSV header repeated in every chunk of the section ("" for plain text)
+    lines: List[str]
+
+
+class DeductionInput(NamedTuple):
+    deductions: List[DeductionItem]  # found by the merchant rules
+    note: str  # tells the agent what not to repeat ("" if nothing)
+    sections: List[Section]  # what is left for the deduction agent
+    stats: dict
+
+    @property
+    def document(self) -> str:
+        """Everything left for the agent as one text ("" if nothing)."""
+        body = "".join(_opening(section) + "\n".join(section.lines) for section in self.sections)
+        return f"{self.note}\n{body}" if body and self.note else body
+
+
+def classify_transactions(transactions, matcher: MerchantMatcher = merchant_matcher,
+                          dictionary: Optional[MerchantDictionary] = merchant_dictionary) -> Classification:
+    """
+    Splits debit rows into known merchants and unknown rows in one pass:
+    the merchant rules first, then merchants learned from earlier agent
+    answers. Credits are ignored.
+    """
+    known: Dict[Merchant, list] = {}
+    unknown: List[Transaction] = []
+    excluded = rows = 0
+    for transaction in transactions:
+        rows += 1
+        if not transaction.debit:
+            continue
+        merchant = matcher.match(transaction.description)
+        if merchant is None and dictionary is not None:
+            merchant = dictionary.lookup(transaction.description)
+        if merchant is None:
+            unknown.append(transaction)
+        elif not merchant.section:
+            excluded += 1
+        else:
+            totals = known.setdefault(merchant, [0.0, 0])
+            totals[0] += transaction.debit
+            totals[1] += 1
+    return Classification(known, unknown, excluded, rows)
+
+
+def deduction_items(known: Dict[Merchant, list]) -> List[DeductionItem]:
+    items = []
+    for merchant, (spent, payments) in known.items():
+        share = "" if merchant.deductible == 1 else f", {merchant.deductible:.0%} deductible this year"
+        items.append(DeductionItem(
+            title=merchant.name,
+            amount=round(spent * merchant.deductible, 2),
+            section=merchant.section,
+            reason=f"{merchant.category}: {payments} payment{'s' if payments != 1 else ''} totalling ₹{spent:,.2f}{share}",
+        ))
+    return sorted(items, key=lambda item: -item.amount)
+
+
+def _unknown_rows(transactions: List[Transaction]) -> List[str]:
+    return [f"{t.date},{t.description.replace(',', ' ')},{t.reference},{t.debit:.2f}" for t in transactions]
+
+
+def _opening(section: Section) -> str:
+    return f"\n--- File: {section.title} ---\n" + (f"{section.header}\n" if section.header else "")
+
+
+def prepare_deduction_input(file_paths: List[str], max_chars: Optional[int] = FILE_PARSE_MAX_CHARS,
+                            matcher: MerchantMatcher = merchant_matcher,
+                            dictionary: Optional[MerchantDictionary] = merchant_dictionary,
+                            drill_down: Iterable[str] = ()) -> DeductionInput:
+    """
+    Reads the uploads for the deduction agent. Bank statement CSVs are
+    classified by the merchant rules; their unknown debits go into the
+    document as one table by merchant and month, after a one-line note per
+    merchant already accounted for so the agent does not count them again.
+    Merchants named in `drill_down` are sent as raw rows instead of summary
+    lines. Rows already read from an earlier statement (overlapping exports)
+    are skipped. Other files are included as text.
+    """
+    known: Dict[Merchant, list] = {}
+    unknown: List[Transaction] = []
+    statements: List[str] = []
+    sections, stats = [], {"statement_rows": 0, "classified_rows": 0, "excluded_rows": 0, "unknown_rows": 0}
+    with TransactionDeduplicator() as dedup:
+        for file_path in file_paths:
+            filename = os.path.basename(file_path)
+            stream = open_statement(file_path)
+            if stream is None:
+                try:
+                    sections.append(Section(filename, "", parse_file_content(file_path, max_chars).splitlines()))
+                except Exception as e:
+                    print(f"Skipping file {filename}: {e}")
+                continue
+            with stream:
+                found = classify_transactions(dedup.filter(iter_transactions(stream)), matcher, dictionary)
+            for merchant, (spent, payments) in found.known.items():
+                totals = known.setdefault(merchant, [0.0, 0])
+                totals[0] += spent
+                totals[1] += payments
+            statements.append(filename)
+            unknown.extend(found.unknown)
+            stats["statement_rows"] += found.rows
+            stats["classified_rows"] += sum(payments for _, payments in found.known.values())
+            stats["excluded_rows"] += found.excluded
+            stats["unknown_rows"] += len(found.unknown)
+        stats["duplicate_rows"] = dedup.removed
+
+    drilled = {merchant_key(name) for name in drill_down}
+    raw = [t for t in unknown if merchant_key(t.description) in drilled] if drilled else []
+    if raw:
+        unknown = [t for t in unknown if merchant_key(t.description) not in drilled]
+    summary = aggregate_debits(unknown)
+    stats["summary_rows"] = len(summary)
+    if summary:
+        sections.append(Section(f"{', '.join(statements)} (debits not matched to a known merchant, by merchant and month)",
+                                SUMMARY_HEADER, summary_rows(summary)))
+    if raw:
+        sections.append(Section(f"{', '.join(statements)} (every debit of {', '.join(sorted(drilled))})",
+                                UNKNOWN_HEADER, _unknown_rows(raw)))
+
+    deductions = deduction_items(known)
+    note = ""
+    if deductions:
+        listed = "; ".join(f"{item.title} (section {item.section}) ₹{item.amount:,.2f}" for item in deductions)
+        note = f"Already identified from the bank statements, do not repeat: {listed}"
+    return DeductionInput(deductions, note, sections, stats)
+
+
+def deduction_chunks(prepared: DeductionInput, message: str = "",
+                     max_tokens: int = DEDUCTION_CHUNK_TOKENS) -> List[str]:
+    """
+    Splits what is left for the agent into documents of about `max_tokens`
+    estimated tokens, cut at line boundaries. Each chunk repeats the note of
+    known merchants and the header of the file it continues; the user's
+    message only goes into the first one so it is answered once.
+    Returns [] when there is nothing to send.
+    """
+    if not any(section.lines for section in prepared.sections):
+        return [message] if message.strip() else []
+    note = f"{prepared.note}\n" if prepared.note else ""
+    chunks, current, size = [], [], 0
+    for section in prepared.sections:
+        opening = _opening(section)
+        continued = _opening(section._replace(title=f"{section.title}, continued"))
+        current.append(opening)
+        size += estimate_tokens(opening)
+        filled = False
+        for line in section.lines:
+            cost = estimate_tokens(line) + 1
+            if filled and size + cost > max_tokens:
+                chunks.append("".join(current))
+                current, size = [continued], estimate_tokens(continued)
+            current.append(f"{line}\n")
+            size += cost
+            filled = True
+    chunks.append("".join(current))
+    if len(chunks) == 1:
+        return [f"{message}\n{note}{chunks[0]}" if message else f"{note}{chunks[0]}"]
+    return [
+        f"{message if i == 0 else ''}\nPart {i + 1} of {len(chunks)} of the user's documents.\n{note}{chunk}"
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+async def iter_chunk_results(chunks: List[str], chat_history: list = None, memory_context: str = None,
+                             agent=run_deduction_agent,
+                             workers: int = DEDUCTION_CHUNK_WORKERS) -> AsyncIterator[Tuple[int, DeductionResponse]]:
+    """
+    Runs `agent` on every chunk, at most `workers` at a time, and yields
+    (chunk index, response) as each one finishes. Only the first chunk
+    carries the conversation. Calls still running are cancelled if the
+    caller stops early or one of them fails.
+    """
+    semaphore = asyncio.Semaphore(max(workers, 1))
+
+    async def analyze(index: int, chunk: str):
+        async with semaphore:
+            if index == 0:
+                return index, await agent(chunk, chat_history, memory_context)
+            return index, await agent(chunk, None, "")
+
+    tasks = [asyncio.ensure_future(analyze(i, chunk)) for i, chunk in enumerate(chunks)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _deduction_key(item: DeductionItem) -> tuple:
+    section = normalize_description(item.section).strip()
+    if section.startswith("SECTION "):
+        section = section[len("SECTION "):]
+    return section, normalize_description(item.title).strip()
+
+
+def merge_deductions(prepared: DeductionInput, responses: List[DeductionResponse],
+                     dictionary: Optional[MerchantDictionary] = merchant_dictionary, source: str = "") -> DeductionResponse:
+    """
+    Reduces the local deductions and the agent's answers for every chunk
+    into one response. Agent deductions with the same section and title
+    come from different rows and are added up; one repeating a deduction
+    the merchant rules already found is dropped. The tax saved is
+    recomputed from the merged amounts, so it does not depend on how the
+    input was chunked. Merchant classifications are learned into
+    `dictionary` for later runs, as answers given to `source` (the client
+    or chat session).
+    """
+    merchants = [merchant for response in responses for merchant in response.merchants]
+    if dictionary is not None:
+        try:
+            dictionary.learn(merchants, source)
+        except sqlite3.Error as e:
+            print(f"Merchant dictionary not updated: {e}")
+    local = {_deduction_key(item) for item in prepared.deductions}
+    found: Dict[tuple, DeductionItem] = {}
+    for response in responses:
+        for item in response.deductions:
+            key = _deduction_key(item)
+            if key in local:
+                continue
+            seen = found.get(key)
+            if seen is None:
+                found[key] = item
+            else:
+                reason = seen.reason if item.reason in seen.reason else f"{seen.reason}; {item.reason}"
+                found[key] = DeductionItem(title=seen.title, amount=round(seen.amount + item.amount, 2),
+                                           section=seen.section, reason=reason)
+    deductions = prepared.deductions + sorted(found.values(), key=lambda item: (-item.amount, item.title))
+    return DeductionResponse(
+        deductions=deductions,
+        estimated_tax_saved=round(sum(item.amount for item in deductions) * DEDUCTION_TAX_RATE, 2),
+        duplicate_transactions=prepared.stats.get("duplicate_rows", 0),
+    )
+
+
+async def analyze_prepared(prepared: DeductionInput, message: str = "", chat_history: list = None,
+                           memory_context: str = None, agent=run_deduction_agent,
+                           dictionary: Optional[MerchantDictionary] = merchant_dictionary,
+                           source: str = "") -> DeductionResponse:
+    """Map-reduce over the chunks of a prepared input; no LLM call when nothing is left."""
+    chunks = deduction_chunks(prepared, message)
+    if len(chunks) > 1:
+        print(f"Deduction analysis in {len(chunks)} chunks")
+    responses: List[Optional[DeductionResponse]] = [None] * len(chunks)
+    async for index, response in iter_chunk_results(chunks, chat_history, memory_context, agent):
+        responses[index] = response
+    return merge_deductions(prepared, responses, dictionary, source)
+
+
+async def analyze_deductions(file_paths: List[str], message: str = "", chat_history: list = None,
+                             memory_context: str = None,
+                             dictionary: Optional[MerchantDictionary] = merchant_dictionary,
+                             drill_down: Iterable[str] = (), source: str = "") -> DeductionResponse:
+    """
+    Deduction analysis of the uploads: known merchants are classified
+    locally and the deduction agent only sees the unknown debits summarized
+    by merchant and month (raw rows for the `drill_down` merchants), other
+    files and the user's message, split into chunks analyzed concurrently.
+    Reading the files runs in a worker thread, off the event loop.
+    """
+    prepared = await asyncio.to_thread(prepare_deduction_input, file_paths, dictionary=dictionary, drill_down=drill_down)
+    print(f"Deduction pre-classification: {prepared.stats}")
+    return await analyze_prepared(prepared, message, chat_history, memory_context, dictionary=dictionary, source=source)
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+from typing import Dict, Iterable, Iterator, Optional
+
+from backend_sme.deductions.merchants import normalize_description
+from backend_sme.deductions.statements import Transaction
+
+# Fingerprints kept in memory before they are spilled to a temporary SQLite file
+DEDUP_MEMORY_KEYS = int(os.getenv("DEDUP_MEMORY_KEYS", "200000"))
+# Directory of the spill files (empty: the system temp directory)
+DEDUP_SPILL_DIR = os.getenv("DEDUP_SPILL_DIR", "")
+
+# Bloom filter over spilled fingerprints (16 MB, under 1% false positives at 10M rows)
+_BLOOM_BITS = 1 << 27
+_BLOOM_MASK = _BLOOM_BITS - 1
+
+
+def fingerprint(transaction: Transaction) -> bytes:
+    """16-byte digest of (date, reference, amounts, normalized description)."""
+    key = "|".join((
+        transaction.date,
+        transaction.reference.strip().upper(),
+        str(round(transaction.debit * 100)),
+        str(round(transaction.credit * 100)),
+        normalize_description(transaction.description).strip(),
+    ))
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+class FingerprintMap:
+    """
+    Fingerprint -> file number, in a dict of at most `max_memory` entries.
+    When the dict is full it is written to a temporary SQLite table and
+    emptied; lookups then check the dict first and the table second, the
+    latter only if a Bloom filter of the spilled keys (bits taken straight
+    from the digest) says it may be there. The spill file is removed by
+    close().
+    """
+
+    def __init__(self, max_memory: int = DEDUP_MEMORY_KEYS, spill_dir: str = DEDUP_SPILL_DIR):
+        self.max_memory = max(max_memory, 1)
+        self.spill_dir = spill_dir or None
+        self.spilled = 0
+        self._memory: Dict[bytes, int] = {}
+        self._path: Optional[str] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._bloom: Optional[bytearray] = None
+
+    @staticmethod
+    def _bits(key: bytes):
+        return (int.from_bytes(key[i:i + 4], "little") & _BLOOM_MASK for i in (0, 4, 8))
+
+    def get(self, key: bytes) -> Optional[int]:
+        value = self._memory.get(key)
+        if value is None and self._conn is not None and all(
+            self._bloom[bit >> 3] & (1 << (bit & 7)) for bit in self._bits(key)
+        ):
+            row = self._conn.execute("SELECT file FROM fingerprints WHERE key = ?", (key,)).fetchone()
+            value = row[0] if row else None
+        return value
+
+    def set(self, key: bytes, value: int):
+        self._memory[key] = value
+        if len(self._memory) >= self.max_memory:
+            self._spill()
+
+    def _spill(self):
+        # The file and schema are created on first spill, not up front
+        if self._conn is None:
+            fd, self._path = tempfile.mkstemp(prefix="dedup-", suffix=".db", dir=self.spill_dir)
+            os.close(fd)
+            self._conn = sqlite3.connect(self._path)
+            self._conn.execute("PRAGMA journal_mode = OFF")
+            self._conn.execute("PRAGMA synchronous = OFF")
+            self._conn.execute("CREATE TABLE fingerprints (key BLOB PRIMARY KEY, file INTEGER NOT NULL) WITHOUT ROWID")
+            self._bloom = bytearray(_BLOOM_BITS // 8)
+        bloom = self._bloom
+        for key in self._memory:
+            for bit in self._bits(key):
+                bloom[bit >> 3] |= 1 << (bit & 7)
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO fingerprints (key, file) VALUES (?, ?)", self._memory.items())
+        self.spilled += len(self._memory)
+        self._memory = {}
+
+    def close(self):
+        self._memory = {}
+        self._bloom = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            os.remove(self._path)
+
+
+class TransactionDeduplicator:
+    """
+    Drops bank statement rows already read from an earlier file, whatever
+    their order, so overlapping exports (a monthly and a quarterly one) are
+    counted once. Identical rows within one file are kept: the k-th copy of
+    a row in a file is a duplicate only if an earlier file also had at
+    least k copies. Memory stays bounded for any number of rows (see
+    FingerprintMap).
+    """
+
+    def __init__(self, max_memory: int = DEDUP_MEMORY_KEYS, spill_dir: str = DEDUP_SPILL_DIR):
+        self.seen = FingerprintMap(max_memory, spill_dir)
+        self.files = 0
+        self.rows = 0
+        self.removed = 0
+
+    def filter(self, transactions: Iterable[Transaction]) -> Iterator[Transaction]:
+        """Yields the transactions of one file that no earlier file had."""
+        self.files += 1
+        current = self.files
+        for transaction in transactions:
+            self.rows += 1
+            digest, copy = fingerprint(transaction), 0
+            # Key of this copy of the row within the current file
+            while True:
+                key = digest + copy.to_bytes(4, "little")
+                file = self.seen.get(key)
+                if file != current:
+                    break
+                copy += 1
+            self.seen.set(key, current)
+            if file is not None:
+                self.removed += 1
+                continue
+            yield transaction
+
+    def close(self):
+        self.seen.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,197 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from backend_sme.deductions.merchants import Merchant
+from backend_sme.models.schemas import MerchantClassification
+
+# SQLite file of merchant classifications learned from the deduction agent. Empty disables it.
+MERCHANT_DICTIONARY_DB = os.getenv("MERCHANT_DICTIONARY_DB", "data/merchant_dictionary.db")
+# Learned entries below this confidence are stored but not used to skip the agent
+MERCHANT_MIN_CONFIDENCE = float(os.getenv("MERCHANT_MIN_CONFIDENCE", "0.8"))
+# Distinct clients (or chat sessions) that must give the same classification before it is used
+MERCHANT_MIN_CONFIRMATIONS = int(os.getenv("MERCHANT_MIN_CONFIRMATIONS", "3"))
+
+# Payment rails and filler words of Indian bank narrations
+_CHANNELS = {
+    "UPI", "NEFT", "IMPS", "RTGS", "POS", "ACH", "NACH", "ECS", "BIL", "ONL", "INB", "MB", "BBPS",
+    "DR", "CR", "TO", "BY", "TRF", "TRANSFER", "PAYMENT", "PAYMENTS", "PAY", "PURCHASE", "TXN", "REF", "VPA",
+}
+_SUFFIXES = {
+    "MUMBAI", "BOMBAY", "DELHI", "NEW", "BANGALORE", "BENGALURU", "BLR", "GURGAON", "GURUGRAM", "NOIDA", "PUNE",
+    "CHENNAI", "HYDERABAD", "KOLKATA", "AHMEDABAD", "JAIPUR", "IN", "IND", "INDIA", "PVT", "PRIVATE", "LTD", "LIMITED",
+}
+# One VPA token: hyphens and slashes delimit narration fields, so they are not part of it
+_UPI_ID = re.compile(r"[A-Za-z0-9._]+@[A-Za-z]+")
+_WORDS = re.compile(r"[A-Z0-9]+")
+# Tokens kept from a description; the rest is usually a note or a reference
+_MAX_TOKENS = 4
+
+
+def _merchant_words(text: str) -> list:
+    return [
+        word for word in _WORDS.findall(_UPI_ID.sub(" ", text).upper())
+        if word not in _CHANNELS and not any(char.isdigit() for char in word)
+    ]
+
+
+def canonical_merchant(description: str) -> str:
+    """
+    Dictionary key of a bank description: the merchant words without payment
+    rails, UPI IDs, reference numbers and trailing city or company suffixes.
+    In UPI narrations the payee comes before the VPA; what follows it (bank
+    code, reference, the payer's note) is only used if nothing precedes it.
+    'UPI/412345678901/SWIGGY/swiggy@icici/Bangalore' -> 'SWIGGY'.
+    """
+    vpa = _UPI_ID.search(description)
+    words = _merchant_words(description[:vpa.start()] if vpa else description)
+    if vpa and not words:
+        words = _merchant_words(description[vpa.end():])
+    while words and words[-1] in _SUFFIXES:
+        words.pop()
+    return " ".join(words[:_MAX_TOKENS])
+
+
+def _same(a: Merchant, b: Merchant) -> bool:
+    """Same classification: merchant name, section and deductible share."""
+    return (a.name.strip().upper(), a.section.strip().upper(), a.deductible) == \
+        (b.name.strip().upper(), b.section.strip().upper(), b.deductible)
+
+
+class MerchantDictionary:
+    """
+    Merchant classifications learned from the deduction agent, keyed by
+    canonical_merchant(). Entries are loaded into a dict on first use and
+    written through to SQLite. The agent's confidence is its own claim, so
+    an entry is only used locally once `min_confirmations` distinct sources
+    (clients or chat sessions) got the same classification from it; one
+    wrong answer never applies to other clients. Each lookup that answers a
+    row counts a hit; a different answer for a known merchant replaces the
+    old one, and restarts its confirmations, only if the agent is at least
+    as confident.
+    """
+
+    def __init__(self, db_path: str = MERCHANT_DICTIONARY_DB, min_confidence: float = MERCHANT_MIN_CONFIDENCE,
+                 min_confirmations: int = MERCHANT_MIN_CONFIRMATIONS):
+        self.db_path = db_path
+        self.min_confidence = min_confidence
+        self.min_confirmations = min_confirmations
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, tuple]] = None  # key -> (Merchant, confidence, confirmations)
+        self._hits: Dict[str, int] = {}  # not yet written
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _load(self) -> Dict[str, tuple]:
+        # The file and schema are created on first use, not at import
+        if self._entries is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS merchant_dictionary ("
+                    "key TEXT PRIMARY KEY, merchant TEXT NOT NULL, category TEXT, section TEXT NOT NULL, "
+                    "deductible REAL NOT NULL, confidence REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0, "
+                    "example TEXT, learned_at REAL NOT NULL)"
+                )
+                present = {row[1] for row in conn.execute("PRAGMA table_info(merchant_dictionary)")}
+                if "confirmations" not in present:
+                    # Entries learned before confirmations were counted start from one
+                    conn.execute("ALTER TABLE merchant_dictionary ADD COLUMN confirmations INTEGER NOT NULL DEFAULT 1")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS merchant_sources ("
+                    "key TEXT NOT NULL, source TEXT NOT NULL, PRIMARY KEY (key, source))"
+                )
+                rows = conn.execute(
+                    "SELECT key, merchant, category, section, deductible, confidence, confirmations FROM merchant_dictionary"
+                ).fetchall()
+            self._entries = {
+                key: (Merchant(merchant, category or "", section, deductible, ()), confidence, confirmations)
+                for key, merchant, category, section, deductible, confidence, confirmations in rows
+            }
+        return self._entries
+
+    def _trusted(self, entry: tuple) -> bool:
+        return entry[1] >= self.min_confidence and entry[2] >= self.min_confirmations
+
+    def lookup(self, description: str) -> Optional[Merchant]:
+        """The learned merchant of a description, if it was learned with enough confidence and confirmations."""
+        key = canonical_merchant(description)
+        if not key:
+            return None
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is None or not self._trusted(entry):
+                return None
+            self._hits[key] = self._hits.get(key, 0) + 1
+            return entry[0]
+
+    def learn(self, classifications: Iterable[MerchantClassification], source: str = "") -> int:
+        """
+        Records the agent's classifications for one client or session
+        (`source`) and the pending hit counts. Returns entries added or changed.
+        """
+        classifications = list(classifications)
+        now, changed = time.time(), 0
+        with self._lock:
+            if not classifications and not self._hits:
+                return 0
+            entries = self._load()
+            hits, self._hits = self._hits, {}
+            with self._connect() as conn:
+                for item in classifications:
+                    key = canonical_merchant(item.description)
+                    if not key or not item.merchant:
+                        continue
+                    confidence = min(max(item.confidence, 0.0), 1.0)
+                    merchant = Merchant(item.merchant, item.category, item.section, min(max(item.deductible_share, 0.0), 1.0), ())
+                    known = entries.get(key)
+                    if known is not None and _same(known[0], merchant):
+                        # Agreement counts once per source
+                        added = conn.execute(
+                            "INSERT OR IGNORE INTO merchant_sources (key, source) VALUES (?, ?)", (key, source)
+                        ).rowcount
+                        if not added and confidence <= known[1]:
+                            continue
+                        entries[key] = (known[0], max(known[1], confidence), known[2] + added)
+                        conn.execute(
+                            "UPDATE merchant_dictionary SET confidence = ?, confirmations = ? WHERE key = ?",
+                            (entries[key][1], entries[key][2], key),
+                        )
+                    else:
+                        if known is not None and known[1] > confidence:
+                            continue
+                        entries[key] = (merchant, confidence, 1)
+                        conn.execute("DELETE FROM merchant_sources WHERE key = ?", (key,))
+                        conn.execute("INSERT INTO merchant_sources (key, source) VALUES (?, ?)", (key, source))
+                        conn.execute(
+                            "INSERT INTO merchant_dictionary (key, merchant, category, section, deductible, confidence, "
+                            "confirmations, example, learned_at) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?) "
+                            "ON CONFLICT(key) DO UPDATE SET merchant = excluded.merchant, "
+                            "category = excluded.category, section = excluded.section, deductible = excluded.deductible, "
+                            "confidence = excluded.confidence, confirmations = 1, example = excluded.example, "
+                            "learned_at = excluded.learned_at",
+                            (key, merchant.name, merchant.category, merchant.section, merchant.deductible,
+                             confidence, item.description, now),
+                        )
+                    changed += 1
+                conn.executemany("UPDATE merchant_dictionary SET hits = hits + ? WHERE key = ?",
+                                 [(count, key) for key, count in hits.items()])
+        return changed
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._load()
+            with self._connect() as conn:
+                hits = conn.execute("SELECT COALESCE(SUM(hits), 0) FROM merchant_dictionary").fetchone()[0]
+            return {
+                "merchants": len(entries),
+                "trusted": sum(1 for entry in entries.values() if self._trusted(entry)),
+                "hits": hits + sum(self._hits.values()),
+            }
+
+
+merchant_dictionary = MerchantDictionary() if MERCHANT_DICTIONARY_DB else None
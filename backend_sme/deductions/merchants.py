@@ -0,0 +1,153 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class Merchant(NamedTuple):
+    name: str
+    category: str
+    section: str  # Income Tax Act section; "" for payments that are not deductible expenses
+    deductible: float  # share of the spend deductible this year (e.g. 0.40 for computers under section 32)
+    patterns: Tuple[str, ...]  # whole-word phrases of the normalized bank description
+
+
+# Known merchants and payment patterns of small Indian businesses. Rows that
+# match none of them are left for the deduction agent. Patterns name the
+# business service, not the brand alone ("UBER RIDES", not "UBER", which
+# would also take Uber Eats; "OFFICE RENT", not "RENT", which would also
+# take house rent), and short codes only with a longer form ("GCP BILLING").
+# Salary and payroll debits are left to the agent: whether they are a
+# business expense depends on who pays whom.
+MERCHANTS = (
+    Merchant("AWS", "Cloud hosting", "37(1)", 1.0, ("AWS", "AMAZON WEB SERVICES")),
+    Merchant("Google Cloud", "Cloud hosting", "37(1)", 1.0, ("GOOGLE CLOUD", "GCP BILLING")),
+    Merchant("Microsoft Azure", "Cloud hosting", "37(1)", 1.0, ("MICROSOFT AZURE", "AZURE")),
+    Merchant("DigitalOcean", "Cloud hosting", "37(1)", 1.0, ("DIGITALOCEAN", "DIGITAL OCEAN")),
+    Merchant("GitHub", "Software subscription", "37(1)", 1.0, ("GITHUB",)),
+    Merchant("Atlassian", "Software subscription", "37(1)", 1.0, ("ATLASSIAN", "JIRA")),
+    Merchant("Slack", "Software subscription", "37(1)", 1.0, ("SLACK",)),
+    Merchant("Zoom", "Software subscription", "37(1)", 1.0, ("ZOOM VIDEO", "ZOOM US", "ZOOM COMM")),
+    Merchant("Google Workspace", "Software subscription", "37(1)", 1.0, ("GOOGLE WORKSPACE", "GSUITE", "G SUITE")),
+    Merchant("Microsoft 365", "Software subscription", "37(1)", 1.0, ("MICROSOFT 365", "OFFICE 365", "MSFT")),
+    Merchant("Adobe", "Software subscription", "37(1)", 1.0, ("ADOBE",)),
+    Merchant("Canva", "Software subscription", "37(1)", 1.0, ("CANVA",)),
+    Merchant("Notion", "Software subscription", "37(1)", 1.0, ("NOTION SO", "NOTION LABS")),
+    Merchant("Dropbox", "Software subscription", "37(1)", 1.0, ("DROPBOX",)),
+    Merchant("Figma", "Software subscription", "37(1)", 1.0, ("FIGMA",)),
+    Merchant("Zoho", "Software subscription", "37(1)", 1.0, ("ZOHO",)),
+    Merchant("Tally", "Software subscription", "37(1)", 1.0, ("TALLY SOLUTIONS", "TALLYPRIME")),
+    Merchant("Freshworks", "Software subscription", "37(1)", 1.0, ("FRESHWORKS", "FRESHDESK")),
+    Merchant("GoDaddy", "Domains and hosting", "37(1)", 1.0, ("GODADDY",)),
+    Merchant("Hostinger", "Domains and hosting", "37(1)", 1.0, ("HOSTINGER",)),
+    Merchant("Uber", "Business travel", "37(1)", 1.0, ("UBER INDIA", "UBER RIDES", "UBER TRIP", "UBER BV")),
+    Merchant("Ola", "Business travel", "37(1)", 1.0, ("OLA CABS", "OLACABS", "ANI TECHNOLOGIES")),
+    Merchant("Rapido", "Business travel", "37(1)", 1.0, ("RAPIDO",)),
+    Merchant("IndiGo", "Business travel", "37(1)", 1.0, ("INDIGO", "INTERGLOBE AVIATION")),
+    Merchant("Air India", "Business travel", "37(1)", 1.0, ("AIR INDIA", "VISTARA")),
+    Merchant("SpiceJet", "Business travel", "37(1)", 1.0, ("SPICEJET",)),
+    Merchant("IRCTC", "Business travel", "37(1)", 1.0, ("IRCTC",)),
+    Merchant("MakeMyTrip", "Business travel", "37(1)", 1.0, ("MAKEMYTRIP", "MAKE MY TRIP")),
+    Merchant("Cleartrip", "Business travel", "37(1)", 1.0, ("CLEARTRIP",)),
+    Merchant("Airtel", "Telephone and internet", "37(1)", 1.0, ("AIRTEL", "BHARTI AIRTEL")),
+    Merchant("Jio", "Telephone and internet", "37(1)", 1.0, ("RELIANCE JIO", "JIO PREPAID", "JIO POSTPAID", "JIO FIBER", "JIOFIBER")),
+    Merchant("Vodafone Idea", "Telephone and internet", "37(1)", 1.0, ("VODAFONE", "VODAFONE IDEA")),
+    Merchant("BSNL", "Telephone and internet", "37(1)", 1.0, ("BSNL",)),
+    Merchant("ACT Fibernet", "Telephone and internet", "37(1)", 1.0, ("ACT FIBERNET",)),
+    Merchant("Google Ads", "Advertising", "37(1)", 1.0, ("GOOGLE ADS", "GOOGLE ADWORDS")),
+    Merchant("Meta Ads", "Advertising", "37(1)", 1.0, ("FACEBOOK ADS", "FACEBK", "META ADS", "META PLATFORMS")),
+    Merchant("LinkedIn", "Advertising", "37(1)", 1.0, ("LINKEDIN",)),
+    Merchant("Electricity", "Electricity", "37(1)", 1.0, ("BESCOM", "MSEDCL", "TATA POWER", "ADANI ELECTRICITY", "TORRENT POWER", "ELECTRICITY BILL")),
+    Merchant("Office rent", "Rent of business premises", "30", 1.0, ("OFFICE RENT", "SHOP RENT", "WAREHOUSE RENT")),
+    Merchant("Bank charges", "Bank charges", "37(1)", 1.0, ("BANK CHARGES", "SMS CHARGES", "SERVICE CHARGES", "ANNUAL FEE")),
+    Merchant("Computer hardware", "Depreciation on computers at 40%", "32", 0.40,
+             ("APPLE STORE", "APPLE INDIA", "MACBOOK", "DELL INTERNATIONAL", "DELL TECHNOLOGIES", "DELL INDIA", "LENOVO", "HP STORE")),
+    # Not business expenses: withdrawals, transfers, tax payments
+    Merchant("Cash withdrawal", "Cash withdrawal", "", 0.0, ("ATM", "ATM WDL", "CASH WITHDRAWAL", "CASH WDL")),
+    Merchant("Own transfer", "Transfer between own accounts", "", 0.0, ("SELF TRANSFER", "OWN ACCOUNT", "TO SELF")),
+    Merchant("Credit card bill", "Credit card bill payment", "", 0.0, ("CREDIT CARD PAYMENT", "CC PAYMENT", "CARD BILL")),
+    Merchant("Income tax", "Income tax and TDS (section 40(a)(ii))", "", 0.0, ("INCOME TAX", "ADVANCE TAX", "TDS PAYMENT", "ITNS 280")),
+    Merchant("GST payment", "GST paid (claimed as input tax credit, not an expense)", "", 0.0, ("GST PAYMENT", "GST CHALLAN", "GST PMT")),
+)
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]+")
+# Distinct descriptions remembered per matcher (statements repeat them a lot)
+_CACHE_SIZE = 100000
+
+
+def normalize_description(description: str) -> str:
+    """'Apple Store (Macbook)' -> ' APPLE STORE MACBOOK ' (padded so patterns match whole words)."""
+    return f" {_NON_ALNUM.sub(' ', description.upper()).strip()} "
+
+
+class MerchantMatcher:
+    """
+    Aho-Corasick automaton over every merchant pattern. One left-to-right
+    pass over a normalized description finds all patterns it contains,
+    however many merchants are known; the longest match wins, then a
+    non-deductible payment (section ""), then the merchant listed first.
+    Patterns are matched as whole words.
+    """
+
+    def __init__(self, merchants: Iterable[Merchant] = MERCHANTS):
+        self.merchants: List[Merchant] = list(merchants)
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # Best (pattern length, not deductible, -merchant index) ending at each node, following fail links
+        self.output: List[Optional[Tuple[int, bool, int]]] = [None]
+        for index, merchant in enumerate(self.merchants):
+            for pattern in merchant.patterns:
+                self._add(normalize_description(pattern), index)
+        self._link()
+        self._cache: Dict[str, Optional[Merchant]] = {}
+
+    def _add(self, pattern: str, index: int):
+        node = 0
+        for char in pattern:
+            child = self.goto[node].get(char)
+            if child is None:
+                child = len(self.goto)
+                self.goto[node][char] = child
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(None)
+            node = child
+        candidate = (len(pattern), not self.merchants[index].section, -index)
+        if self.output[node] is None or candidate > self.output[node]:
+            self.output[node] = candidate
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                inherited = self.output[self.fail[child]]
+                if inherited is not None and (self.output[child] is None or inherited > self.output[child]):
+                    self.output[child] = inherited
+
+    def match(self, description: str) -> Optional[Merchant]:
+        """The merchant a bank description belongs to, or None if no pattern occurs in it."""
+        text = normalize_description(description)
+        merchant = self._cache.get(text, False)
+        if merchant is not False:
+            return merchant
+        node, best = 0, None
+        goto, fail, output = self.goto, self.fail, self.output
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            found = output[node]
+            if found is not None and (best is None or found > best):
+                best = found
+        merchant = self.merchants[-best[2]] if best else None
+        if len(self._cache) < _CACHE_SIZE:
+            self._cache[text] = merchant
+        return merchant
+
+
+merchant_matcher = MerchantMatcher()
@@ -0,0 +1,98 @@
+import os
+from datetime import date
+from typing import Iterator, List, NamedTuple, Optional
+
+from backend_sme.utils.csv_stream import CSVStream, TEXT, parse_amount
+
+# Header aliases (lower-cased) used by Indian bank statement exports
+COLUMN_ALIASES = {
+    "date": ("date", "txn date", "transaction date", "value date", "tran date"),
+    "description": ("description", "narration", "particulars", "remarks", "transaction details", "transaction remarks"),
+    "reference": ("reference", "ref no", "ref no.", "reference no", "reference no.", "chq/ref no", "chq./ref.no.", "cheque no", "utr"),
+    "debit": ("debit", "withdrawal", "withdrawals", "withdrawal amt", "withdrawal amt.", "withdrawal amount", "debit amount", "dr"),
+    "credit": ("credit", "deposit", "deposits", "deposit amt", "deposit amt.", "deposit amount", "credit amount", "cr"),
+}
+TEXT_FIELDS = ("description", "reference")
+
+
+class Transaction(NamedTuple):
+    date: str  # ISO date when readable, else as written
+    description: str
+    reference: str
+    debit: float
+    credit: float
+    source: str
+    row: int
+
+
+def map_columns(header: List[str]) -> dict:
+    """Returns {field: column index} for the recognised columns of a header row."""
+    positions = {name.strip().strip('"').lower(): i for i, name in enumerate(header)}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in positions:
+                columns[field] = positions[alias]
+                break
+    return columns
+
+
+def is_statement(header: List[str]) -> bool:
+    columns = map_columns(header)
+    return "date" in columns and "description" in columns and ("debit" in columns or "credit" in columns)
+
+
+def transaction_from_row(row, columns: dict, source: str, line: int) -> Transaction:
+    """Builds a Transaction from a raw (str) or typed (CSVStream) row."""
+    def value(field: str):
+        i = columns.get(field)
+        return row[i] if i is not None and i < len(row) else None
+
+    def text(field: str) -> str:
+        v = value(field)
+        if v is None:
+            return ""
+        return v.isoformat() if isinstance(v, date) else str(v).strip()
+
+    def amount(field: str) -> float:
+        v = value(field)
+        if isinstance(v, float):
+            return abs(v)
+        return abs(parse_amount(v) or 0.0) if v else 0.0
+
+    return Transaction(
+        date=text("date"),
+        description=text("description"),
+        reference=text("reference"),
+        debit=amount("debit"),
+        credit=amount("credit"),
+        source=source,
+        row=line,
+    )
+
+
+def open_statement(file_path: str) -> Optional[CSVStream]:
+    """Opens a bank statement CSV as a typed CSVStream; None if the file is not one."""
+    if not file_path.lower().endswith(".csv"):
+        return None
+    stream = CSVStream(file_path, dtypes={alias: TEXT for field in TEXT_FIELDS for alias in COLUMN_ALIASES[field]})
+    if not stream.header or not is_statement(stream.header):
+        stream.close()
+        return None
+    return stream
+
+
+def iter_transactions(stream: CSVStream) -> Iterator[Transaction]:
+    """Yields the transactions of an opened stream batch by batch (constant memory)."""
+    columns = map_columns(stream.header)
+    source = os.path.basename(stream.file_path)
+    for batch in stream:
+        for offset, row in enumerate(batch.rows):
+            line = batch.first_line + offset
+            try:
+                transaction = transaction_from_row(row, columns, source, line)
+            except ValueError as e:
+                print(f"Skipping {source} line {line}: {e}")
+                continue
+            if transaction.description and (transaction.debit or transaction.credit):
+                yield transaction
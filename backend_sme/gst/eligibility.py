@@ -0,0 +1,77 @@
+import re
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class BlockedCredit(NamedTuple):
+    prefix: str  # HSN (goods) or SAC (services, starting with 99) prefix
+    section: str
+    reason: str
+
+
+# Section 17(5) CGST Act blocked credits that can be recognised from the HSN/SAC
+# of the purchase. Longer prefixes win, so exceptions can be listed as
+# BlockedCredit(prefix, "", "") entries. Exemptions that depend on the buyer's
+# business (e.g. car dealers, cab operators) still need a human look.
+BLOCKED_CREDITS = (
+    BlockedCredit("8703", "17(5)(a)", "Motor vehicles for transport of persons"),
+    BlockedCredit("8711", "17(5)(a)", "Motorcycles"),
+    BlockedCredit("8802", "17(5)(a)", "Aircraft"),
+    BlockedCredit("8903", "17(5)(a)", "Yachts and pleasure vessels"),
+    BlockedCredit("997133", "17(5)(ab)", "Motor vehicle insurance"),
+    BlockedCredit("998714", "17(5)(ab)", "Repair and maintenance of motor vehicles and transport equipment"),
+    BlockedCredit("9963", "17(5)(b)(i)", "Food, beverages and outdoor catering"),
+    BlockedCredit("996311", "", ""),  # hotel accommodation: not blocked
+    BlockedCredit("996601", "17(5)(b)(i)", "Rent-a-cab"),
+    BlockedCredit("99972", "17(5)(b)(i)", "Beauty treatment and fitness services"),
+    BlockedCredit("9993", "17(5)(b)(i)", "Health services and cosmetic surgery"),
+    BlockedCredit("997131", "17(5)(b)(iii)", "Life insurance"),
+    BlockedCredit("997132", "17(5)(b)(iii)", "Health insurance"),
+    BlockedCredit("9954", "17(5)(c)/(d)", "Works contract or construction of immovable property"),
+)
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_hsn(hsn: str) -> str:
+    """'8703 23 91' / '8703.23.91' -> '87032391'."""
+    return _NON_DIGITS.sub("", hsn or "")
+
+
+class HSNLookup:
+    """
+    Longest-prefix lookup of HSN/SAC codes against a rules table. Prefixes
+    are grouped by length once, so a lookup is one dict probe per distinct
+    prefix length (at most 8), longest first.
+    """
+
+    def __init__(self, rules: Sequence[BlockedCredit] = BLOCKED_CREDITS):
+        self.by_length: Dict[int, Dict[str, BlockedCredit]] = {}
+        for rule in rules:
+            self.by_length.setdefault(len(rule.prefix), {})[rule.prefix] = rule
+        self.lengths = sorted(self.by_length, reverse=True)
+
+    def lookup(self, hsn: str) -> Optional[BlockedCredit]:
+        """The blocking rule for `hsn`, or None if its credit is not blocked."""
+        code = normalize_hsn(hsn)
+        for length in self.lengths:
+            if len(code) >= length:
+                rule = self.by_length[length].get(code[:length])
+                if rule is not None:
+                    return rule if rule.section else None
+        return None
+
+    def blocked_rows(self, categories: List[str], codes: np.ndarray) -> Tuple[np.ndarray, List[Optional[BlockedCredit]]]:
+        """
+        Bulk version for an interned HSN column: looks up each distinct code
+        once, then selects the blocked rows with one array operation.
+        Returns (blocked row positions, rule per category).
+        """
+        rules = [self.lookup(hsn) for hsn in categories]
+        blocked = np.array([rule is not None for rule in rules], dtype=bool)
+        rows = np.flatnonzero(blocked[codes]) if len(codes) else np.empty(0, dtype=np.int64)
+        return rows, rules
+
+
+hsn_lookup = HSNLookup()
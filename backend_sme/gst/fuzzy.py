@@ -0,0 +1,207 @@
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Iterable, List, Optional
+
+from backend_sme.gst.invoices import Invoice
+
+# Largest edit distance (insert/delete/substitute/transpose) between normalized invoice numbers
+GST_FUZZY_MAX_DISTANCE = int(os.getenv("GST_FUZZY_MAX_DISTANCE", "2"))
+# Taxable value and total tax must agree within this fraction for a fuzzy match
+GST_FUZZY_AMOUNT_TOLERANCE = float(os.getenv("GST_FUZZY_AMOUNT_TOLERANCE", "0.01"))
+# Candidates (by shared n-grams) scored with edit distance per lookup
+GST_FUZZY_MAX_CANDIDATES = int(os.getenv("GST_FUZZY_MAX_CANDIDATES", "20"))
+
+NGRAM = 3
+# n-grams shared by more invoices than this in one block (e.g. "INV") carry no signal
+MAX_POSTINGS = 500
+
+_DATE_DMY = re.compile(r"^(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})")
+_DATE_YMD = re.compile(r"^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})")
+_TRAILING_NUMBER = re.compile(r"(\d+)\D*$")
+_NON_LETTERS = re.compile(r"[^A-Z]+")
+
+
+def invoice_period(invoice_date: str) -> str:
+    """'15-04-2024' / '2024-04-15' -> '2024-04'; '' if the date is unreadable."""
+    match = _DATE_DMY.match(invoice_date)
+    if match:
+        return f"{match.group(3)}-{int(match.group(2)):02d}"
+    match = _DATE_YMD.match(invoice_date)
+    if match:
+        return f"{match.group(1)}-{int(match.group(2)):02d}"
+    return ""
+
+
+def serial_number(invoice_no: str) -> str:
+    """Last group of digits of the raw invoice number: 'OS/2024/055' -> '55'."""
+    match = _TRAILING_NUMBER.search(invoice_no)
+    return (match.group(1).lstrip("0") or "0") if match else ""
+
+
+def series_letters(number: str) -> str:
+    """Letters of a normalized invoice number, i.e. its series: 'CN2024055' -> 'CN'."""
+    return _NON_LETTERS.sub("", number)
+
+
+def ngrams(text: str) -> set:
+    padded = f"^{text}$"
+    return {padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1))}
+
+
+def bounded_edit_distance(a: str, b: str, bound: int) -> int:
+    """
+    Optimal-string-alignment distance (adjacent transpositions count as one
+    edit), or bound + 1 as soon as the distance is known to exceed `bound`.
+    Only the diagonal band of width 2 * bound + 1 is computed.
+    """
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    if a == b:
+        return 0
+    # Invoice numbers usually differ in a few middle characters: trim the shared ends
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return len(a) + len(b) if len(a) + len(b) <= bound else bound + 1
+    over = bound + 1
+    previous2 = None
+    previous = [j if j <= bound else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= bound:
+            current[0] = i
+        ai = a[i - 1]
+        for j in range(max(1, i - bound), min(len(b), i + bound) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ai != b[j - 1]))
+            if previous2 is not None and j > 1 and ai == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = min(value, over)
+        if min(current) > bound:
+            return over
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _close(x: float, y: float, slack: float, tolerance: float) -> bool:
+    diff = abs(x - y)
+    return diff <= slack or diff <= tolerance * max(abs(x), abs(y))
+
+
+class _Block:
+    """Unmatched GSTR-2B invoices of one supplier and period, with an n-gram index."""
+
+    def __init__(self):
+        self.invoices = {}
+        self.amounts = {}
+        self.postings = defaultdict(set)
+        self.by_serial = defaultdict(set)
+
+    def add(self, slot: int, invoice: Invoice):
+        self.invoices[slot] = invoice
+        self.amounts[slot] = (invoice.taxable_value, invoice.tax)
+        number = invoice.key[1]
+        for gram in ngrams(number):
+            self.postings[gram].add(slot)
+        serial = serial_number(invoice.invoice_no)
+        if serial:
+            self.by_serial[serial].add(slot)
+
+    def remove(self, slot: int):
+        invoice = self.invoices.pop(slot)
+        del self.amounts[slot]
+        number = invoice.key[1]
+        for gram in ngrams(number):
+            self.postings[gram].discard(slot)
+        serial = serial_number(invoice.invoice_no)
+        if serial:
+            self.by_serial[serial].discard(slot)
+
+    def candidates(self, number: str, serial: str, limit: int) -> List[int]:
+        if len(self.invoices) <= limit:
+            return list(self.invoices)
+        shared = Counter()
+        for gram in ngrams(number):
+            slots = self.postings.get(gram)
+            if slots and len(slots) <= MAX_POSTINGS:
+                shared.update(slots)
+        # Same serial with a different prefix ("FY24/55" vs "55")
+        if serial:
+            shared.update(self.by_serial.get(serial, ()))
+        return [slot for slot, _ in shared.most_common(limit)]
+
+
+class FuzzyMatcher:
+    """
+    Finds near-miss GSTR-2B counterparts for register invoices that had no
+    exact (GSTIN, invoice number) match. Candidates are blocked by GSTIN and
+    invoice month, retrieved through shared character n-grams, and accepted
+    if the normalized invoice numbers are within a bounded edit distance (or
+    share the trailing serial number) and the amounts agree. Letter series
+    must agree too (within half the distance bound, or missing on one side),
+    so a credit or debit note (CN-5, DN-5) is never taken for INV-5. Each lookup
+    touches one block, so the whole pass stays near-linear in the number of
+    invoices. A GSTR-2B invoice is matched at most once.
+    """
+
+    def __init__(self, gstr2b: Iterable[Invoice], max_distance: int = GST_FUZZY_MAX_DISTANCE,
+                 amount_tolerance: float = GST_FUZZY_AMOUNT_TOLERANCE, max_candidates: int = GST_FUZZY_MAX_CANDIDATES,
+                 amount_slack: float = 1.0):
+        self.max_distance = max_distance
+        self.amount_tolerance = amount_tolerance
+        self.amount_slack = amount_slack  # absolute difference always accepted (Tolerance.absolute)
+        self.max_candidates = max_candidates
+        self.blocks = defaultdict(_Block)
+        self.periods = defaultdict(set)
+        for slot, invoice in enumerate(gstr2b):
+            period = invoice_period(invoice.invoice_date)
+            self.blocks[(invoice.gstin, period)].add(slot, invoice)
+            self.periods[invoice.gstin].add(period)
+
+    def _blocks_for(self, invoice: Invoice) -> list:
+        period = invoice_period(invoice.invoice_date)
+        if period and (invoice.gstin, period) in self.blocks:
+            keys = [(invoice.gstin, period), (invoice.gstin, "")]
+        else:
+            # Unknown or unseen period: fall back to the supplier's other periods
+            keys = [(invoice.gstin, p) for p in self.periods.get(invoice.gstin, ())]
+        return [self.blocks[key] for key in keys if key in self.blocks]
+
+    def match(self, invoice: Invoice) -> Optional[Invoice]:
+        """Best unique counterpart for `invoice`, removed from the index; None if there is none or it is a tie."""
+        number = invoice.key[1]
+        serial = serial_number(invoice.invoice_no)
+        letters = series_letters(number)
+        series_bound = self.max_distance // 2
+        taxable, tax = invoice.taxable_value, invoice.tax
+        slack, tolerance = self.amount_slack, self.amount_tolerance
+        scored = []
+        for block in self._blocks_for(invoice):
+            for slot in block.candidates(number, serial, self.max_candidates):
+                other_taxable, other_tax = block.amounts[slot]
+                if not (_close(taxable, other_taxable, slack, tolerance) and _close(tax, other_tax, slack, tolerance)):
+                    continue
+                candidate = block.invoices[slot]
+                other_letters = series_letters(candidate.key[1])
+                if letters and other_letters and bounded_edit_distance(letters, other_letters, series_bound) > series_bound:
+                    continue
+                distance = bounded_edit_distance(number, candidate.key[1], self.max_distance)
+                if distance > self.max_distance and not (serial and serial == serial_number(candidate.invoice_no)):
+                    continue
+                amount_gap = abs(taxable - other_taxable) + abs(tax - other_tax)
+                scored.append((distance, amount_gap, slot, block))
+
+        if not scored:
+            return None
+        scored.sort(key=lambda item: item[:2])
+        if len(scored) > 1 and scored[0][:2] == scored[1][:2]:
+            return None  # two equally good counterparts: let the agent decide
+        _, _, slot, block = scored[0]
+        counterpart = block.invoices[slot]
+        block.remove(slot)
+        return counterpart
@@ -0,0 +1,309 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from itertools import islice
+from typing import List, Optional
+
+from backend_sme.gst.fuzzy import invoice_period
+from backend_sme.gst.invoices import GSTR_2B, PURCHASE_REGISTER, Invoice
+from backend_sme.gst.reconciliation import ReconciliationResult, Tolerance
+from backend_sme.gst.sharding import reconcile_sharded
+from backend_sme.gst.sources import open_invoices
+from backend_sme.gst.table import InvoiceTableBuilder
+from backend_sme.models.schemas import IneligibleITCItem, MissingITCItem
+
+# SQLite file holding each client's reconciliation state. Empty disables it.
+GST_INDEX_DB = os.getenv("GST_INDEX_DB", "data/gst_index.db")
+
+OPEN = "open"
+MATCHED = "matched"
+_INSERT_CHUNK = 500
+
+_INVOICE_COLUMNS = (
+    "gstin", "invoice_no", "number", "invoice_date", "party", "taxable_value",
+    "igst", "cgst", "sgst", "cess", "invoice_value", "source", "row", "hsn",
+)
+# Columns added after the first release of the schema: name -> SQL type
+_LATER_COLUMNS = {"hsn": "TEXT", "ineligible": "REAL", "section": "TEXT"}
+
+
+def file_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(invoice: Invoice) -> str:
+    """Identity of an invoice line across uploads (same bill exported again next month)."""
+    return f"{invoice.gstin}|{invoice.key[1]}|{invoice.invoice_date}|{invoice.taxable_value:.2f}|{invoice.tax:.2f}"
+
+
+def _invoice(row: tuple) -> Invoice:
+    gstin, invoice_no, number, invoice_date, party, taxable, igst, cgst, sgst, cess, value, source, line, hsn = row
+    return Invoice(gstin, invoice_no, (gstin, number), invoice_date, party, taxable, igst, cgst, sgst, cess, value,
+                   source, line, hsn or "")
+
+
+class ReconciliationIndex:
+    """
+    Persisted GSTR-2B / purchase register reconciliation state per client.
+    Every invoice line ever uploaded is stored once, either `open` (register
+    invoices not yet found in any GSTR-2B, GSTR-2B lines nobody claimed yet)
+    or `matched` to its counterpart. A run ingests only files it has not seen
+    (by content hash) and lines it has not stored, then reconciles the open
+    set, so a bill booked in April and filed by the supplier in June is
+    matched when June's GSTR-2B arrives. The work per run grows with the new
+    uploads and the open items, not with the client's history.
+    """
+
+    def __init__(self, db_path: str = GST_INDEX_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        # The file and schema are created on first use, not at import
+        if not self._ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with sqlite3.connect(self.db_path, timeout=5) as conn:
+                self._create_schema(conn)
+            self._ready = True
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    @staticmethod
+    def _create_schema(conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS gst_files ("
+            "client_id TEXT NOT NULL, file_hash TEXT NOT NULL, filename TEXT NOT NULL, kind TEXT NOT NULL, "
+            "rows INTEGER NOT NULL, ingested_at REAL NOT NULL, PRIMARY KEY (client_id, file_hash))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS gst_invoices ("
+            "id INTEGER PRIMARY KEY, client_id TEXT NOT NULL, side TEXT NOT NULL, status TEXT NOT NULL, "
+            "gstin TEXT NOT NULL, invoice_no TEXT NOT NULL, number TEXT NOT NULL, invoice_date TEXT, period TEXT, "
+            "party TEXT, taxable_value REAL, igst REAL, cgst REAL, sgst REAL, cess REAL, invoice_value REAL, "
+            "source TEXT, row INTEGER, file_hash TEXT, fingerprint TEXT NOT NULL, "
+            "matched_with INTEGER, shortfall REAL, reason TEXT, matched_at REAL)"
+        )
+        present = {row[1] for row in conn.execute("PRAGMA table_info(gst_invoices)")}
+        for column, sql_type in _LATER_COLUMNS.items():
+            if column not in present:
+                conn.execute(f"ALTER TABLE gst_invoices ADD COLUMN {column} {sql_type}")
+        conn.execute("CREATE INDEX IF NOT EXISTS gst_invoices_open ON gst_invoices (client_id, status, side)")
+        conn.execute("CREATE INDEX IF NOT EXISTS gst_invoices_fingerprint ON gst_invoices (client_id, side, fingerprint)")
+
+    def ingest(self, client_id: str, file_path: str) -> int:
+        """
+        Stores the invoices of a GSTR-2B / purchase register CSV or a portal
+        GSTR-2B JSON as open items. Returns the number of new lines; 0 for files seen before or
+        files that are not invoice lists. A file uploaded again under the same
+        name with other content (a corrected register) supersedes the earlier
+        version: its lines that are not in the new file are retired.
+        """
+        digest = file_hash(file_path)
+        filename = os.path.basename(file_path)
+        with self._lock, self._connect() as conn:
+            seen = conn.execute(
+                "SELECT 1 FROM gst_files WHERE client_id = ? AND file_hash = ?", (client_id, digest)
+            ).fetchone()
+            if seen:
+                return 0
+            kind, invoices = open_invoices(file_path)
+            if kind is None:
+                return 0
+            superseded = [
+                row[0] for row in conn.execute(
+                    "SELECT file_hash FROM gst_files WHERE client_id = ? AND filename = ?", (client_id, filename)
+                )
+            ]
+            added = 0
+            while True:
+                chunk = list(islice(invoices, _INSERT_CHUNK))
+                if not chunk:
+                    break
+                added += self._insert(conn, client_id, kind, digest, chunk, superseded)
+            if superseded:
+                self._retire(conn, client_id, superseded)
+            conn.execute(
+                "INSERT INTO gst_files (client_id, file_hash, filename, kind, rows, ingested_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (client_id, digest, filename, kind, added, time.time()),
+            )
+        return added
+
+    def _insert(self, conn, client_id: str, kind: str, digest: str, invoices: List[Invoice],
+                superseded: List[str] = ()) -> int:
+        prints = [fingerprint(invoice) for invoice in invoices]
+        # Lines already stored from an earlier file (cumulative exports re-list old bills)
+        known = {
+            row[0] for row in conn.execute(
+                f"SELECT fingerprint FROM gst_invoices WHERE client_id = ? AND side = ? AND file_hash != ? "
+                f"AND fingerprint IN ({','.join('?' * len(prints))})",
+                (client_id, kind, digest, *prints),
+            )
+        }
+        if superseded:
+            # Lines the new version keeps move over to it, with their match state
+            conn.execute(
+                f"UPDATE gst_invoices SET file_hash = ? WHERE client_id = ? AND side = ? "
+                f"AND file_hash IN ({','.join('?' * len(superseded))}) AND fingerprint IN ({','.join('?' * len(prints))})",
+                (digest, client_id, kind, *superseded, *prints),
+            )
+        rows = [
+            (client_id, kind, OPEN, invoice.gstin, invoice.invoice_no, invoice.key[1], invoice.invoice_date,
+             invoice_period(invoice.invoice_date), invoice.party, invoice.taxable_value, invoice.igst, invoice.cgst,
+             invoice.sgst, invoice.cess, invoice.invoice_value, invoice.source, invoice.row, invoice.hsn, digest, fp)
+            for invoice, fp in zip(invoices, prints) if fp not in known
+        ]
+        conn.executemany(
+            "INSERT INTO gst_invoices (client_id, side, status, gstin, invoice_no, number, invoice_date, period, party, "
+            "taxable_value, igst, cgst, sgst, cess, invoice_value, source, row, hsn, file_hash, fingerprint) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        return len(rows)
+
+    @staticmethod
+    def _retire(conn, client_id: str, hashes: List[str]):
+        """Deletes the lines left on superseded file versions and reopens their counterparts."""
+        marks = ",".join("?" * len(hashes))
+        conn.execute(
+            "UPDATE gst_invoices SET status = ?, matched_with = NULL, shortfall = NULL, reason = NULL, "
+            "ineligible = NULL, section = NULL, matched_at = NULL WHERE client_id = ? AND matched_with IN "
+            f"(SELECT id FROM gst_invoices WHERE client_id = ? AND file_hash IN ({marks}))",
+            (OPEN, client_id, client_id, *hashes),
+        )
+        conn.execute(f"DELETE FROM gst_invoices WHERE client_id = ? AND file_hash IN ({marks})", (client_id, *hashes))
+        conn.execute(f"DELETE FROM gst_files WHERE client_id = ? AND file_hash IN ({marks})", (client_id, *hashes))
+
+    def _open(self, conn, client_id: str, side: str):
+        ids, builder = [], InvoiceTableBuilder()
+        cursor = conn.execute(
+            f"SELECT id, {', '.join(_INVOICE_COLUMNS)} FROM gst_invoices "
+            "WHERE client_id = ? AND side = ? AND status = ? ORDER BY id",
+            (client_id, side, OPEN),
+        )
+        for row in cursor:
+            ids.append(row[0])
+            builder.add(_invoice(row[1:]))
+        return ids, builder.build()
+
+    def reconcile(self, client_id: str, tolerance: Optional[Tolerance] = None,
+                  workers: Optional[int] = None) -> Optional[ReconciliationResult]:
+        """
+        Reconciles the client's open register items against the open GSTR-2B
+        lines and records the new matches. The result's missing_itc and
+        ineligible_itc also carry the mismatches and blocked credits of
+        invoices matched in earlier runs, so a response always lists
+        everything still outstanding. None if the client has
+        never uploaded one of the two documents.
+        """
+        with self._lock, self._connect() as conn:
+            sides = conn.execute("SELECT COUNT(DISTINCT side) FROM gst_invoices WHERE client_id = ?", (client_id,)).fetchone()[0]
+            if sides < 2:
+                return None
+            gstr2b_ids, gstr2b = self._open(conn, client_id, GSTR_2B)
+            register_ids, register = self._open(conn, client_id, PURCHASE_REGISTER)
+            earlier = [
+                MissingITCItem(invoice_no=invoice_no, gstin=gstin, amount=shortfall, reason=reason)
+                for invoice_no, gstin, shortfall, reason in conn.execute(
+                    "SELECT invoice_no, gstin, shortfall, reason FROM gst_invoices "
+                    "WHERE client_id = ? AND side = ? AND status = ? AND shortfall > 0 ORDER BY id",
+                    (client_id, PURCHASE_REGISTER, MATCHED),
+                )
+            ]
+            earlier_ineligible = [
+                IneligibleITCItem(invoice_no=invoice_no, gstin=gstin, amount=amount, hsn=hsn, section=section, reason=reason)
+                for invoice_no, gstin, amount, hsn, section, reason in conn.execute(
+                    "SELECT invoice_no, gstin, ineligible, hsn, section, reason FROM gst_invoices "
+                    "WHERE client_id = ? AND side = ? AND status = ? AND ineligible > 0 ORDER BY id",
+                    (client_id, PURCHASE_REGISTER, MATCHED),
+                )
+            ]
+
+            # Earlier matches from the open items' suppliers, for duplicate detection
+            gstins = sorted(set(register.gstins))
+            settled = conn.execute(
+                "SELECT gstin, taxable_value, igst + cgst + sgst + cess FROM gst_invoices "
+                f"WHERE client_id = ? AND side = ? AND status = ? AND gstin IN ({','.join('?' * len(gstins))})",
+                (client_id, PURCHASE_REGISTER, MATCHED, *gstins),
+            ).fetchall() if gstins else []
+
+            result = reconcile_sharded(gstr2b, register, tolerance, settled=settled, workers=workers)
+            now = time.time()
+            updates = []
+            for r, g in result.matched_pairs.tolist():
+                item, blocked = result.mismatches.get(r), result.ineligible.get(r)
+                reason = item.reason if item else blocked.reason if blocked else None
+                updates.append((MATCHED, gstr2b_ids[g], item.amount if item else 0.0, reason,
+                                blocked.amount if blocked else 0.0, blocked.section if blocked else None, now, register_ids[r]))
+                updates.append((MATCHED, register_ids[r], 0.0, None, 0.0, None, now, gstr2b_ids[g]))
+            conn.executemany(
+                "UPDATE gst_invoices SET status = ?, matched_with = ?, shortfall = ?, reason = ?, "
+                "ineligible = ?, section = ?, matched_at = ? WHERE id = ?",
+                updates,
+            )
+        result.missing_itc[:0] = earlier
+        result.ineligible_itc[:0] = earlier_ineligible
+        return result
+
+    def vendor_history(self, client_id: str) -> dict:
+        """
+        Per-supplier totals over every invoice line the client ever uploaded,
+        open and matched, for vendor_report(): register lines by (GSTIN,
+        period) with the first party name, invoices, tax and matches, GSTR-2B
+        lines by GSTIN, and the period of each outstanding register invoice.
+        """
+        with self._connect() as conn:
+            register = conn.execute(
+                "SELECT gstin, period, party, MIN(id), COUNT(*), SUM(igst + cgst + sgst + cess), SUM(status = ?) "
+                "FROM gst_invoices WHERE client_id = ? AND side = ? GROUP BY gstin, period ORDER BY gstin, period",
+                (MATCHED, client_id, PURCHASE_REGISTER),
+            ).fetchall()
+            gstr2b = conn.execute(
+                "SELECT gstin, party, MIN(id), COUNT(*), SUM(igst + cgst + sgst + cess) "
+                "FROM gst_invoices WHERE client_id = ? AND side = ? GROUP BY gstin ORDER BY gstin",
+                (client_id, GSTR_2B),
+            ).fetchall()
+            periods = {
+                (gstin, invoice_no): period
+                for gstin, invoice_no, period in conn.execute(
+                    "SELECT gstin, invoice_no, period FROM gst_invoices "
+                    "WHERE client_id = ? AND side = ? AND (status = ? OR shortfall > 0)",
+                    (client_id, PURCHASE_REGISTER, OPEN),
+                )
+            }
+        return {
+            "register": [(gstin, period, party, invoices, tax, matched)
+                         for gstin, period, party, _, invoices, tax, matched in register],
+            "gstr2b": [(gstin, party, invoices, tax) for gstin, party, _, invoices, tax in gstr2b],
+            "periods": periods,
+        }
+
+    def forget(self, client_id: str):
+        """Drops a client's state; the next run starts from its uploads again."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM gst_invoices WHERE client_id = ?", (client_id,))
+            conn.execute("DELETE FROM gst_files WHERE client_id = ?", (client_id,))
+
+    def stats(self, client_id: str) -> dict:
+        """Files ingested and open/matched line counts per side and invoice month."""
+        with self._connect() as conn:
+            files = conn.execute("SELECT COUNT(*) FROM gst_files WHERE client_id = ?", (client_id,)).fetchone()[0]
+            rows = conn.execute(
+                "SELECT side, status, period, COUNT(*) FROM gst_invoices WHERE client_id = ? "
+                "GROUP BY side, status, period ORDER BY side, status, period",
+                (client_id,),
+            ).fetchall()
+        sides = {}
+        for side, status, period, count in rows:
+            by_status = sides.setdefault(side, {}).setdefault(status, {"total": 0, "by_period": {}})
+            by_status["total"] += count
+            by_status["by_period"][period or "unknown"] = count
+        return {"files": files, "invoices": sides}
+
+
+gst_index = ReconciliationIndex() if GST_INDEX_DB else None
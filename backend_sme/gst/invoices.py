@@ -0,0 +1,183 @@
+import os
+import re
+from datetime import date
+from typing import Iterator, List, NamedTuple, Optional
+
+from backend_sme.gst.eligibility import normalize_hsn
+from backend_sme.utils.csv_stream import CSVStream, TEXT, parse_amount as _parse_amount
+
+GSTR_2B = "gstr_2b"
+PURCHASE_REGISTER = "purchase_register"
+
+# Header aliases (lower-cased) for the GSTR-2B export and the purchase register
+COLUMN_ALIASES = {
+    "gstin": ("gstin", "gstin of supplier", "supplier gstin", "ctin"),
+    "invoice_no": ("invoice number", "invoice no", "invoice no.", "inv no", "bill no"),
+    "invoice_date": ("invoice date", "date", "bill date"),
+    "party": ("trade/legal name", "vendor name", "supplier name", "party name"),
+    "taxable_value": ("taxable value", "taxable amount"),
+    "igst": ("igst", "integrated tax"),
+    "cgst": ("cgst", "central tax"),
+    "sgst": ("sgst", "state/ut tax", "sgst/utgst"),
+    "cess": ("cess",),
+    "invoice_value": ("invoice value", "total amount", "invoice amount"),
+    "hsn": ("hsn/sac", "hsn", "sac", "hsn code", "sac code", "hsn/sac code"),
+}
+REQUIRED_COLUMNS = ("gstin", "invoice_no", "taxable_value")
+TEXT_FIELDS = ("gstin", "invoice_no", "party", "hsn")
+
+# Columns only one of the two documents has
+GSTR_2B_MARKERS = {"trade/legal name", "invoice value", "gstin of supplier", "ctin"}
+REGISTER_MARKERS = {"vendor name", "total amount", "taxable amount", "bill no"}
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+_LEADING_ZEROS = re.compile(r"(?<![0-9])0+(?=[0-9])")
+# File names of the two documents; 2A/2B only as a word of their own, not inside an ID
+_GSTR_2B_NAME = re.compile(r"(?<![a-z0-9])(gstr|2[ab](?![a-z0-9]))")
+_REGISTER_NAME = re.compile(r"purchase|register|books")
+
+
+class Invoice(NamedTuple):
+    gstin: str
+    invoice_no: str
+    key: tuple  # (GSTIN, normalized invoice number)
+    invoice_date: str
+    party: str
+    taxable_value: float
+    igst: float
+    cgst: float
+    sgst: float
+    cess: float
+    invoice_value: float
+    source: str
+    row: int
+    hsn: str = ""  # HSN/SAC digits, if the file has the column
+
+    @property
+    def tax(self) -> float:
+        return self.igst + self.cgst + self.sgst + self.cess
+
+
+def normalize_gstin(gstin: str) -> str:
+    return gstin.strip().upper()
+
+
+def normalize_invoice_no(invoice_no: str) -> str:
+    """'inv/001', 'INV-001' and 'INV 1' all normalize to 'INV1'."""
+    return _LEADING_ZEROS.sub("", _NON_ALNUM.sub("", invoice_no.upper()))
+
+
+def parse_amount(value: str) -> float:
+    return _parse_amount(value) or 0.0
+
+
+def map_columns(header: List[str]) -> dict:
+    """Returns {field: column index} for the recognised columns of a header row."""
+    positions = {name.strip().strip('"').lower(): i for i, name in enumerate(header)}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in positions:
+                columns[field] = positions[alias]
+                break
+    return columns
+
+
+def detect_document(filename: str, header: List[str]) -> Optional[str]:
+    """
+    GSTR_2B, PURCHASE_REGISTER or None if the file is not an invoice list.
+    The header columns decide; the file name is only a fallback, as uploads
+    may carry a prefix (chat files are saved as '{session_id}_{name}').
+    """
+    columns = map_columns(header)
+    if not all(field in columns for field in REQUIRED_COLUMNS):
+        return None
+    names = {col.strip().strip('"').lower() for col in header}
+    if names & GSTR_2B_MARKERS:
+        return GSTR_2B
+    if names & REGISTER_MARKERS:
+        return PURCHASE_REGISTER
+    name = os.path.basename(filename).lower()
+    if _GSTR_2B_NAME.search(name):
+        return GSTR_2B
+    if _REGISTER_NAME.search(name):
+        return PURCHASE_REGISTER
+    return None
+
+
+def invoice_from_row(row, columns: dict, source: str, line: int) -> Invoice:
+    """Builds an Invoice from a raw (str) or typed (CSVStream) row."""
+    def text(field: str) -> str:
+        i = columns.get(field)
+        value = row[i] if i is not None and i < len(row) else None
+        if value is None:
+            return ""
+        return value.isoformat() if isinstance(value, date) else str(value).strip()
+
+    def amount(field: str) -> float:
+        i = columns.get(field)
+        value = row[i] if i is not None and i < len(row) else None
+        if isinstance(value, float):
+            return value
+        return parse_amount(value) if value else 0.0
+
+    gstin = normalize_gstin(text("gstin"))
+    invoice_no = text("invoice_no")
+    return Invoice(
+        gstin=gstin,
+        invoice_no=invoice_no,
+        key=(gstin, normalize_invoice_no(invoice_no)),
+        invoice_date=text("invoice_date"),
+        party=text("party"),
+        taxable_value=amount("taxable_value"),
+        igst=amount("igst"),
+        cgst=amount("cgst"),
+        sgst=amount("sgst"),
+        cess=amount("cess"),
+        invoice_value=amount("invoice_value"),
+        source=source,
+        row=line,
+        hsn=normalize_hsn(text("hsn")),
+    )
+
+
+def open_invoice_stream(file_path: str):
+    """
+    Opens a CSV as a typed CSVStream and classifies it. Returns (document
+    type, stream), or (None, None) if the file is not a GSTR-2B or purchase
+    register. Identifier columns are always read as text.
+    """
+    stream = CSVStream(file_path, dtypes={alias: TEXT for field in TEXT_FIELDS for alias in COLUMN_ALIASES[field]})
+    kind = detect_document(file_path, stream.header) if stream.header else None
+    if kind is None:
+        stream.close()
+        return None, None
+    return kind, stream
+
+
+def iter_invoices(stream: CSVStream) -> Iterator[Invoice]:
+    """Yields the invoices of an opened stream batch by batch (constant memory)."""
+    columns = map_columns(stream.header)
+    source = os.path.basename(stream.file_path)
+    for batch in stream:
+        for offset, row in enumerate(batch.rows):
+            line = batch.first_line + offset
+            try:
+                invoice = invoice_from_row(row, columns, source, line)
+            except ValueError as e:
+                print(f"Skipping {source} line {line}: {e}")
+                continue
+            if invoice.gstin and invoice.key[1]:
+                yield invoice
+
+
+def load_invoices(file_path: str):
+    """
+    Reads a GSTR-2B or purchase register CSV. Returns (document type,
+    invoices), or (None, []) if the file does not look like either. Rows
+    without a GSTIN or invoice number, or with unreadable amounts, are skipped.
+    """
+    kind, stream = open_invoice_stream(file_path)
+    if kind is None:
+        return None, []
+    return kind, list(iter_invoices(stream))
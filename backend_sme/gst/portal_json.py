@@ -0,0 +1,235 @@
+import json
+import os
+from typing import Iterator, Optional
+
+from backend_sme.gst.invoices import Invoice, normalize_gstin, normalize_invoice_no
+from backend_sme.utils.csv_stream import parse_date
+
+# Characters read from the file at a time
+CHUNK_SIZE = 1 << 16
+# Keys whose objects are descended into on the way to docdata.b2b
+CONTAINER_KEYS = ("data", "docdata")
+# Amount keys of an item: GSTR-2B ("items") first, GSTR-2A / GSTR-1 ("itms[].itm_det") second
+ITEM_AMOUNTS = {
+    "taxable_value": ("txval",),
+    "igst": ("igst", "iamt"),
+    "cgst": ("cgst", "camt"),
+    "sgst": ("sgst", "samt"),
+    "cess": ("cess", "csamt"),
+}
+PORTAL_HEADER = "GSTIN,Trade/Legal Name,Invoice Number,Invoice Date,Invoice Value,Taxable Value,IGST,CGST,SGST,Cess"
+
+_WHITESPACE = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """
+    Pull parser over a JSON file read in chunks. Objects and arrays are
+    walked key by key / element by element; only values explicitly asked
+    for with value() are decoded, and only the unread part of the buffer is
+    kept when the next chunk is read.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in JSON, found {self.peek()!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decodes the complete value at the cursor (refilling until it is whole)."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number or literal touching the end of the chunk may continue in the next one
+            if end < len(self.buffer) or self.eof or not self._fill():
+                self.pos = end
+                return value
+
+    def keys(self) -> Iterator[str]:
+        """Walks an object: yields each key with the cursor on its value, which the caller must consume."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return
+
+    def elements(self) -> Iterator[None]:
+        """Walks an array: yields once per element with the cursor on it, which the caller must consume."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+    def skip(self):
+        """Consumes the value at the cursor without building it if it is a container."""
+        char = self.peek()
+        if char == "{":
+            for _ in self.keys():
+                self.skip()
+        elif char == "[":
+            for _ in self.elements():
+                self.skip()
+        else:
+            self.value()
+
+
+def _amount(item: dict, keys: tuple) -> float:
+    for key in keys:
+        if key in item:
+            return float(item[key] or 0)
+    return 0.0
+
+
+def _iso(day: str) -> str:
+    try:
+        parsed = parse_date(day)
+    except ValueError:
+        parsed = None
+    return parsed.isoformat() if parsed else day
+
+
+def invoice_from_portal(ctin: str, trade_name: str, inv: dict, source: str, row: int) -> Invoice:
+    """One GSTR-2B invoice record with its items summed into the CSV row model."""
+    items = inv.get("items") or [item.get("itm_det", item) for item in inv.get("itms", [])]
+    totals = {field: sum(_amount(item, keys) for item in items) for field, keys in ITEM_AMOUNTS.items()}
+    gstin = normalize_gstin(ctin)
+    invoice_no = str(inv.get("inum", "")).strip()
+    return Invoice(
+        gstin=gstin,
+        invoice_no=invoice_no,
+        key=(gstin, normalize_invoice_no(invoice_no)),
+        invoice_date=_iso(str(inv.get("dt", "") or inv.get("idt", ""))),
+        party=trade_name,
+        invoice_value=float(inv.get("val") or 0),
+        source=source,
+        row=row,
+        **totals,
+    )
+
+
+def iter_portal_invoices(file_path: str) -> Iterator[Invoice]:
+    """
+    Yields the B2B invoices of a GSTR-2B (or GSTR-2A) JSON downloaded from
+    the GST portal, docdata.b2b[].inv[] flattened to one Invoice per
+    invoice. The file is read incrementally: at any time only one invoice
+    record (and a supplier's invoices, if its ctin comes after them) is
+    held. Other sections (cdnr, isd, impg, ...) are skipped unread.
+    """
+    source = os.path.basename(file_path)
+    count = 0
+
+    def convert(fields: dict, inv: dict) -> Optional[Invoice]:
+        nonlocal count
+        count += 1
+        invoice = invoice_from_portal(fields["ctin"], fields.get("trdnm", ""), inv, source, count)
+        return invoice if invoice.gstin and invoice.key[1] else None
+
+    def supplier() -> Iterator[Invoice]:
+        fields, pending = {}, []
+        for key in reader.keys():
+            if key == "inv" and reader.peek() == "[":
+                for _ in reader.elements():
+                    inv = reader.value()
+                    if not isinstance(inv, dict):
+                        continue
+                    if "ctin" not in fields:
+                        pending.append(inv)
+                        continue
+                    invoice = convert(fields, inv)
+                    if invoice:
+                        yield invoice
+            elif key in ("ctin", "trdnm"):
+                fields[key] = str(reader.value())
+            else:
+                reader.skip()
+        if "ctin" in fields:
+            for invoice in filter(None, (convert(fields, inv) for inv in pending)):
+                yield invoice
+
+    def container() -> Iterator[Invoice]:
+        for key in reader.keys():
+            if key in CONTAINER_KEYS and reader.peek() == "{":
+                yield from container()
+            elif key == "b2b" and reader.peek() == "[":
+                for _ in reader.elements():
+                    if reader.peek() == "{":
+                        yield from supplier()
+                    else:
+                        reader.skip()
+            else:
+                reader.skip()
+
+    with open(file_path, "r", encoding="utf-8-sig", errors="ignore") as f:
+        reader = _Reader(f)
+        if reader.peek() == "{":
+            yield from container()
+
+
+def is_portal_json(file_path: str, probe: int = 4096) -> bool:
+    """Cheap check on the head of a .json file for the portal's GSTR-2A/2B layout."""
+    if not file_path.lower().endswith(".json"):
+        return False
+    with open(file_path, "r", encoding="utf-8-sig", errors="ignore") as f:
+        head = f.read(probe)
+    return '"docdata"' in head or '"b2b"' in head
+
+
+def portal_rows(file_path: str, max_chars: Optional[int] = None) -> str:
+    """Portal JSON as compact GSTR-2B CSV text for prompts, cut at max_chars."""
+    lines, size = [PORTAL_HEADER], len(PORTAL_HEADER)
+    for i in iter_portal_invoices(file_path):
+        line = (f"{i.gstin},{i.party},{i.invoice_no},{i.invoice_date},{i.invoice_value:.2f},"
+                f"{i.taxable_value:.2f},{i.igst:.2f},{i.cgst:.2f},{i.sgst:.2f},{i.cess:.2f}")
+        if max_chars and size + len(line) > max_chars:
+            lines.append(f"[... truncated after {len(lines) - 1} invoices ...]")
+            break
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
@@ -0,0 +1,307 @@
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from backend_sme.agents.gst_agent import run_gst_agent
+from backend_sme.gst.eligibility import HSNLookup, hsn_lookup
+from backend_sme.gst.fuzzy import FuzzyMatcher
+from backend_sme.gst.invoices import Invoice, normalize_gstin, normalize_invoice_no
+from backend_sme.gst.table import InvoiceTable, as_table
+from backend_sme.models.schemas import GSTMatcherResponse, IneligibleITCItem, MissingITCItem
+from backend_sme.utils.resilience import LLMError
+
+# Amounts are equal if they differ by at most max(absolute, relative * larger amount)
+GST_ABS_TOLERANCE = float(os.getenv("GST_ABS_TOLERANCE", "1.0"))
+GST_REL_TOLERANCE = float(os.getenv("GST_REL_TOLERANCE", "0.0"))
+# Most ambiguous invoices sent to the LLM in one reconciliation
+GST_LLM_MAX_RESIDUE = int(os.getenv("GST_LLM_MAX_RESIDUE", "200"))
+# Match near-miss invoice numbers (typos, transposed digits) before giving up on an invoice
+GST_FUZZY_MATCHING = os.getenv("GST_FUZZY_MATCHING", "true").lower() == "true"
+
+COMPARED_FIELDS = ("taxable_value", "igst", "cgst", "sgst")
+_NO_PAIRS = np.empty((0, 2), dtype=np.int64)
+
+
+class Tolerance(NamedTuple):
+    absolute: float = GST_ABS_TOLERANCE
+    relative: float = GST_REL_TOLERANCE
+
+    def within(self, a: float, b: float) -> bool:
+        diff = abs(a - b)
+        return diff <= self.absolute or diff <= self.relative * max(abs(a), abs(b))
+
+    def within_all(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Element-wise within() for arrays."""
+        diff = np.abs(a - b)
+        return (diff <= self.absolute) | (diff <= self.relative * np.maximum(np.abs(a), np.abs(b)))
+
+
+@dataclass
+class ReconciliationResult:
+    register: Optional[InvoiceTable] = None
+    gstr2b: Optional[InvoiceTable] = None
+    # (register row, GSTR-2B row) positions in the tables above
+    matched_pairs: np.ndarray = field(default_factory=lambda: _NO_PAIRS)
+    fuzzy_pairs: np.ndarray = field(default_factory=lambda: _NO_PAIRS)  # subset of matched_pairs
+    unmatched_rows: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))  # GSTR-2B rows
+    # Register rows whose invoice value is not taxable value + taxes, or matched
+    # to a GSTR-2B invoice with other amounts but at least the booked tax
+    inconsistent_rows: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    missing_itc: List[MissingITCItem] = field(default_factory=list)
+    # Register row -> its entry in missing_itc, for matched pairs with different amounts
+    mismatches: Dict[int, MissingITCItem] = field(default_factory=dict)
+    # Register invoices the rules cannot decide (e.g. same supplier has unmatched 2B invoices)
+    ambiguous: List[Invoice] = field(default_factory=list)
+    # Register invoices whose credit is blocked (Section 17(5)), matched or not
+    ineligible_itc: List[IneligibleITCItem] = field(default_factory=list)
+    ineligible: Dict[int, IneligibleITCItem] = field(default_factory=dict)  # register row -> item
+
+    def _pairs(self, pairs: np.ndarray) -> List[Tuple[Invoice, Invoice]]:
+        return [(self.register.invoice(r), self.gstr2b.invoice(g)) for r, g in pairs.tolist()]
+
+    @property
+    def matched(self) -> List[Tuple[Invoice, Invoice]]:  # (register, GSTR-2B)
+        return self._pairs(self.matched_pairs)
+
+    @property
+    def fuzzy_matched(self) -> List[Tuple[Invoice, Invoice]]:
+        return self._pairs(self.fuzzy_pairs)
+
+    @property
+    def unmatched_2b(self) -> List[Invoice]:
+        return self.gstr2b.invoices(self.unmatched_rows) if self.gstr2b is not None else []
+
+    @property
+    def total_itc_missed(self) -> float:
+        return round(float(np.sum([item.amount for item in self.missing_itc])), 2)
+
+    @property
+    def total_itc_ineligible(self) -> float:
+        return round(float(np.sum([item.amount for item in self.ineligible_itc])), 2)
+
+    def summary(self) -> dict:
+        return {
+            "matched": len(self.matched_pairs),
+            "fuzzy_matched": len(self.fuzzy_pairs),
+            "missing_itc": len(self.missing_itc),
+            "ambiguous": len(self.ambiguous),
+            "unmatched_2b": len(self.unmatched_rows),
+            "inconsistent_values": len(self.inconsistent_rows),
+            "ineligible_itc": len(self.ineligible_itc),
+            "total_itc_missed": self.total_itc_missed,
+            "total_itc_ineligible": self.total_itc_ineligible,
+        }
+
+    def to_response(self) -> GSTMatcherResponse:
+        return GSTMatcherResponse(
+            missing_itc=self.missing_itc,
+            total_itc_missed=self.total_itc_missed,
+            ineligible_itc=self.ineligible_itc,
+            total_itc_ineligible=self.total_itc_ineligible,
+        )
+
+
+def _missing(invoice: Invoice, amount: float, reason: str) -> MissingITCItem:
+    return MissingITCItem(invoice_no=invoice.invoice_no, gstin=invoice.gstin, amount=round(amount, 2), reason=reason)
+
+
+def _mismatch_reason(register: Invoice, gstr2b: Invoice, fields: List[str]) -> str:
+    details = ", ".join(f"{name} {getattr(register, name):.2f} in books vs {getattr(gstr2b, name):.2f} in GSTR-2B" for name in fields)
+    return f"Amount mismatch: {details}"
+
+
+def _compare(result: ReconciliationResult, pairs: np.ndarray, tolerance: Tolerance, fuzzy: bool = False):
+    """
+    Compares the amounts of all `pairs` at once and records a MissingITCItem
+    for the tax shortfall of each pair with a field out of tolerance (unless
+    the register invoice's credit is blocked anyway). Pairs where GSTR-2B
+    carries at least the booked tax lose no credit; they are only added to
+    inconsistent_rows.
+    """
+    if not len(pairs):
+        return
+    register, gstr2b = result.register, result.gstr2b
+    books = register.amounts[pairs[:, 0], :len(COMPARED_FIELDS)]
+    filed = gstr2b.amounts[pairs[:, 1], :len(COMPARED_FIELDS)]
+    ok = tolerance.within_all(books, filed)
+    bad = np.flatnonzero(~ok.all(axis=1))
+    if result.ineligible:
+        bad = bad[~np.isin(pairs[bad, 0], list(result.ineligible))]
+    shortfall = register.tax[pairs[bad, 0]] - gstr2b.tax[pairs[bad, 1]]
+    missed = shortfall > 0
+    result.inconsistent_rows = np.union1d(result.inconsistent_rows, pairs[bad[~missed], 0])
+    bad, shortfall = bad[missed], shortfall[missed]
+    for position, amount in zip(bad.tolist(), shortfall.tolist()):
+        invoice, counterpart = register.invoice(pairs[position, 0]), gstr2b.invoice(pairs[position, 1])
+        differing = [name for name, good in zip(COMPARED_FIELDS, ok[position].tolist()) if not good]
+        note = f"Matched to GSTR-2B invoice {counterpart.invoice_no}. " if fuzzy else ""
+        item = _missing(invoice, amount, note + _mismatch_reason(invoice, counterpart, differing))
+        result.mismatches[int(pairs[position, 0])] = item
+        result.missing_itc.append(item)
+
+
+def _as_pairs(register_rows: list, gstr2b_rows: list) -> np.ndarray:
+    return np.column_stack((np.asarray(register_rows, dtype=np.int64), np.asarray(gstr2b_rows, dtype=np.int64)))
+
+
+def _classify_eligibility(result: ReconciliationResult, lookup: HSNLookup):
+    """Marks every register invoice whose HSN/SAC falls under a blocked-credit rule."""
+    register = result.register
+    rows, rules = lookup.blocked_rows(register.hsns, register.hsn_codes)
+    tax = register.tax
+    for row, code, amount in zip(rows.tolist(), register.hsn_codes[rows].tolist(), tax[rows].tolist()):
+        rule = rules[code]
+        item = IneligibleITCItem(
+            invoice_no=register.invoice_nos[row], gstin=register.gstin(row), amount=round(amount, 2),
+            hsn=register.hsns[code], section=rule.section, reason=f"Blocked credit: {rule.reason}",
+        )
+        result.ineligible[row] = item
+        result.ineligible_itc.append(item)
+
+
+def reconcile(gstr2b: Union[InvoiceTable, Iterable[Invoice]], register: Union[InvoiceTable, Iterable[Invoice]],
+              tolerance: Tolerance = None, fuzzy: bool = GST_FUZZY_MATCHING,
+              settled: Iterable[tuple] = (), eligibility: Optional[HSNLookup] = hsn_lookup) -> ReconciliationResult:
+    """
+    Hash-joins purchase register invoices with GSTR-2B on (GSTIN, normalized
+    invoice number) and compares taxable value and IGST/CGST/SGST. Invoices
+    without an exact match then get a fuzzy pass (FuzzyMatcher) against the
+    GSTR-2B invoices nobody claimed. Both sides are InvoiceTables (lists of
+    invoices are converted), so the amount checks run over whole columns.
+
+    - match within tolerance          -> matched
+    - match with different amounts    -> MissingITCItem for the tax shortfall
+                                         (inconsistent_rows if there is none)
+    - no match, supplier has no other
+      unmatched GSTR-2B invoices      -> MissingITCItem "Not found in GSTR-2B"
+    - anything else (possible typo in the invoice number, possible duplicate
+      booking)                        -> ambiguous, left for resolve_ambiguous()
+
+    `settled` holds (GSTIN, taxable value, tax) of register invoices matched
+    in earlier runs, so duplicates of those are caught too.
+
+    Register invoices with a blocked-credit HSN/SAC (see `eligibility`) are
+    still matched, but their whole tax is reported in ineligible_itc and
+    never in missing_itc or the LLM residue.
+    """
+    tolerance = tolerance or Tolerance()
+    gstr2b, register = as_table(gstr2b), as_table(register)
+    result = ReconciliationResult(register=register, gstr2b=gstr2b)
+    result.inconsistent_rows = register.inconsistent_values(tolerance.absolute, tolerance.relative)
+    if eligibility is not None:
+        _classify_eligibility(result, eligibility)
+
+    index = defaultdict(list)
+    for row, key in enumerate(gstr2b.keys()):
+        index[key].append(row)
+
+    unresolved, register_rows, gstr2b_rows = [], [], []
+    for row, key in enumerate(register.keys()):
+        candidates = index.get(key)
+        if not candidates:
+            unresolved.append(row)
+            continue
+        register_rows.append(row)
+        gstr2b_rows.append(candidates.pop(0))
+    exact = _as_pairs(register_rows, gstr2b_rows)
+    _compare(result, exact, tolerance)
+
+    claimed = np.zeros(len(gstr2b), dtype=bool)
+    claimed[exact[:, 1]] = True
+    leftovers = np.flatnonzero(~claimed)
+
+    fuzzy_pairs = _NO_PAIRS
+    if fuzzy and unresolved and len(leftovers):
+        candidates = gstr2b.invoices(leftovers)
+        slots = {id(invoice): row for invoice, row in zip(candidates, leftovers.tolist())}
+        matcher = FuzzyMatcher(candidates, amount_slack=tolerance.absolute)
+        register_rows, gstr2b_rows, still_unresolved = [], [], []
+        for row, invoice in zip(unresolved, register.invoices(unresolved)):
+            counterpart = matcher.match(invoice)
+            if counterpart is None:
+                still_unresolved.append(row)
+                continue
+            register_rows.append(row)
+            gstr2b_rows.append(slots[id(counterpart)])
+        unresolved = still_unresolved
+        fuzzy_pairs = _as_pairs(register_rows, gstr2b_rows)
+        _compare(result, fuzzy_pairs, tolerance, fuzzy=True)
+        claimed[fuzzy_pairs[:, 1]] = True
+        leftovers = np.flatnonzero(~claimed)
+
+    result.matched_pairs = np.concatenate((exact, fuzzy_pairs))
+    result.fuzzy_pairs = fuzzy_pairs
+    result.unmatched_rows = leftovers
+    unresolved = [row for row in unresolved if row not in result.ineligible]
+    if not unresolved:
+        return result
+
+    # Same supplier and amounts as an invoice that did match: possible duplicate booking
+    matched = exact[:, 0]
+    taxable, tax = np.round(register.column("taxable_value"), 2), np.round(register.tax, 2)
+    gstins = [register.gstins[code] for code in register.gstin_codes[matched].tolist()]
+    matched_amounts = set(zip(gstins, taxable[matched].tolist(), tax[matched].tolist()))
+    matched_amounts.update((gstin, round(amount, 2), round(tax_amount, 2)) for gstin, amount, tax_amount in settled)
+    open_gstins = {gstr2b.gstins[code] for code in np.unique(gstr2b.gstin_codes[leftovers]).tolist()}
+
+    rows = np.asarray(unresolved, dtype=np.int64)
+    for invoice, amount, tax_amount in zip(register.invoices(rows), taxable[rows].tolist(), tax[rows].tolist()):
+        if invoice.gstin in open_gstins or (invoice.gstin, amount, tax_amount) in matched_amounts:
+            result.ambiguous.append(invoice)
+        else:
+            result.missing_itc.append(_missing(invoice, invoice.tax, "Not found in GSTR-2B"))
+    return result
+
+
+def _residue_document(residue: List[Invoice], candidates: List[Invoice]) -> str:
+    header = "GSTIN,Invoice Number,Invoice Date,Party,Taxable Value,IGST,CGST,SGST"
+
+    def rows(invoices: List[Invoice]) -> str:
+        return "\n".join(
+            f"{i.gstin},{i.invoice_no},{i.invoice_date},{i.party},{i.taxable_value:.2f},{i.igst:.2f},{i.cgst:.2f},{i.sgst:.2f}"
+            for i in invoices
+        )
+
+    return (
+        "\n--- File: Purchase Register (invoices without an exact GSTR-2B match) ---\n"
+        f"{header}\n{rows(residue)}\n"
+        "\n--- File: GSTR-2B (unmatched invoices from the same suppliers) ---\n"
+        f"{header}\n{rows(candidates)}\n"
+    )
+
+
+async def resolve_ambiguous(result: ReconciliationResult, max_residue: int = GST_LLM_MAX_RESIDUE):
+    """
+    Sends the ambiguous register invoices, with the same suppliers' unmatched
+    GSTR-2B invoices, to the GST agent and records the ones it confirms as
+    missing ITC. Only invoices from the residue are accepted from the answer
+    and amounts come from the register, not the LLM. Invoices over
+    `max_residue`, or all of them if the LLM is unavailable or not
+    configured, are reported as
+    missing with a "needs review" reason.
+    """
+    if not result.ambiguous:
+        return
+    residue, overflow = result.ambiguous[:max_residue], result.ambiguous[max_residue:]
+    for invoice in overflow:
+        result.missing_itc.append(_missing(invoice, invoice.tax, "Not found in GSTR-2B (needs review)"))
+
+    gstins = {invoice.gstin for invoice in residue}
+    candidates = result.gstr2b.invoices(result.gstr2b.select_gstins(gstins, result.unmatched_rows))
+    try:
+        response = await run_gst_agent(_residue_document(residue, candidates))
+    except LLMError as e:
+        # Also raised when the LLM is not configured; the deterministic result still stands
+        print(f"GST agent unavailable, reporting ambiguous invoices for review: {e}")
+        for invoice in residue:
+            result.missing_itc.append(_missing(invoice, invoice.tax, "Not found in GSTR-2B (needs review)"))
+        return
+
+    by_key = {invoice.key: invoice for invoice in residue}
+    for item in response.missing_itc:
+        invoice = by_key.pop((normalize_gstin(item.gstin), normalize_invoice_no(item.invoice_no)), None)
+        if invoice is not None:
+            result.missing_itc.append(_missing(invoice, invoice.tax, item.reason))
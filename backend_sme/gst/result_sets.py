@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Iterator, List, Optional
+
+from backend_sme.models.schemas import GSTMatcherResponse
+
+# Reconciliation results kept for paging / export; the oldest are dropped first
+GST_RESULT_SETS = int(os.getenv("GST_RESULT_SETS", "64"))
+# Seconds a result set stays readable after it was created
+GST_RESULT_SET_TTL = float(os.getenv("GST_RESULT_SET_TTL", "3600"))
+# Items per page when the caller does not ask for a size, and the most it may ask for
+GST_RESULT_PAGE_SIZE = int(os.getenv("GST_RESULT_PAGE_SIZE", "100"))
+GST_RESULT_MAX_PAGE_SIZE = 1000
+
+KINDS = ("missing_itc", "ineligible_itc")
+
+
+class ResultFilter:
+    """Item filter shared by paging and export: GSTIN, reason substring, minimum amount."""
+
+    def __init__(self, gstin: Optional[str] = None, reason: Optional[str] = None, min_amount: Optional[float] = None):
+        self.gstin = gstin.strip().upper() if gstin else None
+        self.reason = reason.lower() if reason else None
+        self.min_amount = min_amount
+
+    def __call__(self, item) -> bool:
+        if self.gstin and item.gstin != self.gstin:
+            return False
+        if self.reason and self.reason not in item.reason.lower():
+            return False
+        return self.min_amount is None or item.amount >= self.min_amount
+
+
+class ResultSet:
+    """
+    One reconciliation's findings, held server-side so responses can carry
+    totals and a page of items instead of every item. Items are never
+    reordered or changed, so a cursor is simply the position in the kind's
+    list where the next page starts scanning. `vendors` is the run's
+    per-supplier report (see gst.vendors), computed once when it is stored.
+    """
+
+    def __init__(self, response: GSTMatcherResponse, client_id: Optional[str] = None, vendors: Optional[dict] = None):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.client_id = client_id
+        self.vendors = vendors
+        self.items = {"missing_itc": list(response.missing_itc), "ineligible_itc": list(response.ineligible_itc)}
+        self.totals = {
+            "missing_itc": len(response.missing_itc),
+            "ineligible_itc": len(response.ineligible_itc),
+            "total_itc_missed": response.total_itc_missed,
+            "total_itc_ineligible": response.total_itc_ineligible,
+        }
+
+    def page(self, kind: str, cursor: Optional[str] = None, limit: int = GST_RESULT_PAGE_SIZE,
+             where: Optional[ResultFilter] = None) -> dict:
+        """
+        Up to `limit` items of `kind` matching `where`, starting at `cursor`.
+        next_cursor is None on the last page.
+        """
+        items = self.items[kind]
+        start = _position(cursor)
+        limit = max(1, min(limit, GST_RESULT_MAX_PAGE_SIZE))
+        page: List = []
+        position = start
+        while position < len(items) and len(page) < limit:
+            if where is None or where(items[position]):
+                page.append(items[position])
+            position += 1
+        return {
+            "result_set_id": self.id,
+            "kind": kind,
+            "items": [item.dict() for item in page],
+            "next_cursor": str(position) if position < len(items) else None,
+            "totals": self.totals,
+        }
+
+    def export(self, kind: str, where: Optional[ResultFilter] = None) -> Iterator[str]:
+        """Items of `kind` matching `where` as NDJSON lines."""
+        for item in self.items[kind]:
+            if where is None or where(item):
+                yield json.dumps(item.dict(), ensure_ascii=False) + "\n"
+
+
+def _position(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    if not cursor.isdigit():
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return int(cursor)
+
+
+class ResultSetStore:
+    """Bounded LRU of result sets whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries: int = GST_RESULT_SETS, ttl: float = GST_RESULT_SET_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, response: GSTMatcherResponse, client_id: Optional[str] = None, vendors: Optional[dict] = None) -> ResultSet:
+        result_set = ResultSet(response, client_id, vendors)
+        with self._lock:
+            self._sets[result_set.id] = result_set
+            while len(self._sets) > self.max_entries:
+                self._sets.popitem(last=False)
+        return result_set
+
+    def get(self, result_set_id: str) -> Optional[ResultSet]:
+        with self._lock:
+            result_set = self._sets.get(result_set_id)
+            if result_set is None:
+                return None
+            if time.time() - result_set.created_at > self.ttl:
+                del self._sets[result_set_id]
+                return None
+            self._sets.move_to_end(result_set_id)
+            return result_set
+
+    def latest(self, client_id: str) -> Optional[ResultSet]:
+        """The client's most recent result set that has not expired."""
+        with self._lock:
+            candidates = [s for s in self._sets.values() if s.client_id == client_id and time.time() - s.created_at <= self.ttl]
+        return max(candidates, key=lambda s: s.created_at, default=None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"result_sets": len(self._sets), "max_entries": self.max_entries}
+
+
+def summarize(response: GSTMatcherResponse, store: "ResultSetStore", inline: int = GST_RESULT_PAGE_SIZE,
+              client_id: Optional[str] = None, vendors: Optional[dict] = None) -> GSTMatcherResponse:
+    """
+    Stores the full response and returns a copy carrying the totals, the
+    result-set handle and at most `inline` items of each kind.
+    """
+    result_set = store.put(response, client_id, vendors)
+    return GSTMatcherResponse(
+        missing_itc=response.missing_itc[:inline],
+        total_itc_missed=response.total_itc_missed,
+        ineligible_itc=response.ineligible_itc[:inline],
+        total_itc_ineligible=response.total_itc_ineligible,
+        result_set_id=result_set.id,
+        missing_itc_count=len(response.missing_itc),
+        ineligible_itc_count=len(response.ineligible_itc),
+    )
+
+
+result_sets = ResultSetStore()
@@ -0,0 +1,186 @@
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from backend_sme.gst.invoices import GSTR_2B, PURCHASE_REGISTER
+from backend_sme.gst.reconciliation import GST_FUZZY_MATCHING, ReconciliationResult, Tolerance, reconcile
+from backend_sme.gst.sources import INVOICE_EXTENSIONS, open_invoices
+from backend_sme.gst.table import InvoiceTable, InvoiceTableBuilder, as_table
+
+# Worker processes for a reconciliation (1 = reconcile in-process)
+GST_WORKERS = int(os.getenv("GST_WORKERS", "1"))
+# Below this many invoices (both sides) a pool costs more than it saves
+GST_SHARD_MIN_INVOICES = int(os.getenv("GST_SHARD_MIN_INVOICES", "20000"))
+# Shards per worker, so one large supplier does not leave the other workers idle
+SHARDS_PER_WORKER = 4
+
+# Workers are started by a fork server (spawned where there is none), never
+# forked from the app: runs start in a worker thread of a multi-threaded
+# server, and a forked child could inherit locks held by other threads
+_POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_NUMERIC_COLUMNS = ("gstin_codes", "party_codes", "source_codes", "hsn_codes", "rows", "dates", "amounts")
+
+
+def shard_of(gstin: str, shards: int) -> int:
+    """Stable shard number of a supplier GSTIN (same on both sides, in every process)."""
+    return zlib.crc32(gstin.encode("utf-8")) % shards
+
+
+class _SharedTable:
+    """
+    The numeric columns of an InvoiceTable copied once into shared memory.
+    Workers attach by name and slice their shard out of the same pages, so
+    the columns are never pickled; only the shard's invoice numbers are.
+    """
+
+    def __init__(self, table: InvoiceTable):
+        self.blocks = []
+        self.spec = {"gstins": table.gstins, "parties": table.parties, "sources": table.sources, "hsns": table.hsns, "columns": {}}
+        for name in _NUMERIC_COLUMNS:
+            array = np.ascontiguousarray(getattr(table, name))
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.spec["columns"][name] = (block.name, array.dtype.str, array.shape)
+
+    def release(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+def _attach(spec: dict, rows: np.ndarray, invoice_nos: List[str], numbers: List[str]) -> InvoiceTable:
+    columns = {}
+    for name, (block_name, dtype, shape) in spec["columns"].items():
+        block = shared_memory.SharedMemory(name=block_name)
+        try:
+            view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            columns[name] = view[rows]  # fancy indexing copies the shard out
+            del view
+        finally:
+            block.close()
+    return InvoiceTable(
+        gstins=spec["gstins"], parties=spec["parties"], sources=spec["sources"], hsns=spec["hsns"],
+        invoice_nos=invoice_nos, numbers=numbers, **columns,
+    )
+
+
+def _reconcile_shard(gstr2b_spec: dict, gstr2b_rows: np.ndarray, gstr2b_strings: tuple,
+                     register_spec: dict, register_rows: np.ndarray, register_strings: tuple,
+                     tolerance: Tolerance, fuzzy: bool, settled: list) -> ReconciliationResult:
+    gstr2b = _attach(gstr2b_spec, gstr2b_rows, *gstr2b_strings)
+    register = _attach(register_spec, register_rows, *register_strings)
+    result = reconcile(gstr2b, register, tolerance, fuzzy, settled)
+    # Positions are shard-local; the parent maps them back. Tables stay here.
+    result.gstr2b = result.register = None
+    return result
+
+
+def _partition(table: InvoiceTable, shards: int) -> List[np.ndarray]:
+    code_shard = np.array([shard_of(gstin, shards) for gstin in table.gstins], dtype=np.int64)
+    row_shard = code_shard[table.gstin_codes] if len(table) else np.empty(0, dtype=np.int64)
+    order = np.argsort(row_shard, kind="stable")
+    bounds = np.searchsorted(row_shard[order], np.arange(shards + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(shards)]
+
+
+def _strings(table: InvoiceTable, rows: np.ndarray) -> tuple:
+    positions = rows.tolist()
+    return [table.invoice_nos[i] for i in positions], [table.numbers[i] for i in positions]
+
+
+def _merge(gstr2b: InvoiceTable, register: InvoiceTable, parts: list) -> ReconciliationResult:
+    """Maps shard-local positions back to the full tables and concatenates the shards."""
+    merged = ReconciliationResult(register=register, gstr2b=gstr2b)
+
+    def pairs(name: str) -> np.ndarray:
+        mapped = [merged.matched_pairs]
+        for g_rows, reg_rows, part in parts:
+            local = getattr(part, name)
+            mapped.append(np.column_stack((reg_rows[local[:, 0]], g_rows[local[:, 1]])))
+        stacked = np.concatenate(mapped)
+        return stacked[np.argsort(stacked[:, 0], kind="stable")]
+
+    def rows(name: str, side: int) -> np.ndarray:
+        return np.sort(np.concatenate([getattr(merged, name)] + [part[side][getattr(part[2], name)] for part in parts]))
+
+    merged.matched_pairs, merged.fuzzy_pairs = pairs("matched_pairs"), pairs("fuzzy_pairs")
+    merged.unmatched_rows = rows("unmatched_rows", 0)
+    merged.inconsistent_rows = rows("inconsistent_rows", 1)
+    for _, reg_rows, part in parts:
+        merged.missing_itc.extend(part.missing_itc)
+        merged.ambiguous.extend(part.ambiguous)
+        merged.mismatches.update({int(reg_rows[row]): item for row, item in part.mismatches.items()})
+        merged.ineligible_itc.extend(part.ineligible_itc)
+        merged.ineligible.update({int(reg_rows[row]): item for row, item in part.ineligible.items()})
+    return merged
+
+
+def reconcile_sharded(gstr2b, register, tolerance: Tolerance = None, fuzzy: bool = GST_FUZZY_MATCHING,
+                      settled: Iterable[tuple] = (), workers: Optional[int] = None) -> ReconciliationResult:
+    """
+    reconcile() split by supplier GSTIN across a process pool. Every rule
+    (exact join, fuzzy blocks, duplicate checks, open suppliers) only looks
+    within one GSTIN, so the shards are independent and the merged result
+    has the same matches and findings as a single run; only the order of
+    missing_itc follows the shards. Small inputs and workers <= 1 run
+    in-process.
+    """
+    workers = workers or GST_WORKERS
+    gstr2b, register = as_table(gstr2b), as_table(register)
+    if workers <= 1 or len(gstr2b) + len(register) < GST_SHARD_MIN_INVOICES:
+        return reconcile(gstr2b, register, tolerance, fuzzy, settled)
+
+    tolerance = tolerance or Tolerance()
+    shards = workers * SHARDS_PER_WORKER
+    settled_by_shard = [[] for _ in range(shards)]
+    for entry in settled:
+        settled_by_shard[shard_of(entry[0], shards)].append(entry)
+
+    shared = [_SharedTable(gstr2b), _SharedTable(register)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_POOL_CONTEXT) as pool:
+            jobs = []
+            for shard, (g_rows, reg_rows) in enumerate(zip(_partition(gstr2b, shards), _partition(register, shards))):
+                if not len(g_rows) and not len(reg_rows):
+                    continue
+                future = pool.submit(
+                    _reconcile_shard,
+                    shared[0].spec, g_rows, _strings(gstr2b, g_rows),
+                    shared[1].spec, reg_rows, _strings(register, reg_rows),
+                    tolerance, fuzzy, settled_by_shard[shard],
+                )
+                jobs.append((g_rows, reg_rows, future))
+            parts = [(g_rows, reg_rows, future.result()) for g_rows, reg_rows, future in jobs]
+    finally:
+        for table in shared:
+            table.release()
+    return _merge(gstr2b, register, parts)
+
+
+def reconcile_files(file_paths: Iterable[str], tolerance: Tolerance = None,
+                    workers: Optional[int] = None) -> Optional[ReconciliationResult]:
+    """
+    Streams the GSTR-2B and purchase register files among `file_paths` into
+    column tables and reconciles them with reconcile_sharded(). Other files
+    are skipped. None if either document is missing.
+    """
+    sides = {GSTR_2B: InvoiceTableBuilder(), PURCHASE_REGISTER: InvoiceTableBuilder()}
+    for file_path in file_paths:
+        if not file_path.lower().endswith(INVOICE_EXTENSIONS):
+            continue
+        kind, invoices = open_invoices(file_path)
+        if kind is not None:
+            sides[kind].extend(invoices)
+    gstr2b, register = sides[GSTR_2B].build(), sides[PURCHASE_REGISTER].build()
+    if not len(gstr2b) or not len(register):
+        return None
+    return reconcile_sharded(gstr2b, register, tolerance, workers=workers)
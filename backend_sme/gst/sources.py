@@ -0,0 +1,21 @@
+from typing import Iterator, Optional, Tuple
+
+from backend_sme.gst.invoices import GSTR_2B, Invoice, iter_invoices, open_invoice_stream
+from backend_sme.gst.portal_json import is_portal_json, iter_portal_invoices
+
+INVOICE_EXTENSIONS = (".csv", ".json")
+
+
+def open_invoices(file_path: str) -> Tuple[Optional[str], Optional[Iterator[Invoice]]]:
+    """
+    Document type and invoice iterator for an uploaded invoice list: a
+    GSTR-2B / purchase register CSV or a GSTR-2B JSON from the GST portal.
+    (None, None) for anything else.
+    """
+    lowered = file_path.lower()
+    if lowered.endswith(".csv"):
+        kind, stream = open_invoice_stream(file_path)
+        return (kind, iter_invoices(stream)) if kind else (None, None)
+    if is_portal_json(file_path):
+        return GSTR_2B, iter_portal_invoices(file_path)
+    return None, None
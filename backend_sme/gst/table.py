@@ -0,0 +1,200 @@
+from array import array
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from backend_sme.gst.invoices import Invoice
+from backend_sme.utils.csv_stream import parse_date
+
+AMOUNT_FIELDS = ("taxable_value", "igst", "cgst", "sgst", "cess", "invoice_value")
+_COLUMN = {name: i for i, name in enumerate(AMOUNT_FIELDS)}
+_EPOCH = date(1970, 1, 1)
+
+
+class _Categories:
+    """Interns repeated strings (GSTINs, vendor names, file names) as int codes."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class InvoiceTableBuilder:
+    """Appends invoices into typed buffers; build() freezes them into an InvoiceTable."""
+
+    def __init__(self):
+        self.gstins = _Categories()
+        self.parties = _Categories()
+        self.sources = _Categories()
+        self.hsns = _Categories()
+        self.gstin_codes = array("i")
+        self.party_codes = array("i")
+        self.source_codes = array("i")
+        self.hsn_codes = array("i")
+        self.rows = array("i")
+        self.days = array("q")
+        self.amounts = array("d")
+        self.invoice_nos: List[str] = []
+        self.numbers: List[str] = []
+        self._days_cache: Dict[str, int] = {}
+
+    def _day(self, invoice_date: str) -> int:
+        day = self._days_cache.get(invoice_date)
+        if day is None:
+            try:
+                parsed = parse_date(invoice_date)
+            except ValueError:
+                parsed = None
+            day = (parsed - _EPOCH).days if parsed else np.iinfo(np.int64).min  # NaT
+            self._days_cache[invoice_date] = day
+        return day
+
+    def add(self, invoice: Invoice):
+        self.gstin_codes.append(self.gstins.code(invoice.gstin))
+        self.party_codes.append(self.parties.code(invoice.party))
+        self.source_codes.append(self.sources.code(invoice.source))
+        self.hsn_codes.append(self.hsns.code(invoice.hsn))
+        self.rows.append(invoice.row)
+        self.days.append(self._day(invoice.invoice_date))
+        self.amounts.extend((invoice.taxable_value, invoice.igst, invoice.cgst, invoice.sgst, invoice.cess, invoice.invoice_value))
+        self.invoice_nos.append(invoice.invoice_no)
+        self.numbers.append(invoice.key[1])
+
+    def extend(self, invoices: Iterable[Invoice]) -> "InvoiceTableBuilder":
+        for invoice in invoices:
+            self.add(invoice)
+        return self
+
+    def build(self) -> "InvoiceTable":
+        return InvoiceTable(
+            gstins=self.gstins.values,
+            gstin_codes=np.frombuffer(self.gstin_codes, dtype=np.int32),
+            parties=self.parties.values,
+            party_codes=np.frombuffer(self.party_codes, dtype=np.int32),
+            sources=self.sources.values,
+            source_codes=np.frombuffer(self.source_codes, dtype=np.int32),
+            hsns=self.hsns.values,
+            hsn_codes=np.frombuffer(self.hsn_codes, dtype=np.int32),
+            rows=np.frombuffer(self.rows, dtype=np.int32),
+            dates=np.frombuffer(self.days, dtype=np.int64).view("datetime64[D]"),
+            amounts=np.frombuffer(self.amounts, dtype=np.float64).reshape(-1, len(AMOUNT_FIELDS)),
+            invoice_nos=self.invoice_nos,
+            numbers=self.numbers,
+        )
+
+
+class InvoiceTable:
+    """
+    Column store for one side of a reconciliation. Amounts are one float64
+    matrix (a column per AMOUNT_FIELDS entry), dates are datetime64[D] (NaT
+    when unreadable), and GSTINs, vendor names, source files and HSN/SAC
+    codes are int codes into small category lists. Only the invoice numbers stay Python strings.
+    Rows are addressed by position; invoice(i) rebuilds the Invoice tuple
+    for the few rows that need one (reports, fuzzy matching, the LLM residue).
+    """
+
+    def __init__(self, gstins, gstin_codes, parties, party_codes, sources, source_codes, hsns, hsn_codes,
+                 rows, dates, amounts, invoice_nos, numbers):
+        self.gstins = gstins
+        self.gstin_codes = gstin_codes
+        self.parties = parties
+        self.party_codes = party_codes
+        self.sources = sources
+        self.source_codes = source_codes
+        self.hsns = hsns
+        self.hsn_codes = hsn_codes
+        self.rows = rows
+        self.dates = dates
+        self.amounts = amounts
+        self.invoice_nos = invoice_nos
+        self.numbers = numbers
+        self._gstin_index = {gstin: code for code, gstin in enumerate(gstins)}
+
+    @classmethod
+    def from_invoices(cls, invoices: Iterable[Invoice]) -> "InvoiceTable":
+        return InvoiceTableBuilder().extend(invoices).build()
+
+    def __len__(self) -> int:
+        return len(self.invoice_nos)
+
+    def __iter__(self) -> Iterator[Invoice]:
+        return (self.invoice(i) for i in range(len(self)))
+
+    def column(self, name: str) -> np.ndarray:
+        return self.amounts[:, _COLUMN[name]]
+
+    @property
+    def tax(self) -> np.ndarray:
+        return self.amounts[:, 1:5].sum(axis=1)
+
+    def gstin(self, i: int) -> str:
+        return self.gstins[self.gstin_codes[i]]
+
+    def key(self, i: int) -> tuple:
+        return self.gstins[self.gstin_codes[i]], self.numbers[i]
+
+    def keys(self) -> Iterator[tuple]:
+        gstins = self.gstins
+        return zip((gstins[code] for code in self.gstin_codes.tolist()), self.numbers)
+
+    def invoice(self, i: int) -> Invoice:
+        day = self.dates[i]
+        taxable, igst, cgst, sgst, cess, value = self.amounts[i].tolist()
+        return Invoice(
+            gstin=self.gstins[self.gstin_codes[i]],
+            invoice_no=self.invoice_nos[i],
+            key=self.key(i),
+            invoice_date="" if np.isnat(day) else str(day),
+            party=self.parties[self.party_codes[i]],
+            taxable_value=taxable,
+            igst=igst,
+            cgst=cgst,
+            sgst=sgst,
+            cess=cess,
+            invoice_value=value,
+            source=self.sources[self.source_codes[i]],
+            row=int(self.rows[i]),
+            hsn=self.hsns[self.hsn_codes[i]],
+        )
+
+    def invoices(self, indices: Iterable[int]) -> List[Invoice]:
+        return [self.invoice(i) for i in np.asarray(indices, dtype=np.int64).tolist()]
+
+    def select_gstins(self, gstins: Iterable[str], indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Positions (optionally within `indices`) of rows whose GSTIN is in `gstins`."""
+        codes = [self._gstin_index[g] for g in gstins if g in self._gstin_index]
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices, dtype=np.int64)
+        return indices[np.isin(self.gstin_codes[indices], codes)]
+
+    def totals_by_gstin(self, indices: Optional[np.ndarray] = None) -> Dict[str, dict]:
+        """{GSTIN: {"invoices", "taxable_value", "tax"}} over all rows or `indices`."""
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices, dtype=np.int64)
+        codes = self.gstin_codes[indices]
+        size = len(self.gstins)
+        counts = np.bincount(codes, minlength=size)
+        taxable = np.bincount(codes, weights=self.amounts[indices, 0], minlength=size)
+        tax = np.bincount(codes, weights=self.tax[indices], minlength=size)
+        return {
+            self.gstins[code]: {"invoices": int(counts[code]), "taxable_value": round(float(taxable[code]), 2), "tax": round(float(tax[code]), 2)}
+            for code in np.flatnonzero(counts).tolist()
+        }
+
+    def inconsistent_values(self, absolute: float, relative: float) -> np.ndarray:
+        """Positions of rows whose invoice value is not taxable value + taxes."""
+        value = self.amounts[:, 5]
+        expected = self.amounts[:, 0] + self.tax
+        diff = np.abs(value - expected)
+        bad = (diff > absolute) & (diff > relative * np.maximum(np.abs(value), np.abs(expected)))
+        return np.flatnonzero(bad & (value != 0))
+
+
+def as_table(invoices) -> InvoiceTable:
+    return invoices if isinstance(invoices, InvoiceTable) else InvoiceTable.from_invoices(invoices)
@@ -0,0 +1,164 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend_sme.gst.reconciliation import ReconciliationResult
+
+MISMATCH = "Amount mismatch"
+UNKNOWN_PERIOD = "unknown"
+# Vendor fields a report can be sorted by (largest first)
+SORT_FIELDS = ("itc_at_risk", "itc_missed", "itc_mismatch", "itc_ineligible", "itc_booked", "register_invoices")
+
+
+def _vendor(gstin: str) -> dict:
+    return {
+        "gstin": gstin, "party": "",
+        "register_invoices": 0, "gstr2b_invoices": 0, "matched": 0,
+        "itc_booked": 0.0, "itc_available": 0.0,
+        "missing_invoices": 0, "itc_missed": 0.0,
+        "mismatch_invoices": 0, "itc_mismatch": 0.0,
+        "ineligible_invoices": 0, "itc_ineligible": 0.0,
+        "itc_at_risk": 0.0, "months": {},
+    }
+
+
+def _month(vendor: dict, period: str) -> dict:
+    month = vendor["months"].get(period)
+    if month is None:
+        month = vendor["months"][period] = {"period": period, "invoices": 0, "itc_booked": 0.0, "matched": 0, "itc_missed": 0.0}
+    return month
+
+
+def _periods(dates: np.ndarray) -> List[str]:
+    months = dates.astype("datetime64[M]")
+    return [UNKNOWN_PERIOD if np.isnat(m) else str(m) for m in months]
+
+
+def vendor_report(result: ReconciliationResult, history: Optional[dict] = None) -> dict:
+    """
+    Per-supplier view of a reconciliation: invoices booked, filed and matched,
+    ITC booked vs available in GSTR-2B, missed ITC split into "not filed" and
+    amount mismatches, blocked credits, and a month-by-month trend of booked
+    vs missed ITC (by register invoice date). Counts and sums over the
+    invoice tables are bincounts over (GSTIN, month) groups; only the
+    findings are walked item by item. Results without tables (the LLM
+    fallback) are aggregated from their findings alone. With the
+    reconciliation index, whose results only hold the open items, pass the
+    client's `history` (ReconciliationIndex.vendor_history) and the totals
+    come from every invoice ever uploaded instead of the tables.
+    """
+    vendors: Dict[str, dict] = {}
+
+    def vendor(gstin: str) -> dict:
+        entry = vendors.get(gstin)
+        if entry is None:
+            entry = vendors[gstin] = _vendor(gstin)
+        return entry
+
+    register, gstr2b = result.register, result.gstr2b
+    row_period: Dict[tuple, str] = {}
+    if history is not None:
+        register = gstr2b = None
+        for gstin, period, party, invoices, tax, matched in history["register"]:
+            entry = vendor(gstin)
+            entry["party"] = entry["party"] or party or ""
+            entry["register_invoices"] += invoices
+            entry["itc_booked"] += tax or 0.0
+            entry["matched"] += matched
+            month = _month(entry, period or UNKNOWN_PERIOD)
+            month["invoices"] += invoices
+            month["itc_booked"] += tax or 0.0
+            month["matched"] += matched
+        for gstin, party, invoices, tax in history["gstr2b"]:
+            entry = vendor(gstin)
+            entry["party"] = entry["party"] or party or ""
+            entry["gstr2b_invoices"] = invoices
+            entry["itc_available"] = tax or 0.0
+        row_period = {key: period or UNKNOWN_PERIOD for key, period in history["periods"].items()}
+
+    if register is not None and len(register):
+        # One group per (GSTIN, month) of the register
+        months = register.dates.astype("datetime64[M]").astype(np.int64)
+        groups, group_of = np.unique(np.column_stack((register.gstin_codes.astype(np.int64), months)), axis=0, return_inverse=True)
+        group_of = group_of.ravel()
+        size = len(groups)
+        counts = np.bincount(group_of, minlength=size)
+        tax = np.bincount(group_of, weights=register.tax, minlength=size)
+        matched = np.bincount(group_of[result.matched_pairs[:, 0]], minlength=size)
+        periods = _periods(groups[:, 1].astype("datetime64[M]"))
+        parties = register.party_codes[np.unique(group_of, return_index=True)[1]]
+        for g, (code, _) in enumerate(groups.tolist()):
+            entry = vendor(register.gstins[code])
+            entry["party"] = entry["party"] or register.parties[parties[g]]
+            entry["register_invoices"] += int(counts[g])
+            entry["itc_booked"] += float(tax[g])
+            entry["matched"] += int(matched[g])
+            month = _month(entry, periods[g])
+            month["invoices"] += int(counts[g])
+            month["itc_booked"] += float(tax[g])
+            month["matched"] += int(matched[g])
+
+        # Periods of the invoices behind the findings, for the monthly trend
+        gstins = {item.gstin for item in result.missing_itc}
+        rows = register.select_gstins(gstins)
+        row_periods = _periods(register.dates[rows])
+        for row, period in zip(rows.tolist(), row_periods):
+            row_period[(register.gstin(row), register.invoice_nos[row])] = period
+
+    if gstr2b is not None and len(gstr2b):
+        for gstin, totals in gstr2b.totals_by_gstin().items():
+            entry = vendor(gstin)
+            entry["gstr2b_invoices"] = totals["invoices"]
+            entry["itc_available"] = totals["tax"]
+        codes, first = np.unique(gstr2b.gstin_codes, return_index=True)
+        for code, party in zip(codes.tolist(), gstr2b.party_codes[first].tolist()):
+            entry = vendors[gstr2b.gstins[code]]
+            entry["party"] = entry["party"] or gstr2b.parties[party]
+
+    for item in result.missing_itc:
+        entry = vendor(item.gstin)
+        if MISMATCH in item.reason:
+            entry["mismatch_invoices"] += 1
+            entry["itc_mismatch"] += item.amount
+        else:
+            entry["missing_invoices"] += 1
+            entry["itc_missed"] += item.amount
+        _month(entry, row_period.get((item.gstin, item.invoice_no), UNKNOWN_PERIOD))["itc_missed"] += item.amount
+    for item in result.ineligible_itc:
+        entry = vendor(item.gstin)
+        entry["ineligible_invoices"] += 1
+        entry["itc_ineligible"] += item.amount
+
+    report = []
+    for entry in vendors.values():
+        entry["itc_at_risk"] = entry["itc_missed"] + entry["itc_mismatch"]
+        for name in ("itc_booked", "itc_available", "itc_missed", "itc_mismatch", "itc_ineligible", "itc_at_risk"):
+            entry[name] = round(entry[name], 2)
+        months = sorted(entry["months"].values(), key=lambda m: (m["period"] == UNKNOWN_PERIOD, m["period"]))
+        for month in months:
+            month["itc_booked"], month["itc_missed"] = round(month["itc_booked"], 2), round(month["itc_missed"], 2)
+        entry["months"] = months
+        report.append(entry)
+    report.sort(key=lambda v: (-v["itc_at_risk"], v["gstin"]))
+    return {
+        "vendors": report,
+        "totals": {
+            "vendors": len(report),
+            "vendors_with_missed_itc": sum(1 for v in report if v["itc_at_risk"] > 0),
+            "itc_booked": round(sum(v["itc_booked"] for v in report), 2),
+            "itc_at_risk": round(sum(v["itc_at_risk"] for v in report), 2),
+            "itc_ineligible": round(sum(v["itc_ineligible"] for v in report), 2),
+        },
+    }
+
+
+def top_vendors(report: dict, sort: str = "itc_at_risk", limit: Optional[int] = None, gstin: Optional[str] = None) -> dict:
+    """A slice of a vendor report: one GSTIN, or the `limit` largest by `sort`."""
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+    vendors = report["vendors"]
+    if gstin:
+        gstin = gstin.strip().upper()
+        vendors = [v for v in vendors if v["gstin"] == gstin]
+    vendors = sorted(vendors, key=lambda v: (-v[sort], v["gstin"]))
+    return {"vendors": vendors[:limit] if limit else vendors, "totals": report["totals"]}
@@ -4,14 +4,16 @@ import os
 # Add the project root directory to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from backend_sme.routes import deductions, gst_matcher
-import os
 from dotenv import load_dotenv
 
+# Before the backend_sme imports: their settings are read from the environment at import time
 load_dotenv()
 
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from backend_sme.routes import deductions, gst_matcher
+from backend_sme.utils.openrouter_llm import close_client
+
 app = FastAPI(title="TaxNova SME MVP")
 
 # CORS Setup
@@ -33,6 +35,13 @@ app.include_router(deductions.router, prefix="/sme/deductions", tags=["Deduction
 app.include_router(gst_matcher.router, prefix="/sme/gst", tags=["GST Matcher"])
 from backend_sme.routes import chat
 app.include_router(chat.router, prefix="/sme/chat", tags=["Chat"])
+from backend_sme.routes import metrics
+app.include_router(metrics.router, prefix="/sme/metrics", tags=["Metrics"])
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Release pooled LLM connections
+    await close_client()
 
 @app.get("/")
 def read_root():
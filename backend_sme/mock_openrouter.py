@@ -0,0 +1,334 @@
+"""
+Local stand-in for the OpenRouter / OpenAI chat completions API.
+
+Serves schema-valid canned answers for every prompt used in this repo so the
+whole stack can be run, load-tested and benchmarked without a provider:
+
+    python -m backend_sme.mock_openrouter            # listens on :8100
+
+    OPENROUTER_BASE_URL=http://127.0.0.1:8100/api/v1   (backend_sme + backend/app)
+    OPENAI_BASE_URL=http://127.0.0.1:8100/api/v1       (backend/app gpt-4o agents)
+    OPENROUTER_API_KEY=mock OPENAI_API_KEY=mock
+
+Latency, error rates and streaming speed come from MOCK_LLM_* environment
+variables and can be changed at runtime with POST /mock/config.
+"""
+import sys
+import os
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+app = FastAPI(title="TaxNova Mock LLM")
+
+
+class MockConfig(BaseModel):
+    # Response latency is log-normal: median `latency_ms`, spread `latency_sigma`
+    latency_ms: float = float(os.getenv("MOCK_LLM_LATENCY_MS", "300"))
+    latency_sigma: float = float(os.getenv("MOCK_LLM_LATENCY_SIGMA", "0.5"))
+    # Fraction of requests answered with HTTP 500 / 429
+    error_rate: float = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+    rate_limit_rate: float = float(os.getenv("MOCK_LLM_RATE_LIMIT_RATE", "0"))
+    # Fraction of requests that hang for `stall_ms` (tail latency)
+    stall_rate: float = float(os.getenv("MOCK_LLM_STALL_RATE", "0"))
+    stall_ms: float = float(os.getenv("MOCK_LLM_STALL_MS", "30000"))
+    # Delay between streamed chunks, and characters per chunk
+    token_delay_ms: float = float(os.getenv("MOCK_LLM_TOKEN_DELAY_MS", "15"))
+    chunk_chars: int = int(os.getenv("MOCK_LLM_CHUNK_CHARS", "8"))
+    seed: Optional[int] = None
+
+
+config = MockConfig()
+stats = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0, "stalled": 0, "by_prompt": {}}
+_rng = random.Random()
+
+
+# --- Canned responses --------------------------------------------------------
+
+def _unknown_merchants(text: str) -> list:
+    # Merchants of the "Merchant,Month,..." summary of unmatched bank debits, and
+    # descriptions of the raw "Date,Description,Reference,Debit" rows
+    merchants = {}
+    for header, column, width in (("Merchant,Month,Payments,Total,Min,Max,Example\n", 0, 7),
+                                  ("Date,Description,Reference,Debit\n", 1, 4)):
+        for block in text.split(header)[1:]:
+            for line in block.split("\n"):
+                fields = line.split(",")
+                if len(fields) != width or not fields[column]:
+                    break
+                merchants.setdefault(fields[column], {
+                    "description": fields[column], "merchant": fields[column].split("(")[0].strip().title(),
+                    "category": "Business expense", "section": "37(1)", "deductible_share": 1.0, "confidence": 0.9,
+                })
+    return list(merchants.values())
+
+
+def _deductions(text: str) -> dict:
+    return {
+        "deductions": [
+            {"title": "Cloud hosting (AWS)", "amount": 12000.0, "section": "37(1)", "reason": "Business IT infrastructure expense"},
+            {"title": "Video conferencing (Zoom)", "amount": 4500.0, "section": "37(1)", "reason": "Software subscription used for business"},
+            {"title": "Office Rent", "amount": 45000.0, "section": "37(1)", "reason": "Rent for business premises"},
+            {"title": "Laptop (Macbook)", "amount": 185000.0, "section": "32", "reason": "Depreciation on computer hardware at 40%"},
+        ],
+        "estimated_tax_saved": 25000.0,
+        "merchants": _unknown_merchants(text),
+    }
+
+
+def _gst(text: str) -> dict:
+    return {
+        "missing_itc": [
+            {"invoice_no": "MISSED-INV-88", "gstin": "27HIDDN4444H1Z1", "amount": 900.0, "reason": "Not found in GSTR-2B"},
+        ],
+        "total_itc_missed": 900.0,
+    }
+
+
+def _orchestrator(text: str) -> dict:
+    # Only look at the user's input, not the category descriptions that follow
+    match = re.search(r"User Message:(.*?)TASK:", text, re.S)
+    current = (match.group(1) if match else text).lower()
+    if re.search(r"gstin|gstr|itc|purchase register|reconcil", current):
+        return {"intent": "GST_MATCHING", "reason": "Mock: GST documents or keywords detected."}
+    if re.search(r"debit|credit|bank|deduction|expense", current):
+        return {"intent": "DEDUCTION_ANALYSIS", "reason": "Mock: bank statement or deduction keywords detected."}
+    return {"intent": "GENERAL_QUERY", "reason": "Mock: no document-specific intent detected."}
+
+
+def _summary(text: str) -> str:
+    return "The user runs a small business and has discussed deductions and GST reconciliation."
+
+
+def _extractor(text: str) -> dict:
+    info = {}
+    rent = re.search(r"(\d[\d,]*)\s*(?:rs\.?|inr)?\s*rent|rent\D{0,20}(\d[\d,]*)", text, re.I)
+    if rent:
+        info["rent_amount"] = int((rent.group(1) or rent.group(2)).replace(",", ""))
+    return {"extracted_info": info, "user_intent": "provide_info" if info else "ask_question"}
+
+
+def _decider(text: str) -> dict:
+    return {
+        "thought_process": "Mock: continue gathering core information.",
+        "reply_to_user": "Thanks! Could you tell me how much you invest under Section 80C and your health insurance premium?",
+        "next_action": "continue_interview",
+    }
+
+
+def _fused(text: str) -> dict:
+    # Only the user's message carries facts; the system prompt holds the knowledge base
+    user_text = re.split(r"follow the interview script\.(?:\nRespond ONLY[^\n]*)?", text)[-1]
+    return {**_extractor(user_text), **_decider(text)}
+
+
+def _analysis(text: str) -> dict:
+    return {
+        "observations": [
+            {"title": "80C limit not fully used", "description": "There is unused room under Section 80C.", "impact": "HIGH"},
+        ],
+        "recommendations": [
+            {"title": "Top up ELSS", "description": "Invest in ELSS to use the remaining 80C limit.", "required_amount": 50000,
+             "estimated_tax_savings": 15600, "feasibility": "High", "category": "80C"},
+        ],
+    }
+
+
+def _loopholes(text: str) -> dict:
+    return {
+        "strategies": [
+            {"title": "Pay Rent to Parents", "description": "Claim HRA by paying rent to parents who own the house.",
+             "impact": "High", "complexity": "Easy", "legal_status": "Fully Legal",
+             "detailed_explanation": "Sign a rent agreement, transfer rent by bank and collect receipts; parents declare it as income."},
+        ]
+    }
+
+
+def _payroll(text: str) -> dict:
+    return {"gross_salary": 1200000, "basic_salary": 600000, "hra_received": 300000, "pf": 72000, "allowances": {"Special": 228000}}
+
+
+def _report(text: str) -> str:
+    return ("<html><body><h1>TaxNova Confidential</h1><h2>Executive Summary</h2>"
+            "<p>Mock report generated offline.</p><h2>Disclaimer</h2><p>AI generated.</p></body></html>")
+
+
+# (name, marker found in the prompt, builder) - first match wins
+PROMPTS = [
+    ("summary", "conversation summarizer", _summary),
+    ("deduction", "tax deduction expert", _deductions),
+    ("gst", "GST expert", _gst),
+    ("orchestrator", "intelligent orchestrator", _orchestrator),
+    ("extractor", "expert financial analyst", _extractor),
+    ("fused", "STEP 1 - EXTRACT", _fused),
+    ("decider", "You are TaxNova", _decider),
+    ("analysis", "expert Tax Consultant", _analysis),
+    ("report", "Reporter Agent", _report),
+    ("loophole", "Tax Ninja", _loopholes),
+    ("payroll", "data extraction AI", _payroll),
+]
+
+# Structured-output schema name (tool / json_schema) -> builder
+SCHEMAS = {
+    "KnowledgeUpdate": _extractor,
+    "OrchestratorResponse": _decider,
+    "FusedTurn": _fused,
+    "AnalysisOutput": _analysis,
+    "LoopholeResponse": _loopholes,
+    "ParsedPayroll": _payroll,
+}
+
+
+def _prompt_text(body: dict) -> str:
+    parts = []
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def _schema_name(body: dict) -> Optional[str]:
+    if body.get("tools"):
+        return body["tools"][0]["function"]["name"]
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return response_format["json_schema"]["name"]
+    return None
+
+
+def build_answer(body: dict):
+    """Returns (prompt name, payload, tool name or None) for a request."""
+    text = _prompt_text(body)
+    schema = _schema_name(body)
+    if body.get("tools") and schema in SCHEMAS:
+        return schema, SCHEMAS[schema](text), schema
+    if schema in SCHEMAS:
+        return schema, SCHEMAS[schema](text), None
+    for name, marker, builder in PROMPTS:
+        if marker.lower() in text.lower():
+            return name, builder(text), None
+    return "unknown", "This is a mock response.", None
+
+
+# --- HTTP layer --------------------------------------------------------------
+
+def _latency() -> float:
+    return _rng.lognormvariate(0, config.latency_sigma) * config.latency_ms / 1000
+
+
+def _completion(body: dict, content: Optional[str], tool_name: Optional[str]) -> dict:
+    message = {"role": "assistant", "content": content}
+    finish_reason = "stop"
+    if tool_name:
+        message["tool_calls"] = [{
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": tool_name, "arguments": content},
+        }]
+        message["content"] = None
+        finish_reason = "tool_calls"
+    return {
+        "id": f"gen-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": len(_prompt_text(body)) // 4, "completion_tokens": len(content) // 4,
+                  "total_tokens": (len(_prompt_text(body)) + len(content)) // 4},
+    }
+
+
+async def _stream(body: dict, content: str, tool_name: Optional[str]):
+    base = {"id": f"gen-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": body.get("model", "mock")}
+    step = max(1, config.chunk_chars)
+    for i in range(0, len(content), step):
+        piece = content[i:i + step]
+        delta = {"role": "assistant"} if i == 0 else {}
+        if tool_name:
+            call = {"index": 0, "function": {"arguments": piece}}
+            if i == 0:
+                call.update({"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function"})
+                call["function"]["name"] = tool_name
+            delta["tool_calls"] = [call]
+        else:
+            delta["content"] = piece
+        yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]})}\n\n"
+        if config.token_delay_ms:
+            await asyncio.sleep(config.token_delay_ms / 1000)
+    finish = "tool_calls" if tool_name else "stop"
+    yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': finish}]})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    name, payload, tool_name = build_answer(body)
+    stats["by_prompt"][name] = stats["by_prompt"].get(name, 0) + 1
+    content = payload if isinstance(payload, str) else json.dumps(payload)
+
+    roll = _rng.random()
+    if roll < config.rate_limit_rate:
+        stats["rate_limited"] += 1
+        return JSONResponse({"error": {"message": "Mock rate limit", "code": 429}}, status_code=429)
+    if roll < config.rate_limit_rate + config.error_rate:
+        stats["errors"] += 1
+        await asyncio.sleep(_latency())
+        return JSONResponse({"error": {"message": "Mock upstream error", "code": 500}}, status_code=500)
+
+    if _rng.random() < config.stall_rate:
+        stats["stalled"] += 1
+        await asyncio.sleep(config.stall_ms / 1000)
+    else:
+        await asyncio.sleep(_latency())
+
+    if body.get("stream"):
+        stats["streamed"] += 1
+        return StreamingResponse(_stream(body, content, tool_name), media_type="text/event-stream")
+    return _completion(body, content, tool_name)
+
+
+@app.get("/api/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "mock", "object": "model"}]}
+
+
+@app.get("/mock/config")
+async def get_config():
+    return config
+
+
+@app.post("/mock/config")
+async def update_config(update: dict):
+    global config
+    config = config.copy(update=update)
+    if config.seed is not None:
+        _rng.seed(config.seed)
+    return config
+
+
+@app.get("/mock/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("backend_sme.mock_openrouter:app", host="127.0.0.1", port=int(os.getenv("MOCK_LLM_PORT", "8100")))
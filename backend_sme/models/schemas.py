@@ -8,9 +8,21 @@ class DeductionItem(BaseModel):
     section: str
     reason: str
 
+class MerchantClassification(BaseModel):
+    description: str  # bank description as given in the input
+    merchant: str
+    category: str = ""
+    section: str = ""  # empty when the payment is not a deductible business expense
+    deductible_share: float = 1.0
+    confidence: float = 0.0
+
 class DeductionResponse(BaseModel):
     deductions: List[DeductionItem]
     estimated_tax_saved: float
+    # One entry per distinct bank description classified (learned for later runs)
+    merchants: List[MerchantClassification] = []
+    # Bank statement rows skipped because an earlier uploaded statement had them
+    duplicate_transactions: int = 0
 
 # GST Matcher Schemas
 class MissingITCItem(BaseModel):
@@ -19,6 +31,21 @@ class MissingITCItem(BaseModel):
     amount: float
     reason: str
 
+class IneligibleITCItem(BaseModel):
+    invoice_no: str
+    gstin: str
+    amount: float
+    hsn: str
+    section: str
+    reason: str
+
 class GSTMatcherResponse(BaseModel):
     missing_itc: List[MissingITCItem]
     total_itc_missed: float
+    ineligible_itc: List[IneligibleITCItem] = []
+    total_itc_ineligible: float = 0
+    # Set when the full item lists are kept server-side (/sme/gst/results/{id});
+    # the lists above may then hold only the first page of each
+    result_set_id: Optional[str] = None
+    missing_itc_count: int = 0
+    ineligible_itc_count: int = 0
@@ -1,10 +1,23 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Optional, List
+import asyncio
 import shutil
 import os
 import uuid
-from backend_sme.agents.deduction_agent import run_deduction_agent
-from backend_sme.agents.gst_agent import run_gst_agent
+from backend_sme.agents.deduction_agent import run_deduction_agent, build_deduction_prompt, parse_deduction_response
+from backend_sme.agents.gst_agent import run_gst_agent, build_gst_prompt, parse_gst_response
+from backend_sme.agents.orchestrator import run_orchestrator_agent
+from backend_sme.utils.openrouter_llm import stream_llm
+from backend_sme.utils.streaming import sse_event, PartialJSONItems
+from backend_sme.utils.conversation_memory import build_memory_context
+from backend_sme.utils.file_parser import parse_file_content, FILE_PARSE_MAX_CHARS
+from backend_sme.gst.reconciliation import resolve_ambiguous
+from backend_sme.gst.result_sets import result_sets, summarize
+from backend_sme.gst.sharding import reconcile_files
+from backend_sme.deductions.analysis import (
+    prepare_deduction_input, deduction_chunks, iter_chunk_results, merge_deductions, analyze_prepared,
+)
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -19,12 +32,7 @@ class ChatResponse(BaseModel):
     message: str
     savings_update: Optional[dict] = None
 
-@router.post("/", response_model=ChatResponse)
-async def chat_endpoint(
-    message: str = Form(...),
-    files: List[UploadFile] = File(None),
-    session_id: str = Form(...)
-):
+def _get_session(session_id: str) -> dict:
     # Initialize session if not exists
     if session_id not in sessions:
         sessions[session_id] = {
@@ -32,28 +40,95 @@ async def chat_endpoint(
             "uploaded_files": [],
             "savings": {"missedDeductions": 0, "gstItcMissed": 0, "details": []}
         }
-    
-    session = sessions[session_id]
-    
-    # Handle File Uploads
+    return sessions[session_id]
+
+def _store_uploads(session: dict, session_id: str, files: List[UploadFile]):
+    """Saves uploaded files and returns (full contents, short preview, saved paths)."""
     file_contents = ""
     file_preview = ""
+    file_paths = []
     if files:
         for file in files:
             file_path = os.path.join(UPLOAD_DIR, f"{session_id}_{file.filename}")
             with open(file_path, "wb") as buffer:
                 shutil.copyfileobj(file.file, buffer)
             session["uploaded_files"].append(file_path)
+            file_paths.append(file_path)
             
-            # Read content for analysis (simple text/csv for MVP)
+            # Read content for analysis (text/csv, portal JSON flattened to rows)
             try:
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
-                    file_contents += f"\n--- File: {file.filename} ---\n{content}\n"
-                    # Keep preview short for orchestrator
-                    file_preview += f"\n--- File: {file.filename} ---\n{content[:500]}...\n"
+                content = parse_file_content(file_path, FILE_PARSE_MAX_CHARS)
+                file_contents += f"\n--- File: {file.filename} ---\n{content}\n"
+                # Keep preview short for orchestrator
+                file_preview += f"\n--- File: {file.filename} ---\n{content[:500]}...\n"
             except Exception as e:
                 print(f"Error reading file {file.filename}: {e}")
+    return file_contents, file_preview, file_paths
+
+def _apply_deduction_result(session: dict, result) -> str:
+    # Update Session Savings
+    new_deductions = result.estimated_tax_saved
+    session["savings"]["missedDeductions"] += new_deductions
+    
+    # Add details
+    for deduction in result.deductions:
+        session["savings"]["details"].append({
+            "category": deduction.section, # Fixed: Mapped section to category
+            "description": deduction.title, # Fixed: Mapped title to description
+            "amount": deduction.amount
+        })
+        
+    reply = f"I found potential deductions worth ₹{new_deductions}. {result.deductions[0].title if result.deductions else ''}"
+    if result.duplicate_transactions:
+        reply += f" ({result.duplicate_transactions} transactions repeated across your statements were counted once.)"
+    return reply
+
+def _apply_gst_result(session: dict, result) -> str:
+    new_itc = result.total_itc_missed
+    session["savings"]["gstItcMissed"] += new_itc
+    # One summary entry per run; the invoices stay in the server-side result set
+    if not result.result_set_id:
+        result = summarize(result, result_sets)
+    count = result.missing_itc_count
+    if count:
+        first = result.missing_itc[0]
+        session["savings"]["details"].append({
+            "category": "GST ITC Missed",
+            "description": f"Invoice {first.invoice_no} from {first.gstin}" if count == 1 else f"{count} invoices with missed ITC",
+            "amount": new_itc,
+            "result_set_id": result.result_set_id,
+        })
+
+    return f"I found missed ITC worth ₹{new_itc}. {count} invoices matched."
+
+async def _reconcile_gst(file_paths: List[str]):
+    """
+    GSTR-2B and purchase register uploads reconciled by the rules, as in
+    /gst/run; the GST agent only decides the ambiguous invoices. None if
+    the uploads do not hold both documents.
+    """
+    result = await asyncio.to_thread(reconcile_files, file_paths)
+    if result is None:
+        return None
+    await resolve_ambiguous(result)
+    return summarize(result.to_response(), result_sets)
+
+def _general_reply(file_contents: str, orchestrator_result) -> str:
+    # GENERAL_QUERY
+    if file_contents:
+         return f"I see you uploaded files. Based on my analysis, they don't look like standard financial documents I can process immediately. {orchestrator_result.reason}"
+    return "I can help you with Tax Deductions and GST Matching. Please upload your bank statements or GSTR files."
+
+@router.post("/", response_model=ChatResponse)
+async def chat_endpoint(
+    message: str = Form(...),
+    files: List[UploadFile] = File(None),
+    session_id: str = Form(...)
+):
+    session = _get_session(session_id)
+    
+    # Handle File Uploads
+    file_contents, file_preview, file_paths = _store_uploads(session, session_id, files)
 
     # Add user message to history
     session["history"].append({
@@ -66,10 +141,11 @@ async def chat_endpoint(
     print(f"[DEBUG] Chat History Length: {len(session['history'])}")
     print(f"[DEBUG] Chat History: {session['history']}")
     
-    # Run Orchestrator with chat history
-    from backend_sme.agents.orchestrator import run_orchestrator_agent
+    # Bounded history (rolling summary + recent turns), built once for all agents
+    memory_context = await build_memory_context(session, session["history"])
     
-    orchestrator_result = run_orchestrator_agent(message, file_preview if file_preview else "No files uploaded.", session["history"])
+    # Run Orchestrator with chat history
+    orchestrator_result = await run_orchestrator_agent(message, file_preview if file_preview else "No files uploaded.", session["history"], memory_context)
     intent = orchestrator_result.intent
     print(f"Orchestrator Intent: {intent}")
 
@@ -81,22 +157,11 @@ async def chat_endpoint(
     if intent == "DEDUCTION_ANALYSIS":
         response_text = "I'm analyzing your documents for missed deductions..."
         try:
-            # Run Deduction Agent with chat history
-            result = run_deduction_agent(combined_input, session["history"])
-            
-            # Update Session Savings
-            new_deductions = result.estimated_tax_saved
-            session["savings"]["missedDeductions"] += new_deductions
-            
-            # Add details
-            for deduction in result.deductions:
-                session["savings"]["details"].append({
-                    "category": deduction.section, # Fixed: Mapped section to category
-                    "description": deduction.title, # Fixed: Mapped title to description
-                    "amount": deduction.amount
-                })
-                
-            response_text = f"I found potential deductions worth ₹{new_deductions}. {result.deductions[0].title if result.deductions else ''}"
+            # Known merchants are classified locally; the agent sees the rest, chunk by chunk
+            prepared = await asyncio.to_thread(prepare_deduction_input, file_paths)
+            result = await analyze_prepared(prepared, message, session["history"], memory_context,
+                                            agent=run_deduction_agent, source=session_id)
+            response_text = _apply_deduction_result(session, result)
             savings_update = session["savings"]
             
         except Exception as e:
@@ -105,31 +170,18 @@ async def chat_endpoint(
     elif intent == "GST_MATCHING":
         response_text = "I'm matching your GST documents..."
         try:
-            # For GST, we ideally need 2 files. We'll pass what we have.
-            result = run_gst_agent(combined_input, session["history"]) 
-            
-            new_itc = result.total_itc_missed
-            session["savings"]["gstItcMissed"] += new_itc
-             # Add details
-            for item in result.missing_itc:
-                session["savings"]["details"].append({
-                    "category": "GST ITC Missed",
-                    "description": f"Invoice {item.invoice_no} from {item.gstin}", # Fixed attribute names if needed, assume schema is correct
-                    "amount": item.amount
-                })
-
-            response_text = f"I found missed ITC worth ₹{new_itc}. {len(result.missing_itc)} invoices matched."
+            # Invoice lists are reconciled locally; other uploads are read by the agent
+            result = await _reconcile_gst(file_paths)
+            if result is None:
+                result = await run_gst_agent(combined_input, session["history"], memory_context)
+            response_text = _apply_gst_result(session, result)
             savings_update = session["savings"]
             
         except Exception as e:
              response_text = f"I encountered an error matching GST: {str(e)}"
     
     else:
-        # GENERAL_QUERY
-        if file_contents:
-             response_text = f"I see you uploaded files. Based on my analysis, they don't look like standard financial documents I can process immediately. {orchestrator_result.reason}"
-        else:
-             response_text = "I can help you with Tax Deductions and GST Matching. Please upload your bank statements or GSTR files."
+        response_text = _general_reply(file_contents, orchestrator_result)
 
     # Add assistant response to history
     session["history"].append({
@@ -138,3 +190,102 @@ async def chat_endpoint(
     })
 
     return ChatResponse(message=response_text, savings_update=savings_update)
+
+# Agent used for each streamable intent: (name, prompt builder, response parser,
+# session updater, key of the findings array in the JSON response)
+STREAMING_AGENTS = {
+    "DEDUCTION_ANALYSIS": ("deduction", build_deduction_prompt, parse_deduction_response, _apply_deduction_result, "deductions"),
+    "GST_MATCHING": ("gst", build_gst_prompt, parse_gst_response, _apply_gst_result, "missing_itc"),
+}
+
+@router.post("/stream")
+async def chat_stream_endpoint(
+    message: str = Form(...),
+    files: List[UploadFile] = File(None),
+    session_id: str = Form(...)
+):
+    """
+    Same as chat_endpoint, but streams progress as Server-Sent Events:
+    `intent`, `agent_started`, `token` (or `chunk` when a large deduction
+    input is analyzed in chunks; neither when GST invoice lists are
+    reconciled locally), `finding`, then a final `result`
+    carrying the ChatResponse payload (or `error`). The session is only
+    updated once the final result has been parsed, so an aborted stream
+    leaves no partial state behind.
+    """
+    session = _get_session(session_id)
+
+    # Uploads are read before streaming starts; the request body is gone afterwards
+    file_contents, file_preview, file_paths = _store_uploads(session, session_id, files)
+    history = session["history"] + [{"role": "user", "content": message}]
+    combined_input = f"{message}\n{file_contents}"
+
+    async def event_stream():
+        try:
+            memory_context = await build_memory_context(session, history)
+            orchestrator_result = await run_orchestrator_agent(message, file_preview if file_preview else "No files uploaded.", history, memory_context)
+        except Exception as e:
+            yield sse_event("error", {"message": f"I encountered an error while reading your request: {str(e)}"})
+            return
+        intent = orchestrator_result.intent
+        yield sse_event("intent", {"intent": intent, "reason": orchestrator_result.reason, "confidence": orchestrator_result.confidence})
+
+        savings_update = None
+        if intent in STREAMING_AGENTS:
+            name, build_prompt, parse_response, apply_result, findings_key = STREAMING_AGENTS[intent]
+            yield sse_event("agent_started", {"agent": name})
+
+            chunks, prepared, result = [combined_input], None, None
+            try:
+                if intent == "DEDUCTION_ANALYSIS":
+                    # Known merchants are classified locally and reported first; the agent streams the rest.
+                    # Reading the statements is CPU-bound, so it runs off the event loop
+                    prepared = await asyncio.to_thread(prepare_deduction_input, file_paths)
+                    chunks = deduction_chunks(prepared, message)
+                    for item in prepared.deductions:
+                        yield sse_event("finding", item.dict())
+                elif intent == "GST_MATCHING":
+                    # Invoice lists are reconciled locally; the agent only streams other uploads
+                    result = await _reconcile_gst(file_paths)
+                    if result is not None:
+                        for item in result.missing_itc:
+                            yield sse_event("finding", item.dict())
+
+                if result is None:
+                    if len(chunks) == 1:
+                        findings = PartialJSONItems(findings_key)
+                        async for token in stream_llm(build_prompt(chunks[0], history, memory_context)):
+                            yield sse_event("token", {"text": token})
+                            for item in findings.feed(token):
+                                yield sse_event("finding", item)
+                        responses = [parse_response(findings.buffer)]
+                    else:
+                        # Large inputs: chunks run concurrently, findings are reported per finished chunk
+                        responses = [None] * len(chunks)
+                        async for index, response in iter_chunk_results(chunks, history, memory_context, run_deduction_agent):
+                            responses[index] = response
+                            yield sse_event("chunk", {"index": index, "done": sum(r is not None for r in responses), "total": len(chunks)})
+                            for item in response.deductions:
+                                yield sse_event("finding", item.dict())
+                    result = merge_deductions(prepared, responses, source=session_id) if prepared is not None else responses[0]
+            except Exception as e:
+                yield sse_event("error", {"message": f"I encountered an error while running the {name} agent: {str(e)}"})
+                return
+
+            response_text = apply_result(session, result)
+            savings_update = session["savings"]
+        else:
+            response_text = _general_reply(file_contents, orchestrator_result)
+
+        # Persist only the final outcome
+        session["history"].extend([
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": response_text},
+        ])
+        yield sse_event("result", ChatResponse(message=response_text, savings_update=savings_update).dict())
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from backend_sme.agents.deduction_agent import run_deduction_agent
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from typing import List, Optional
+from backend_sme.deductions.analysis import analyze_deductions
 from backend_sme.models.schemas import DeductionResponse
-from backend_sme.utils.file_parser import parse_file_content
+from backend_sme.utils.resilience import LLMError
 import shutil
 import os
 
@@ -21,28 +22,22 @@ async def upload_files(files: list[UploadFile] = File(...)):
     return {"message": "Files uploaded successfully", "files": saved_files}
 
 @router.post("/run", response_model=DeductionResponse)
-async def run_deduction_analysis():
+async def run_deduction_analysis(client_id: str = "default", merchant: Optional[List[str]] = Query(None)):
     # In a real app, we might pass specific file IDs. 
-    # For MVP, we'll just read the most recent files or all files in the upload dir.
-    # Let's read all text/csv files in the directory and concatenate them.
-    
-    combined_content = ""
+    # For MVP, we'll just read all files in the upload dir. Bank statement
+    # rows from known merchants are classified locally; the agent only sees
+    # the other debits summarized by merchant and month (raw rows for each
+    # `merchant` asked for) and the other files, in chunks analyzed concurrently.
+    # The agent's merchant classifications are learned as answers for `client_id`.
     try:
-        for filename in os.listdir(UPLOAD_DIR):
-            file_path = os.path.join(UPLOAD_DIR, filename)
-            if os.path.isfile(file_path):
-                try:
-                    content = parse_file_content(file_path)
-                    combined_content += f"\n--- File: {filename} ---\n"
-                    combined_content += content
-                except Exception as e:
-                    print(f"Skipping file {filename}: {e}")
-        
-        if not combined_content:
+        file_paths = [os.path.join(UPLOAD_DIR, f) for f in sorted(os.listdir(UPLOAD_DIR))]
+        file_paths = [path for path in file_paths if os.path.isfile(path)]
+        if not file_paths:
             return DeductionResponse(deductions=[], estimated_tax_saved=0)
 
-        result = run_deduction_agent(combined_content)
-        return result
+        return await analyze_deductions(file_paths, drill_down=merchant or (), source=client_id)
         
+    except LLMError as e:
+        raise HTTPException(status_code=503, detail=f"LLM service unavailable: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,9 +1,20 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import StreamingResponse
 from backend_sme.agents.gst_agent import run_gst_agent
 from backend_sme.models.schemas import GSTMatcherResponse
-from backend_sme.utils.file_parser import parse_file_content
+from backend_sme.utils.file_parser import parse_file_content, FILE_PARSE_MAX_CHARS
+from backend_sme.utils.resilience import LLMError
+from backend_sme.gst.sources import INVOICE_EXTENSIONS
+from backend_sme.gst.reconciliation import resolve_ambiguous
+from backend_sme.gst.sharding import reconcile_files
+from backend_sme.gst.index import gst_index
+from backend_sme.gst.result_sets import KINDS, GST_RESULT_PAGE_SIZE, ResultFilter, result_sets, summarize
+from backend_sme.gst.reconciliation import ReconciliationResult
+from backend_sme.gst.vendors import top_vendors, vendor_report
+import asyncio
 import shutil
 import os
+from typing import Optional
 
 router = APIRouter()
 
@@ -20,36 +31,123 @@ async def upload_files(files: list[UploadFile] = File(...)):
         saved_files.append(file.filename)
     return {"message": "Files uploaded successfully", "files": saved_files}
 
+def _reconcile_uploads(invoice_paths, client_id: str, rebuild: bool, workers: Optional[int]):
+    """
+    The blocking part of a run (CSV ingest, index queries, reconciliation and
+    its process pool): returns (result or None, index history or None).
+    """
+    history = None
+    if gst_index is not None:
+        if rebuild:
+            gst_index.forget(client_id)
+        added = sum(gst_index.ingest(client_id, path) for path in invoice_paths)
+        result = gst_index.reconcile(client_id, workers=workers)
+        if result is not None:
+            print(f"GST index: {added} new invoice lines for {client_id}")
+            # Results only hold the open items; vendor totals cover the whole history
+            history = gst_index.vendor_history(client_id)
+    else:
+        result = reconcile_files(invoice_paths, workers=workers)
+    return result, history
+
 @router.post("/run", response_model=GSTMatcherResponse)
-async def run_gst_matching():
-    # For MVP, we'll assume files are named or we just take the first two text files found.
-    # Or simpler: we concatenate all files and let the LLM figure it out (might be risky for token limits).
-    # Better: Try to identify GSTR2B vs Purchase Register by filename or content.
-    # For this hackathon MVP, let's just concatenate everything and label it "Input Documents".
-    # But the prompt expects two separate inputs.
-    
-    gstr2b_content = ""
-    purchase_register_content = ""
-    
+async def run_gst_matching(client_id: str = "default", rebuild: bool = False, workers: Optional[int] = None):
+    # GSTR-2B (CSV or portal JSON) and purchase register CSVs are reconciled natively; the LLM only
+    # sees the invoices the rules cannot decide. Other uploads (or a missing
+    # side) fall back to letting the LLM read every file. With the index
+    # enabled only new uploads are read and the client's open items are
+    # re-checked; otherwise rows are streamed into column tables each run.
+    # `workers` > 1 shards large runs by supplier GSTIN across processes
+    # (at most one per CPU). The blocking work runs in a thread so the event
+    # loop keeps serving other requests and streams.
+    # The response carries the totals and the first page of findings; the
+    # rest are read through /results/{result_set_id}, and the per-supplier
+    # report through /vendors.
+    if workers is not None:
+        workers = max(1, min(workers, os.cpu_count() or 1))
     try:
-        files = os.listdir(UPLOAD_DIR)
+        files = sorted(f for f in os.listdir(UPLOAD_DIR) if os.path.isfile(os.path.join(UPLOAD_DIR, f)))
+        invoice_paths = [os.path.join(UPLOAD_DIR, f) for f in files if f.lower().endswith(INVOICE_EXTENSIONS)]
+        result, history = await asyncio.to_thread(_reconcile_uploads, invoice_paths, client_id, rebuild, workers)
+
+        if result is not None:
+            await resolve_ambiguous(result)
+            print(f"GST reconciliation: {result.summary()}")
+            vendors = await asyncio.to_thread(vendor_report, result, history)
+            return summarize(result.to_response(), result_sets, client_id=client_id, vendors=vendors)
+
         combined_content = ""
-        
         for filename in files:
             file_path = os.path.join(UPLOAD_DIR, filename)
-            if os.path.isfile(file_path):
-                try:
-                    content = parse_file_content(file_path)
-                    combined_content += f"\n--- File: {filename} ---\n"
-                    combined_content += content
-                except Exception as e:
-                    print(f"Skipping file {filename}: {e}")
+            try:
+                content = parse_file_content(file_path, FILE_PARSE_MAX_CHARS)
+                combined_content += f"\n--- File: {filename} ---\n"
+                combined_content += content
+            except Exception as e:
+                print(f"Skipping file {filename}: {e}")
         
         if not combined_content:
              return GSTMatcherResponse(missing_itc=[], total_itc_missed=0)
 
-        result = run_gst_agent(combined_content)
-        return result
+        result = await run_gst_agent(combined_content)
+        findings = ReconciliationResult(missing_itc=result.missing_itc, ineligible_itc=result.ineligible_itc)
+        return summarize(result, result_sets, client_id=client_id, vendors=vendor_report(findings))
         
+    except LLMError as e:
+        raise HTTPException(status_code=503, detail=f"LLM service unavailable: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/index")
+async def gst_index_stats(client_id: str = "default"):
+    """Open and matched invoice lines in the client's reconciliation index."""
+    if gst_index is None:
+        raise HTTPException(status_code=404, detail="GST reconciliation index is disabled")
+    return gst_index.stats(client_id)
+
+def _result_set(result_set_id: str, kind: str):
+    if kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(KINDS)}")
+    result_set = result_sets.get(result_set_id)
+    if result_set is None:
+        raise HTTPException(status_code=404, detail="Result set not found or expired")
+    return result_set
+
+@router.get("/results/{result_set_id}")
+async def get_result_page(result_set_id: str, kind: str = "missing_itc", cursor: Optional[str] = None,
+                          limit: int = GST_RESULT_PAGE_SIZE, gstin: Optional[str] = None,
+                          reason: Optional[str] = None, min_amount: Optional[float] = None):
+    """One page of a reconciliation's findings; pass next_cursor back for the next one."""
+    result_set = _result_set(result_set_id, kind)
+    try:
+        return result_set.page(kind, cursor, limit, ResultFilter(gstin, reason, min_amount))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/results/{result_set_id}/export")
+async def export_results(result_set_id: str, kind: str = "missing_itc", gstin: Optional[str] = None,
+                         reason: Optional[str] = None, min_amount: Optional[float] = None):
+    """All matching findings as NDJSON (one JSON object per line), streamed."""
+    result_set = _result_set(result_set_id, kind)
+    return StreamingResponse(
+        result_set.export(kind, ResultFilter(gstin, reason, min_amount)),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="gst-{kind}-{result_set_id}.ndjson"'},
+    )
+
+@router.get("/vendors")
+async def get_vendors(client_id: str = "default", result_set_id: Optional[str] = None, sort: str = "itc_at_risk",
+                      limit: Optional[int] = None, gstin: Optional[str] = None):
+    """
+    Per-supplier ITC report of a reconciliation run (the client's latest by
+    default): invoices booked/filed/matched, missed ITC split into not filed
+    and amount mismatches, blocked credits and a monthly trend.
+    """
+    result_set = result_sets.get(result_set_id) if result_set_id else result_sets.latest(client_id)
+    if result_set is None or result_set.vendors is None:
+        raise HTTPException(status_code=404, detail="No reconciliation run found; run /sme/gst/run first")
+    try:
+        report = top_vendors(result_set.vendors, sort, limit, gstin)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"result_set_id": result_set.id, **report}
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from backend_sme.utils.llm_cache import llm_cache
+from backend_sme.utils.openrouter_llm import breaker, latency_tracker
+from backend_sme.agents.intent_classifier import routing_stats
+from backend_sme.utils.single_flight import single_flight
+from backend_sme.utils.prompt_registry import prompt_registry
+from backend_sme.gst.result_sets import result_sets
+from backend_sme.deductions.dictionary import merchant_dictionary
+
+router = APIRouter()
+
+@router.get("/")
+async def get_metrics():
+    """Runtime counters for the LLM layer."""
+    return {
+        "llm_cache": llm_cache.stats(),
+        "llm_circuit_breaker": breaker.stats(),
+        "llm_latency": latency_tracker.stats(),
+        "intent_routing": routing_stats.stats(),
+        "single_flight": single_flight.stats(),
+        "prompt_sizes": prompt_registry.stats(),
+        "gst_result_sets": result_sets.stats(),
+        "merchant_dictionary": merchant_dictionary.stats() if merchant_dictionary is not None else None,
+    }
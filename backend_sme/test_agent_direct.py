@@ -1,5 +1,6 @@
 import sys
 import os
+import asyncio
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend_sme.agents.deduction_agent import run_deduction_agent
@@ -18,7 +19,7 @@ def test_deduction_agent():
     Vendor: Dell India
     """
     try:
-        result = run_deduction_agent(content)
+        result = asyncio.run(run_deduction_agent(content))
         print("Deduction Result:", result)
     except Exception as e:
         print(f"Deduction Failed: {e}")
@@ -36,7 +37,7 @@ def test_gst_agent():
     Invoice: INV-002, Vendor: XYZ Ltd, Amount: 20000, Tax: 3600
     """
     try:
-        result = run_gst_agent(content)
+        result = asyncio.run(run_gst_agent(content))
         print("GST Result:", result)
     except Exception as e:
         print(f"GST Failed: {e}")
@@ -7,6 +7,7 @@ to verify that conversation history is properly maintained and used.
 
 import sys
 import os
+import asyncio
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend_sme.agents.orchestrator import run_orchestrator_agent
@@ -31,7 +32,7 @@ def test_context_retention():
     user_msg_1 = "I want to find tax deductions in my expenses"
     chat_history.append({"role": "user", "content": user_msg_1})
     
-    result_1 = run_orchestrator_agent(user_msg_1, "No files uploaded.", chat_history)
+    result_1 = asyncio.run(run_orchestrator_agent(user_msg_1, "No files uploaded.", chat_history))
     print(f"Intent: {result_1.intent}")
     print(f"Reason: {result_1.reason}")
     
@@ -43,7 +44,7 @@ def test_context_retention():
     user_msg_2 = "Can you also check my GST invoices?"
     chat_history.append({"role": "user", "content": user_msg_2})
     
-    result_2 = run_orchestrator_agent(user_msg_2, "No files uploaded.", chat_history)
+    result_2 = asyncio.run(run_orchestrator_agent(user_msg_2, "No files uploaded.", chat_history))
     print(f"Intent: {result_2.intent}")
     print(f"Reason: {result_2.reason}")
     print(f"Chat History Length: {len(chat_history)}")
@@ -56,7 +57,7 @@ def test_context_retention():
     user_msg_3 = "What about the previous deductions you mentioned?"
     chat_history.append({"role": "user", "content": user_msg_3})
     
-    result_3 = run_orchestrator_agent(user_msg_3, "No files uploaded.", chat_history)
+    result_3 = asyncio.run(run_orchestrator_agent(user_msg_3, "No files uploaded.", chat_history))
     print(f"Intent: {result_3.intent}")
     print(f"Reason: {result_3.reason}")
     print(f"Chat History Length: {len(chat_history)}")
@@ -99,7 +100,7 @@ def test_deduction_agent_with_context():
     print(f"Chat History Length: {len(chat_history)}")
     
     try:
-        result = run_deduction_agent(sample_data, chat_history)
+        result = asyncio.run(run_deduction_agent(sample_data, chat_history))
         print(f"✓ Agent called successfully with context")
         print(f"  - Found {len(result.deductions)} deductions")
         print(f"  - Estimated savings: ₹{result.estimated_tax_saved}")
@@ -0,0 +1,72 @@
+"""
+Tests for bounded conversation memory with rolling summarization.
+"""
+import sys
+import os
+import asyncio
+from unittest.mock import patch
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.utils import conversation_memory
+from backend_sme.utils.conversation_memory import build_memory_context, NO_HISTORY
+
+
+def _history(turns: int) -> list:
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question {i}"})
+        history.append({"role": "assistant", "content": f"Answer {i}"})
+    history.append({"role": "user", "content": "Current question"})
+    return history
+
+
+def test_short_history_is_verbatim():
+    print("Testing short conversation...")
+    session = {}
+    with patch.object(conversation_memory, "call_llm") as mock_llm:
+        context = asyncio.run(build_memory_context(session, _history(2)))
+        assert not mock_llm.called
+    assert "User: Question 0" in context
+    assert "Current question" not in context
+    assert asyncio.run(build_memory_context({}, [{"role": "user", "content": "hi"}])) == NO_HISTORY
+    print("✓ No summary needed, current message excluded")
+
+
+def test_older_turns_summarized_once():
+    print("Testing incremental summarization...")
+    session = {}
+    summaries = iter(["summary v1", "summary v2"])
+
+    async def fake_llm(prompt, **kwargs):
+        return next(summaries)
+
+    with patch.object(conversation_memory, "call_llm", side_effect=fake_llm) as mock_llm:
+        history = _history(10)
+        context = asyncio.run(build_memory_context(session, history))
+        assert mock_llm.call_count == 1
+        assert "summary v1" in context
+        assert "Question 9" in context and "Question 0" not in context
+        first_prompt = mock_llm.call_args[0][0]
+        assert "Question 0" in first_prompt
+
+        # Same request reused: no new summarization
+        asyncio.run(build_memory_context(session, history))
+        assert mock_llm.call_count == 1
+
+        # Two more turns: only the newly evicted messages are summarized
+        history = history[:-1] + _history(12)[-5:]
+        context = asyncio.run(build_memory_context(session, history))
+        assert mock_llm.call_count == 2
+        second_prompt = mock_llm.call_args[0][0]
+        assert "summary v1" in second_prompt
+        assert "Question 0" not in second_prompt
+        assert "summary v2" in context
+    print("✓ Each old message is summarized exactly once")
+
+
+if __name__ == "__main__":
+    test_short_history_is_verbatim()
+    test_older_turns_summarized_once()
+    print("\nALL TESTS PASSED ✓")
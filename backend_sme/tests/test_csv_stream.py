@@ -0,0 +1,91 @@
+"""
+Tests for the streaming, typed CSV reader.
+"""
+import sys
+import os
+import tempfile
+from datetime import date
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.utils.csv_stream import AMOUNT, DATE, TEXT, CSVStream, parse_date
+from backend_sme.utils.file_parser import parse_file_content
+from backend_sme.gst.invoices import load_invoices
+
+TEST_DATA = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../test_data"))
+
+
+def _write(text: str) -> str:
+    f = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8")
+    f.write(text)
+    f.close()
+    return f.name
+
+
+def test_dtype_inference():
+    print("Testing dtype inference...")
+    stream = CSVStream(os.path.join(TEST_DATA, "gstr_2b.csv"))
+    dtypes = dict(zip(stream.header, stream.dtypes))
+    assert dtypes["GSTIN"] == TEXT
+    assert dtypes["Taxable Value"] == AMOUNT
+    assert dtypes["Invoice Date"] == DATE
+    rows = [row for batch in stream for row in batch.rows]
+    assert len(rows) == stream.rows_read == 4
+    assert isinstance(rows[0][stream.column("Taxable Value")], float)
+    assert isinstance(rows[0][stream.column("Invoice Date")], date)
+    assert parse_date("04/15/2024", dayfirst=False) == parse_date("2024-04-15") == date(2024, 4, 15)
+    # dd/mm/yy exports are in this century, not year 24 AD
+    assert parse_date("01/04/24") == date(2024, 4, 1)
+    for bad in ("01/04/024", "001/04/2024"):
+        try:
+            parse_date(bad)
+            assert False, f"Expected ValueError for {bad}"
+        except ValueError:
+            pass
+    print("✓ Amount, date and text columns detected")
+
+
+def test_batches_and_bad_values():
+    print("Testing batching...")
+    path = _write("Date,Amount,Ref\n" + "".join(f"01-04-2024,{i},00{i}\n" for i in range(10)) + "\n02-04-2024,n/a,x\n")
+    try:
+        stream = CSVStream(path, batch_size=4, sniff_rows=5, dtypes={"ref": TEXT})
+        batches = list(stream)
+        assert [len(b.rows) for b in batches] == [4, 4, 3]
+        assert [b.first_line for b in batches] == [2, 6, 10]
+        assert batches[0].rows[1] == (date(2024, 4, 1), 1.0, "001")
+        assert batches[-1].rows[-1][1] is None and stream.bad_values == 1
+    finally:
+        os.remove(path)
+    print("✓ Fixed-size batches, overrides honoured, bad values counted")
+
+
+def test_invoice_ids_stay_text():
+    print("Testing numeric invoice numbers...")
+    path = _write("GSTIN,Invoice No,Date,Taxable Value,CGST,SGST\n27ABCDE1234F1Z5,0042,05-04-2024,100,9,9\n")
+    os.rename(path, path.replace(".csv", "_purchase.csv"))
+    path = path.replace(".csv", "_purchase.csv")
+    try:
+        _, invoices = load_invoices(path)
+        assert invoices[0].invoice_no == "0042" and invoices[0].invoice_date == "2024-04-05"
+    finally:
+        os.remove(path)
+    print("✓ Leading zeros kept, dates normalized")
+
+
+def test_prompt_text_is_capped():
+    print("Testing capped prompt text...")
+    full = parse_file_content(os.path.join(TEST_DATA, "bank_statement.csv"))
+    capped = parse_file_content(os.path.join(TEST_DATA, "bank_statement.csv"), max_chars=100)
+    assert len(capped) < len(full) and "truncated" in capped
+    assert full.startswith(capped.split("\n")[0])
+    print("✓ String API unchanged, optional cap applied")
+
+
+if __name__ == "__main__":
+    test_dtype_inference()
+    test_batches_and_bad_values()
+    test_invoice_ids_stay_text()
+    test_prompt_text_is_capped()
+    print("\nALL TESTS PASSED ✓")
@@ -0,0 +1,85 @@
+"""
+Tests for the merchant-by-month summary of bank debits sent to the deduction agent.
+"""
+import sys
+import os
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.deductions.aggregate import MerchantMonth, aggregate_debits, merchant_key, summary_rows
+from backend_sme.deductions.analysis import prepare_deduction_input
+from backend_sme.deductions.statements import Transaction
+
+STATEMENT = (
+    "Date,Description,Reference,Debit,Credit\n"
+    "01-04-2024,UPI/412345678901/SWIGGY/swiggy@icici/Bangalore,U-1,1200.00,\n"
+    "09-04-2024,UPI/412345679999/SWIGGY/swiggy@icici/Mumbai,U-2,800.00,\n"
+    "03-05-2024,POS 4021XXXX1234 SWIGGY NEW DELHI IN,U-3,500.00,\n"
+    "10-05-2024,NEFT/N123/KUMAR AND CO CHARTERED ACC,N-1,25000.00,\n"
+    "11-05-2024,SELF TRANSFER TO SAVINGS,T-1,90000.00,\n"
+    "12-05-2024,SWIGGY REFUND,R-1,,300.00\n"
+)
+
+
+def _transaction(date: str, description: str, debit: float, credit: float = 0.0) -> Transaction:
+    return Transaction(date, description, "", debit, credit, "x.csv", 2)
+
+
+def test_groups_by_merchant_and_month():
+    print("Testing merchant and month groups...")
+    summary = aggregate_debits([
+        _transaction("2024-04-01", "UBER RIDES BLR", 850.0),
+        _transaction("2024-04-20", "UPI/991/UBER RIDES/uber@axis", 150.0),
+        _transaction("2024-05-02", "UBER RIDES", 400.0),
+        _transaction("2024-04-05", "ACME TOOLS", 5000.0),
+        _transaction("05/13/2024", "ACME TOOLS", 100.0),
+        _transaction("2024-04-06", "ACME TOOLS", 0.0, 700.0),  # credit
+    ])
+    assert summary == [
+        MerchantMonth("ACME TOOLS", "2024-04", 1, 5000.0, 5000.0, 5000.0, "ACME TOOLS"),
+        MerchantMonth("ACME TOOLS", "unknown", 1, 100.0, 100.0, 100.0, "ACME TOOLS"),
+        MerchantMonth("UBER RIDES", "2024-04", 2, 1000.0, 150.0, 850.0, "UBER RIDES BLR"),
+        MerchantMonth("UBER RIDES", "2024-05", 1, 400.0, 400.0, 400.0, "UBER RIDES BLR"),
+    ]
+    assert summary_rows(summary[2:3]) == ["UBER RIDES,2024-04,2,1000.00,150.00,850.00,UBER RIDES BLR"]
+    assert merchant_key("UPI/123/456") == "UPI 123 456"
+    assert aggregate_debits([]) == []
+    print("Groups ✓")
+
+
+def test_agent_gets_the_summary():
+    print("Testing summary document and drill-down...")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "statement.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(STATEMENT)
+        prepared = prepare_deduction_input([path], dictionary=None)
+        assert prepared.stats["unknown_rows"] == 4 and prepared.stats["summary_rows"] == 3
+        document = prepared.document
+        assert "KUMAR AND CO CHARTERED,2024-05,1,25000.00" in document
+        assert "SWIGGY,2024-04,2,2000.00,800.00,1200.00" in document
+        assert "SWIGGY,2024-05,1,500.00" in document
+        assert "SELF TRANSFER" not in document and "REFUND" not in document
+        assert "U-1" not in document
+
+        hdfc = os.path.join(folder, "hdfc.csv")
+        with open(hdfc, "w", encoding="utf-8") as f:
+            f.write("Date,Narration,Chq./Ref.No.,Withdrawal Amt.,Deposit Amt.\n"
+                    "01/04/24,ACME TOOLS,X-1,500.00,\n28/04/24,ACME TOOLS,X-2,250.00,\n")
+        short_years = prepare_deduction_input([hdfc], dictionary=None).document
+        assert "ACME TOOLS,2024-04,2,750.00" in short_years and "0024-" not in short_years
+
+        drilled = prepare_deduction_input([path], dictionary=None, drill_down=["Swiggy"])
+        document = drilled.document
+        assert "SWIGGY,2024-04" not in document and "KUMAR AND CO CHARTERED,2024-05" in document
+        assert "(every debit of SWIGGY)" in document
+        assert "2024-04-01,UPI/412345678901/SWIGGY/swiggy@icici/Bangalore,U-1,1200.00" in document
+    print("Summary document ✓")
+
+
+if __name__ == "__main__":
+    test_groups_by_merchant_and_month()
+    test_agent_gets_the_summary()
+    print("\nALL TESTS PASSED ✓")
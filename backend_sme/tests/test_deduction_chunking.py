@@ -0,0 +1,117 @@
+"""
+Tests for the chunked (map-reduce) deduction analysis of large statements.
+"""
+import sys
+import os
+import asyncio
+import tempfile
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.deductions.analysis import (
+    DeductionInput, Section, analyze_prepared, deduction_chunks, merge_deductions, prepare_deduction_input,
+)
+from backend_sme.models.schemas import DeductionItem, DeductionResponse
+from backend_sme.utils.tokens import estimate_tokens
+
+HEADER = "Date,Description,Reference,Debit,Credit\n"
+
+
+def _prepared(rows: int) -> DeductionInput:
+    lines = [f"2024-04-{i % 28 + 1:02d},Vendor {i},R-{i},{100 + i}.00" for i in range(rows)]
+    return DeductionInput([], "", [Section("statement.csv", "Date,Description,Reference,Debit", lines)], {})
+
+
+def _item(title: str, amount: float, section: str = "37(1)", reason: str = "Business expense") -> DeductionItem:
+    return DeductionItem(title=title, amount=amount, section=section, reason=reason)
+
+
+def test_chunks_are_token_bounded():
+    print("Testing chunking...")
+    prepared = _prepared(2000)
+    chunks = deduction_chunks(prepared, "find my deductions", max_tokens=500)
+    assert len(chunks) > 10
+    assert all(estimate_tokens(chunk) < 600 for chunk in chunks)
+    # Every row exactly once, each chunk keeps the header, the message only in the first
+    body = "".join(chunks)
+    assert all(body.count(f",Vendor {i},R-{i},") == 1 for i in (0, 999, 1999))
+    assert all("Date,Description,Reference,Debit\n" in chunk for chunk in chunks)
+    assert chunks[0].startswith("find my deductions") and sum("find my deductions" in c for c in chunks) == 1
+    assert f"Part {len(chunks)} of {len(chunks)}" in chunks[-1]
+
+    small = deduction_chunks(_prepared(3), "hi")
+    assert len(small) == 1 and small[0].startswith("hi\n") and "Part" not in small[0]
+    assert deduction_chunks(DeductionInput([], "", [], {}), "") == []
+    print("Chunking ✓")
+
+
+def test_reduce_merges_duplicates():
+    print("Testing reduce...")
+    local = [_item("AWS", 12000.0)]
+    prepared = DeductionInput(local, "note", [], {})
+    merged = merge_deductions(prepared, [
+        DeductionResponse(deductions=[_item("Swiggy", 1000.0, reason="Staff meals"), _item("aws", 12000.0)],
+                          estimated_tax_saved=99999),
+        DeductionResponse(deductions=[_item("SWIGGY", 500.0, "Section 37(1)", "Team lunch")], estimated_tax_saved=1),
+    ], dictionary=None)
+    assert [(item.title, item.amount) for item in merged.deductions] == [("AWS", 12000.0), ("Swiggy", 1500.0)]
+    assert merged.deductions[1].reason == "Staff meals; Team lunch"
+    assert merged.estimated_tax_saved == 4050.0  # 30% of the merged amounts, not the agent's estimates
+    print("Reduce ✓")
+
+
+def test_chunks_run_concurrently():
+    print("Testing bounded concurrent map...")
+    running, peak = 0, 0
+
+    async def agent(document, chat_history=None, memory_context=None):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        rows = document.count("Vendor")
+        return DeductionResponse(deductions=[_item("Vendors", float(rows))], estimated_tax_saved=0)
+
+    prepared = _prepared(4000)
+    chunks = deduction_chunks(prepared, max_tokens=500)
+    start = time.perf_counter()
+    result = asyncio.run(analyze_prepared(prepared, agent=agent, dictionary=None))
+    elapsed = time.perf_counter() - start
+    assert len(chunks) > 40 and 1 < peak <= 8
+    assert elapsed < 0.05 * len(chunks) / 2
+    assert [(item.title, item.amount) for item in result.deductions] == [("Vendors", 4000.0)]
+    print(f"{len(chunks)} chunks in {elapsed:.2f}s ✓")
+
+
+def test_statement_end_to_end():
+    print("Testing chunked statement analysis...")
+    calls = []
+
+    async def agent(document, chat_history=None, memory_context=None):
+        calls.append(document)
+        return DeductionResponse(deductions=[_item("Shops", 100.0 * document.count(",2024-04,1,100.00,"))], estimated_tax_saved=0)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "statement.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            # 3000 different merchants, one summary line each
+            names = [f"SHOP Q{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}{chr(65 + i // 676)}" for i in range(3000)]
+            f.write(HEADER + "".join(f"01-04-2024,{name},S-{i},100.00,\n" for i, name in enumerate(names)))
+            f.write("02-04-2024,AWS EMEA,A-1,5000.00,\n")
+        prepared = prepare_deduction_input([path], dictionary=None)
+        result = asyncio.run(analyze_prepared(prepared, "deductions please", agent=agent, dictionary=None))
+    assert len(calls) > 1 and all("do not repeat: AWS" in call for call in calls)
+    assert [(item.title, item.amount) for item in result.deductions] == [("AWS", 5000.0), ("Shops", 300000.0)]
+    assert result.estimated_tax_saved == 91500.0
+    print("End to end ✓")
+
+
+if __name__ == "__main__":
+    test_chunks_are_token_bounded()
+    test_reduce_merges_duplicates()
+    test_chunks_run_concurrently()
+    test_statement_end_to_end()
+    print("\nALL TESTS PASSED ✓")
@@ -0,0 +1,121 @@
+"""
+Tests for the rule-based merchant classifier in front of the deduction agent.
+"""
+import sys
+import os
+import asyncio
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.deductions.analysis import analyze_deductions, classify_transactions, prepare_deduction_input
+from backend_sme.deductions.merchants import Merchant, MerchantMatcher, merchant_matcher, normalize_description
+from backend_sme.deductions.statements import Transaction
+
+STATEMENT = (
+    "Txn Date,Narration,Chq/Ref No,Withdrawal Amt,Deposit Amt,Balance\n"
+    "01-04-2024,AWS EMEA SERVICE,AWS-1001,12000.00,,500000.00\n"
+    "03-04-2024,UPI/OLA CABS/ola@axis,UPI-1,450.00,,499550.00\n"
+    "10-04-2024,Client Payment,,,150000.00,649550.00\n"
+    "12-04-2024,ATM WDL MG ROAD,ATM-7,10000.00,,639550.00\n"
+    "15-04-2024,\"Apple Store (Macbook)\",DEV-1,185000.00,,454550.00\n"
+    "22-04-2024,Swiggy (Staff Lunch),FOOD-11,1200.00,,453350.00\n"
+)
+
+
+def _transaction(description: str, debit: float = 100.0, credit: float = 0.0) -> Transaction:
+    return Transaction("2024-04-01", description, "", debit, credit, "x.csv", 2)
+
+
+def test_automaton_matches():
+    print("Testing Aho-Corasick merchant matching...")
+    assert normalize_description("UPI/OLA-CABS/123") == " UPI OLA CABS 123 "
+    assert merchant_matcher.match("AWS EMEA SERVICE").name == "AWS"
+    assert merchant_matcher.match("ZOOM VIDEO COMM").name == "Zoom"
+    assert merchant_matcher.match("NEFT/UBER INDIA SYSTEMS").name == "Uber"
+    assert merchant_matcher.match("Apple Store (Macbook)").section == "32"
+    assert merchant_matcher.match("CURRENT ACCOUNT INTEREST") is None  # RENT only as a whole word
+    assert merchant_matcher.match("SLACKLINE GEAR") is None
+    assert merchant_matcher.match("Swiggy (Staff Lunch)") is None
+    # Brand names alone do not make a business expense
+    assert merchant_matcher.match("HOUSE RENT TO LANDLORD") is None
+    assert merchant_matcher.match("UPI/UBER EATS/ubereats@icici") is None
+    assert merchant_matcher.match("UPI/JIO MART/jiomart@hdfc") is None
+    assert merchant_matcher.match("NEFT SHOP RENT APRIL").section == "30"
+    assert merchant_matcher.match("POS GCP PETROL PUMP") is None
+    assert merchant_matcher.match("NEFT MMT LOGISTICS") is None
+    assert merchant_matcher.match("UPI/DELL MEDICALS/dell@ybl") is None
+    assert merchant_matcher.match("DELL INTERNATIONAL SERVICES").section == "32"
+    assert merchant_matcher.match("NEFT SALARY APRIL") is None  # left to the agent
+    # A non-deductible payment wins a tie with an expense
+    assert merchant_matcher.match("CREDIT CARD PAYMENT AMAZON WEB SERVICES").name == "Credit card bill"
+    assert merchant_matcher.match("AMAZON WEB SERVICES CREDIT CARD PAYMENT").name == "Credit card bill"
+
+    # Longest pattern wins over a shorter one found earlier; ties go to a non-deductible payment,
+    # then the merchant listed first
+    matcher = MerchantMatcher([
+        Merchant("Google", "Search", "37(1)", 1.0, ("GOOGLE",)),
+        Merchant("Google Cloud", "Cloud", "37(1)", 1.0, ("GOOGLE CLOUD",)),
+        Merchant("Cloud A", "Cloud", "37(1)", 1.0, ("CLOUD",)),
+        Merchant("Cloud B", "Cloud", "37(1)", 1.0, ("CLOUD",)),
+        Merchant("Loud", "Audio", "37(1)", 1.0, ("LOUD SPEAKER",)),
+        Merchant("Cloud refund", "Refund", "", 0.0, ("CLOUD REFUND",)),
+        Merchant("Cloud backup", "Cloud", "37(1)", 1.0, ("CLOUD BACKUP",)),
+    ])
+    assert matcher.match("GOOGLE CLOUD EMEA").name == "Google Cloud"
+    assert matcher.match("GOOGLE PLAY").name == "Google"
+    assert matcher.match("MY CLOUD").name == "Cloud A"
+    assert matcher.match("CLOUD LOUD SPEAKER").name == "Loud"  # found through a failure link
+    assert matcher.match("CLOUD BACKUP CLOUD REFUND").name == "Cloud refund"
+    print("Matching ✓")
+
+
+def test_classification_splits_rows():
+    print("Testing one-pass classification...")
+    found = classify_transactions([
+        _transaction("AWS EMEA", 1000), _transaction("AWS EMEA", 500), _transaction("CLIENT", 0, 9000),
+        _transaction("ATM WDL", 2000), _transaction("Mystery Vendor", 700),
+    ], dictionary=None)
+    assert found.rows == 5 and found.excluded == 1
+    assert [(m.name, totals) for m, totals in found.known.items()] == [("AWS", [1500.0, 2])]
+    assert [t.description for t in found.unknown] == ["Mystery Vendor"]
+    print("Classification ✓")
+
+
+def test_only_unknown_rows_reach_the_agent():
+    print("Testing agent document...")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "statement.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(STATEMENT)
+        prepared = prepare_deduction_input([path], dictionary=None)
+    assert prepared.stats == {"statement_rows": 6, "classified_rows": 3, "excluded_rows": 1, "unknown_rows": 1, "duplicate_rows": 0, "summary_rows": 1}
+    by_title = {item.title: item for item in prepared.deductions}
+    assert by_title["AWS"].amount == 12000.0 and by_title["Ola"].amount == 450.0
+    assert by_title["Computer hardware"].amount == 74000.0 and by_title["Computer hardware"].section == "32"
+    assert "SWIGGY STAFF LUNCH,2024-04,1,1200.00,1200.00,1200.00,Swiggy (Staff Lunch)" in prepared.document
+    assert "AWS EMEA" not in prepared.document and "Client Payment" not in prepared.document
+    assert "do not repeat" in prepared.document
+    print("Agent document ✓")
+
+
+def test_no_llm_call_when_everything_is_known():
+    print("Testing fully local analysis...")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "statement.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Date,Description,Debit,Credit\n01-04-2024,AWS EMEA SERVICE,1000,\n02-04-2024,Office Rent,9000,\n")
+        # Would fail without an LLM if the agent were called
+        result = asyncio.run(analyze_deductions([path], dictionary=None))
+    assert [item.title for item in result.deductions] == ["Office rent", "AWS"]
+    assert result.estimated_tax_saved == 3000.0
+    print("Local analysis ✓")
+
+
+if __name__ == "__main__":
+    test_automaton_matches()
+    test_classification_splits_rows()
+    test_only_unknown_rows_reach_the_agent()
+    test_no_llm_call_when_everything_is_known()
+    print("\nALL TESTS PASSED ✓")
@@ -0,0 +1,80 @@
+"""
+Tests for Section 17(5) blocked-credit detection from HSN/SAC codes.
+"""
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.gst.eligibility import HSNLookup, hsn_lookup
+from backend_sme.gst.index import ReconciliationIndex
+from backend_sme.gst.invoices import invoice_from_row, map_columns
+from backend_sme.gst.reconciliation import reconcile
+
+HEADER = ["GSTIN", "Invoice No", "Date", "Taxable Value", "CGST", "SGST", "HSN/SAC"]
+COLUMNS = map_columns(HEADER)
+
+
+def _invoice(invoice_no: str, taxable: float, hsn: str = "", gstin: str = "27ABCDE1234F1Z5", tax: float = None):
+    tax = round(taxable * 0.09, 2) if tax is None else tax
+    return invoice_from_row([gstin, invoice_no, "02-04-2024", str(taxable), str(tax), str(tax), hsn], COLUMNS, "x", 2)
+
+
+def test_prefix_lookup():
+    print("Testing HSN/SAC lookup...")
+    assert hsn_lookup.lookup("8703 23 91").section == "17(5)(a)"
+    assert hsn_lookup.lookup("996331").section == "17(5)(b)(i)"  # restaurant service
+    assert hsn_lookup.lookup("996311") is None  # hotel stay: longer exception prefix wins
+    assert hsn_lookup.lookup("8471") is None and hsn_lookup.lookup("") is None
+    rows, rules = hsn_lookup.blocked_rows(["8471", "870323", "996311"], np.array([0, 1, 1, 2, 0]))
+    assert rows.tolist() == [1, 2] and rules[1].prefix == "8703"
+    assert HSNLookup([]).lookup("8703") is None
+    print("✓ Longest prefix decides, bulk lookup per distinct code")
+
+
+def test_blocked_credit_reported_separately():
+    print("Testing eligibility in reconciliation...")
+    gstr2b = [_invoice("INV-1", 10000.0, gstin="27ABCDE1234F1Z5"), _invoice("CAR-7", 800000.0, gstin="27CARSS0000C1Z1")]
+    register = [
+        _invoice("INV-1", 10000.0, "8471"),
+        _invoice("CAR-7", 800000.0, "870323", gstin="27CARSS0000C1Z1", tax=1.0),  # matched, amounts differ
+        _invoice("FOOD-3", 5000.0, "996331", gstin="27FOODS0000F1Z1"),  # not in GSTR-2B
+        _invoice("MISS-9", 2000.0, "8471", gstin="27OTHER0000O1Z1"),
+    ]
+    result = reconcile(gstr2b, register)
+    assert [i.invoice_no for i in result.missing_itc] == ["MISS-9"]
+    assert [(i.invoice_no, i.section) for i in result.ineligible_itc] == [("CAR-7", "17(5)(a)"), ("FOOD-3", "17(5)(b)(i)")]
+    assert result.total_itc_missed == 360.0 and result.total_itc_ineligible == 2.0 + 900.0
+    assert result.ambiguous == []
+    response = result.to_response()
+    assert response.total_itc_ineligible == 902.0 and response.ineligible_itc[0].hsn == "870323"
+    print("✓ Blocked credits kept out of missing ITC and the LLM residue")
+
+
+def test_index_keeps_blocked_credits():
+    print("Testing persisted eligibility...")
+    with tempfile.TemporaryDirectory() as folder:
+        gstr2b = os.path.join(folder, "gstr2b.csv")
+        with open(gstr2b, "w") as f:
+            f.write("GSTIN,Invoice Number,Invoice Date,Taxable Value,CGST,SGST\n27CARSS0000C1Z1,CAR-7,02-04-2024,100,9,9\n")
+        register = os.path.join(folder, "purchase_register.csv")
+        with open(register, "w") as f:
+            f.write("GSTIN,Bill No,Bill Date,Taxable Amount,CGST,SGST,HSN\n27CARSS0000C1Z1,CAR-7,02-04-2024,100,9,9,8703\n")
+        index = ReconciliationIndex(os.path.join(folder, "index.db"))
+        index.ingest("acme", gstr2b)
+        index.ingest("acme", register)
+        assert index.reconcile("acme").total_itc_ineligible == 18.0
+        later = index.reconcile("acme")
+        assert len(later.register) == 0 and [i.section for i in later.ineligible_itc] == ["17(5)(a)"]
+    print("✓ Blocked credit of an earlier match still reported")
+
+
+if __name__ == "__main__":
+    test_prefix_lookup()
+    test_blocked_credit_reported_separately()
+    test_index_keeps_blocked_credits()
+    print("\nALL TESTS PASSED ✓")
@@ -0,0 +1,108 @@
+"""
+Tests for fuzzy invoice-number matching of near-miss GST records.
+"""
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.gst.fuzzy import FuzzyMatcher, bounded_edit_distance, invoice_period
+from backend_sme.gst.invoices import invoice_from_row
+from backend_sme.gst.reconciliation import Tolerance, reconcile
+
+COLUMNS = {"gstin": 0, "invoice_no": 1, "invoice_date": 2, "taxable_value": 3, "cgst": 4, "sgst": 5}
+
+
+def _invoice(invoice_no: str, taxable: float = 10000.0, gstin: str = "27ABCDE1234F1Z5", date: str = "02-04-2024", source: str = "x"):
+    tax = round(taxable * 0.09, 2)
+    return invoice_from_row([gstin, invoice_no, date, str(taxable), str(tax), str(tax)], COLUMNS, source, 2)
+
+
+def test_edit_distance_and_period():
+    print("Testing helpers...")
+    assert bounded_edit_distance("INV1234", "INV1243", 2) == 1  # transposition
+    assert bounded_edit_distance("INV1234", "INV1", 2) == 3  # cut off above the bound
+    assert invoice_period("15-04-2024") == invoice_period("2024-04-01") == "2024-04"
+    assert invoice_period("April") == ""
+    print("✓ OSA distance and invoice periods")
+
+
+def test_near_misses_match():
+    print("Testing near-miss matching...")
+    gstr2b = [_invoice("INV-1243"), _invoice("OS-2024-55", 2000.0), _invoice("INV-9000", 7000.0)]
+    matcher = FuzzyMatcher(gstr2b)
+    assert matcher.match(_invoice("INV-1234")).invoice_no == "INV-1243"
+    assert matcher.match(_invoice("55", 2000.0)).invoice_no == "OS-2024-55"
+    # Close number but the amount is different
+    assert matcher.match(_invoice("INV-9001", 9999.0)) is None
+    # Other supplier / other month are never candidates
+    assert matcher.match(_invoice("INV-9000", 7000.0, gstin="29XYZPQ5678L1Z1")) is None
+    assert FuzzyMatcher([_invoice("INV-9000", 7000.0)]).match(_invoice("INV-9001", 7000.0, date="02-05-2024")) is not None
+    print("✓ Typos, transpositions and prefix changes matched when amounts agree")
+
+
+def test_notes_are_not_invoices():
+    print("Testing credit and debit notes...")
+    assert FuzzyMatcher([_invoice("CN-5")]).match(_invoice("INV-5")) is None
+    assert FuzzyMatcher([_invoice("DN-5")]).match(_invoice("INV-5")) is None
+    assert FuzzyMatcher([_invoice("CN/2024/77", 3000.0)]).match(_invoice("INV-2024-77", 3000.0)) is None
+    # A typo in the series is still matched
+    assert FuzzyMatcher([_invoice("IVN-5")]).match(_invoice("INV-5")).invoice_no == "IVN-5"
+    print("✓ Another document series is never matched")
+
+
+def test_amount_slack_follows_tolerance():
+    print("Testing absolute amount slack...")
+    # ₹4 apart: above the 1% relative tolerance of these amounts
+    gstr2b = [_invoice("INV-1243", 104.0)]
+    register = [_invoice("INV-1234", 100.0)]
+    assert FuzzyMatcher(gstr2b).match(register[0]) is None
+    assert FuzzyMatcher(gstr2b, amount_slack=5.0).match(register[0]) is not None
+    assert len(reconcile(gstr2b, register, Tolerance(absolute=5.0)).fuzzy_matched) == 1
+    assert len(reconcile(gstr2b, register, Tolerance(absolute=0.5)).fuzzy_matched) == 0
+    print("✓ Slack taken from Tolerance.absolute")
+
+
+def test_ties_are_left_ambiguous():
+    print("Testing ties...")
+    matcher = FuzzyMatcher([_invoice("INV-12"), _invoice("INV-21")])
+    assert matcher.match(_invoice("INV-11")) is None
+    print("✓ Equally good candidates not guessed")
+
+
+def test_reconcile_uses_fuzzy_pass():
+    print("Testing reconciliation with fuzzy pass...")
+    gstr2b = [_invoice("INV-1243"), _invoice("INV-5000", 5000.0)]
+    register = [_invoice("INV-1234"), _invoice("INV-5000", 5000.0)]
+    result = reconcile(gstr2b, register)
+    assert len(result.matched) == 2 and len(result.fuzzy_matched) == 1
+    assert result.missing_itc == [] and result.ambiguous == [] and result.unmatched_2b == []
+
+    result = reconcile(gstr2b, register, fuzzy=False)
+    assert [i.invoice_no for i in result.ambiguous] == ["INV-1234"]
+    print("✓ Transposed invoice number no longer reported or sent to the LLM")
+
+
+def test_large_blocks_stay_fast():
+    print("Testing scale...")
+    import time
+    gstr2b = [_invoice(f"INV-{i:05d}", 1000.0 + i, gstin=f"27ABCDE{i % 500:04d}F1Z5") for i in range(50000)]
+    register = [_invoice(f"INV-{i:05d}X", 1000.0 + i, gstin=f"27ABCDE{i % 500:04d}F1Z5") for i in range(50000)]
+    start = time.time()
+    result = reconcile(gstr2b, register)
+    elapsed = time.time() - start
+    assert len(result.fuzzy_matched) == 50000
+    assert elapsed < 20, elapsed
+    print(f"✓ 50k near misses matched in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    test_edit_distance_and_period()
+    test_near_misses_match()
+    test_notes_are_not_invoices()
+    test_amount_slack_follows_tolerance()
+    test_ties_are_left_ambiguous()
+    test_reconcile_uses_fuzzy_pass()
+    test_large_blocks_stay_fast()
+    print("\nALL TESTS PASSED ✓")
@@ -0,0 +1,109 @@
+"""
+Tests for the persisted, incremental GST reconciliation index.
+"""
+import sys
+import os
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.gst.index import ReconciliationIndex
+
+HEADER_2B = "GSTIN,Trade/Legal Name,Invoice Number,Invoice Date,Invoice Value,Taxable Value,IGST,CGST,SGST,Cess\n"
+HEADER_PR = "Date,Invoice No,Vendor Name,GSTIN,Taxable Amount,IGST,CGST,SGST,Total Amount\n"
+APRIL_2B = "27ABCDE1234F1Z5,Tech Solutions,INV-001,02-04-2024,11800,10000,0,900,900,0\n"
+MAY_2B = "27LMNOP9012R1Z9,Office Supplies,OS-55,28-04-2024,2360,2000,0,180,180,0\n"
+REGISTER = (
+    "02-04-2024,INV-001,Tech Solutions,27ABCDE1234F1Z5,10000,0,900,900,11800\n"
+    "28-04-2024,OS-55,Office Supplies,27LMNOP9012R1Z9,2000,0,180,180,2360\n"
+)
+
+
+def _write(folder: str, name: str, text: str) -> str:
+    path = os.path.join(folder, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def test_late_filed_invoice_matches_next_month():
+    print("Testing carry-forward across months...")
+    with tempfile.TemporaryDirectory() as folder:
+        index = ReconciliationIndex(os.path.join(folder, "index.db"))
+        assert index.ingest("acme", _write(folder, "gstr2b_apr.csv", HEADER_2B + APRIL_2B)) == 1
+        assert index.reconcile("acme") is None  # no register yet
+        assert index.ingest("acme", _write(folder, "purchase_register.csv", HEADER_PR + REGISTER)) == 2
+
+        april = index.reconcile("acme")
+        assert april.summary()["matched"] == 1
+        assert [i.invoice_no for i in april.missing_itc] == ["OS-55"]
+
+        # Same files again: nothing new, open bill still reported
+        assert index.ingest("acme", os.path.join(folder, "purchase_register.csv")) == 0
+        again = index.reconcile("acme")
+        assert len(again.register) == 1 and len(again.gstr2b) == 0
+        assert [i.invoice_no for i in again.missing_itc] == ["OS-55"]
+
+        # Supplier files late: May's GSTR-2B (cumulative, re-lists April's line) closes it
+        assert index.ingest("acme", _write(folder, "gstr2b_may.csv", HEADER_2B + APRIL_2B + MAY_2B)) == 1
+        may = index.reconcile("acme")
+        assert may.summary()["matched"] == 1 and may.missing_itc == []
+
+        stats = index.stats("acme")
+        assert stats["files"] == 3
+        assert stats["invoices"]["purchase_register"]["matched"]["total"] == 2
+        assert "open" not in stats["invoices"]["purchase_register"]
+        assert index.stats("other")["files"] == 0
+    print("✓ Only new lines processed; late invoice matched from the open set")
+
+
+def test_earlier_mismatches_stay_reported():
+    print("Testing persisted mismatches...")
+    with tempfile.TemporaryDirectory() as folder:
+        index = ReconciliationIndex(os.path.join(folder, "index.db"))
+        index.ingest("acme", _write(folder, "gstr2b.csv", HEADER_2B + APRIL_2B.replace(",900,900,", ",800,800,")))
+        index.ingest("acme", _write(folder, "purchase_register.csv", HEADER_PR + REGISTER.splitlines(True)[0]))
+        first = index.reconcile("acme")
+        assert [(i.invoice_no, i.amount) for i in first.missing_itc] == [("INV-001", 200.0)]
+        second = index.reconcile("acme")
+        assert len(second.register) == 0
+        assert [(i.invoice_no, i.amount) for i in second.missing_itc] == [("INV-001", 200.0)]
+
+        index.forget("acme")
+        assert index.stats("acme") == {"files": 0, "invoices": {}}
+    print("✓ Shortfall of a matched pair survives later runs")
+
+
+def test_corrected_file_supersedes_earlier_version():
+    print("Testing re-uploaded corrected register...")
+    with tempfile.TemporaryDirectory() as folder:
+        index = ReconciliationIndex(os.path.join(folder, "index.db"))
+        index.ingest("acme", _write(folder, "gstr2b.csv", HEADER_2B + APRIL_2B))
+        index.ingest("acme", _write(folder, "purchase_register.csv", HEADER_PR + REGISTER))
+        first = index.reconcile("acme")
+        assert first.summary()["matched"] == 1 and [i.invoice_no for i in first.missing_itc] == ["OS-55"]
+
+        # OS-55 was booked with the wrong number; the corrected file replaces it
+        corrected = REGISTER.replace("OS-55", "OS-56")
+        assert index.ingest("acme", _write(folder, "purchase_register.csv", HEADER_PR + corrected)) == 1
+        second = index.reconcile("acme")
+        assert [i.invoice_no for i in second.missing_itc] == ["OS-56"]
+        stats = index.stats("acme")
+        assert stats["files"] == 2
+        assert stats["invoices"]["purchase_register"]["matched"]["total"] == 1  # INV-001 kept its match
+        assert stats["invoices"]["purchase_register"]["open"]["total"] == 1
+
+        # A bill removed from the register reopens the GSTR-2B line it was matched to
+        index.ingest("acme", _write(folder, "purchase_register.csv", HEADER_PR + corrected.splitlines(True)[1]))
+        third = index.reconcile("acme")
+        assert third.summary()["unmatched_2b"] == 1 and [i.invoice_no for i in third.missing_itc] == ["OS-56"]
+        assert "matched" not in index.stats("acme")["invoices"]["gstr_2b"]
+    print("✓ Lines of the earlier version retired, matches kept or reopened")
+
+
+if __name__ == "__main__":
+    test_late_filed_invoice_matches_next_month()
+    test_earlier_mismatches_stay_reported()
+    test_corrected_file_supersedes_earlier_version()
+    print("\nALL TESTS PASSED ✓")
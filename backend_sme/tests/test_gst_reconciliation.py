@@ -0,0 +1,122 @@
+"""
+Tests for the deterministic GSTR-2B vs purchase register reconciliation.
+"""
+import sys
+import os
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.gst.invoices import GSTR_2B, PURCHASE_REGISTER, detect_document, load_invoices, normalize_invoice_no
+from backend_sme.gst.reconciliation import Tolerance, reconcile, resolve_ambiguous
+from backend_sme.models.schemas import GSTMatcherResponse, MissingITCItem
+
+TEST_DATA = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../test_data"))
+
+
+def _sample():
+    kind_2b, gstr2b = load_invoices(os.path.join(TEST_DATA, "gstr_2b.csv"))
+    kind_pr, register = load_invoices(os.path.join(TEST_DATA, "purchase_register.csv"))
+    assert (kind_2b, kind_pr) == (GSTR_2B, PURCHASE_REGISTER)
+    return gstr2b, register
+
+
+def test_load_and_normalize():
+    print("Testing loading and normalization...")
+    gstr2b, register = _sample()
+    assert len(gstr2b) == 4 and len(register) == 6
+    assert gstr2b[0].tax == 1800.0
+    assert normalize_invoice_no("inv/001") == normalize_invoice_no("INV-1") == "INV1"
+    assert load_invoices(os.path.join(TEST_DATA, "bank_statement.csv")) == (None, [])
+    print("✓ Both layouts recognized, bank statement ignored")
+
+
+def test_detect_by_columns_first():
+    print("Testing document detection...")
+    register = ["Date", "Invoice No", "Vendor Name", "GSTIN", "Taxable Amount", "Total Amount"]
+    gstr2b = ["GSTIN", "Trade/Legal Name", "Invoice Number", "Invoice Value", "Taxable Value"]
+    # Chat uploads are prefixed with the session ID, which may contain "2b"
+    assert detect_document("9f2b41c0-7d2a-4e1b-a2b3-0c2b9e1d2a3f_purchases.csv", register) == PURCHASE_REGISTER
+    assert detect_document("gstr2b_april.csv", register) == PURCHASE_REGISTER
+    assert detect_document("books.csv", gstr2b) == GSTR_2B
+    # Without marker columns the file name decides
+    plain = ["GSTIN", "Invoice No", "Taxable Value"]
+    assert detect_document("9f2b41c0-7d2a_GSTR_2B.csv", plain) == GSTR_2B
+    assert detect_document("april-2b.csv", plain) == GSTR_2B
+    assert detect_document("9f2b41c0-7d2a_purchase.csv", plain) == PURCHASE_REGISTER
+    assert detect_document("9f2b41c0-7d2a_invoices.csv", plain) is None
+    print("✓ Header columns before file name")
+
+
+def test_sample_reconciliation():
+    print("Testing reconciliation of test_data...")
+    gstr2b, register = _sample()
+    result = reconcile(gstr2b, register)
+    assert len(result.matched) == 4
+    assert [(i.invoice_no, i.amount) for i in result.missing_itc] == [("MISSED-INV-88", 900.0)]
+    # Same amounts as INV-001 from the same supplier: possible duplicate booking
+    assert [i.invoice_no for i in result.ambiguous] == ["INV-001-DUP"]
+    print("✓ MISSED-INV-88 missing, INV-001-DUP left for review")
+
+
+def test_amount_tolerance():
+    print("Testing tolerances...")
+    gstr2b, register = _sample()
+    register = [register[0]._replace(cgst=905.0, sgst=905.0)]
+
+    result = reconcile(gstr2b, register, Tolerance(absolute=1.0, relative=0.0))
+    assert len(result.missing_itc) == 1
+    assert result.missing_itc[0].amount == 10.0
+    assert "cgst 905.00 in books vs 900.00 in GSTR-2B" in result.missing_itc[0].reason
+
+    assert reconcile(gstr2b, register, Tolerance(absolute=1.0, relative=0.01)).missing_itc == []
+
+    # GSTR-2B has more tax than the books: no credit lost, only flagged as inconsistent
+    booked_less = [register[0]._replace(cgst=895.0, sgst=895.0)]
+    result = reconcile(gstr2b, booked_less, Tolerance(absolute=1.0, relative=0.0))
+    assert result.missing_itc == [] and result.mismatches == {}
+    assert result.inconsistent_rows.tolist() == [0] and result.summary()["inconsistent_values"] == 1
+    print("✓ Mismatch reported with the tax shortfall, relative tolerance absorbs it")
+
+
+def test_ambiguous_residue_goes_to_agent():
+    print("Testing LLM residue handling...")
+    gstr2b, register = _sample()
+    result = reconcile(gstr2b, register)
+    answer = GSTMatcherResponse(
+        missing_itc=[
+            MissingITCItem(invoice_no="INV-001-DUP", gstin="27ABCDE1234F1Z5", amount=1.0, reason="Duplicate booking"),
+            # Not part of the residue: must be ignored
+            MissingITCItem(invoice_no="MADE-UP-1", gstin="27ABCDE1234F1Z5", amount=5000.0, reason="Hallucinated"),
+        ],
+        total_itc_missed=5001.0,
+    )
+    with patch("backend_sme.gst.reconciliation.run_gst_agent", new_callable=AsyncMock, return_value=answer) as agent:
+        asyncio.run(resolve_ambiguous(result))
+        sent = agent.call_args[0][0]
+    assert "INV-001-DUP" in sent and "MISSED-INV-88" not in sent
+    assert [(i.invoice_no, i.amount) for i in result.missing_itc] == [("MISSED-INV-88", 900.0), ("INV-001-DUP", 1800.0)]
+    assert result.total_itc_missed == 2700.0
+    print("✓ Only the residue was sent; amounts come from the register")
+
+
+def test_residue_without_api_key():
+    print("Testing residue handling without an LLM key...")
+    gstr2b, register = _sample()
+    result = reconcile(gstr2b, register)
+    with patch.dict(os.environ, {"OPENROUTER_API_KEY": ""}):
+        asyncio.run(resolve_ambiguous(result))
+    assert [(i.invoice_no, i.reason) for i in result.missing_itc][-1] == ("INV-001-DUP", "Not found in GSTR-2B (needs review)")
+    print("✓ Ambiguous invoices left for review, deterministic result kept")
+
+
+if __name__ == "__main__":
+    test_load_and_normalize()
+    test_detect_by_columns_first()
+    test_sample_reconciliation()
+    test_amount_tolerance()
+    test_ambiguous_residue_goes_to_agent()
+    test_residue_without_api_key()
+    print("\nALL TESTS PASSED ✓")
@@ -0,0 +1,120 @@
+"""
+Tests for server-side GST result sets: cursor paging, filters, NDJSON export.
+"""
+import sys
+import os
+import json
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.gst.result_sets import ResultFilter, ResultSetStore, summarize
+from backend_sme.models.schemas import GSTMatcherResponse, IneligibleITCItem, MissingITCItem
+
+GSTINS = ("27ABCDE1234F1Z5", "29LMNOP9012R1Z9")
+
+
+def _response(count: int = 250) -> GSTMatcherResponse:
+    missing = [
+        MissingITCItem(
+            invoice_no=f"INV-{i:04d}", gstin=GSTINS[i % 2], amount=float(i),
+            reason="Amount mismatch: igst" if i % 5 == 0 else "Invoice not found in GSTR-2B",
+        )
+        for i in range(count)
+    ]
+    ineligible = [IneligibleITCItem(invoice_no="CAR-1", gstin=GSTINS[0], amount=18000.0, hsn="8703",
+                                    section="17(5)(a)", reason="Motor vehicles for transport of persons")]
+    return GSTMatcherResponse(
+        missing_itc=missing, total_itc_missed=float(sum(range(count))),
+        ineligible_itc=ineligible, total_itc_ineligible=18000.0,
+    )
+
+
+def test_summary_carries_totals_and_handle():
+    print("Testing response summary...")
+    store = ResultSetStore()
+    summary = summarize(_response(), store, inline=10)
+    assert len(summary.missing_itc) == 10
+    assert summary.missing_itc_count == 250
+    assert summary.total_itc_missed == float(sum(range(250)))
+    assert summary.ineligible_itc_count == 1
+    assert store.get(summary.result_set_id) is not None
+    print("Summary ✓")
+
+
+def test_cursor_pages_cover_every_item_once():
+    print("Testing cursor pagination...")
+    result_set = ResultSetStore().put(_response())
+    seen, cursor = [], None
+    while True:
+        page = result_set.page("missing_itc", cursor, limit=100)
+        seen.extend(item["invoice_no"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"INV-{i:04d}" for i in range(250)]
+    print("Pagination ✓")
+
+
+def test_filters():
+    print("Testing filters...")
+    result_set = ResultSetStore().put(_response())
+    where = ResultFilter(gstin=GSTINS[0].lower(), reason="mismatch", min_amount=100)
+    page = result_set.page("missing_itc", limit=1000, where=where)
+    expected = [i for i in range(100, 250) if i % 2 == 0 and i % 5 == 0]
+    assert [item["amount"] for item in page["items"]] == [float(i) for i in expected]
+    assert page["next_cursor"] is None
+
+    # A filtered page scans past non-matching items and resumes after the last one read
+    first = result_set.page("missing_itc", limit=3, where=where)
+    second = result_set.page("missing_itc", first["next_cursor"], limit=3, where=where)
+    assert [item["amount"] for item in first["items"] + second["items"]] == [float(i) for i in expected[:6]]
+    print("Filters ✓")
+
+
+def test_ndjson_export():
+    print("Testing NDJSON export...")
+    result_set = ResultSetStore().put(_response())
+    lines = list(result_set.export("missing_itc", ResultFilter(min_amount=245)))
+    assert all(line.endswith("\n") for line in lines)
+    assert [json.loads(line)["invoice_no"] for line in lines] == [f"INV-{i:04d}" for i in range(245, 250)]
+    blocked = [json.loads(line) for line in result_set.export("ineligible_itc")]
+    assert blocked[0]["section"] == "17(5)(a)"
+    print("Export ✓")
+
+
+def test_store_is_bounded_and_expires():
+    print("Testing eviction and expiry...")
+    store = ResultSetStore(max_entries=2, ttl=60)
+    first, second, third = (store.put(_response(3)) for _ in range(3))
+    assert store.get(first.id) is None
+    assert store.get(second.id) is not None and store.get(third.id) is not None
+
+    expired = ResultSetStore(ttl=60)
+    old = expired.put(_response(3))
+    old.created_at = time.time() - 61
+    assert expired.get(old.id) is None
+    assert expired.stats()["result_sets"] == 0
+    print("Eviction ✓")
+
+
+def test_invalid_cursor():
+    print("Testing invalid cursor...")
+    result_set = ResultSetStore().put(_response(3))
+    try:
+        result_set.page("missing_itc", "abc")
+    except ValueError:
+        print("Invalid cursor ✓")
+        return
+    raise AssertionError("expected ValueError")
+
+
+if __name__ == "__main__":
+    test_summary_carries_totals_and_handle()
+    test_cursor_pages_cover_every_item_once()
+    test_filters()
+    test_ndjson_export()
+    test_store_is_bounded_and_expires()
+    test_invalid_cursor()
+    print("\nALL TESTS PASSED ✓")
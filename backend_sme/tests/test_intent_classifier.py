@@ -0,0 +1,81 @@
+"""
+Tests for the local fast-path intent classifier in front of the orchestrator.
+"""
+import sys
+import os
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.agents.intent_classifier import (
+    INTENT_CONFIDENCE_THRESHOLD,
+    classify_headers,
+    classify_intent,
+)
+from backend_sme.agents.orchestrator import run_orchestrator_agent
+
+GSTR_2B_PREVIEW = (
+    "\n--- File: gstr_2b.csv ---\n"
+    "GSTIN,Trade/Legal Name,Invoice Number,Invoice Date,Invoice Value,Taxable Value,IGST,CGST,SGST\n"
+    "27AAAAA1111A1Z1,Alpha Traders,INV-001,2024-04-02,11800,10000,0,900,900\n..."
+)
+BANK_PREVIEW = (
+    "\n--- File: bank_statement.csv ---\n"
+    "Date,Description,Reference,Debit,Credit,Balance\n"
+    "2024-04-01,AWS Cloud Services,TXN001,12000,,88000\n..."
+)
+
+
+def test_headers_identify_documents():
+    print("Testing header signatures...")
+    assert classify_headers(GSTR_2B_PREVIEW) == ("GST_MATCHING", 1)
+    assert classify_headers(BANK_PREVIEW) == ("DEDUCTION_ANALYSIS", 1)
+    # One file of each kind is ambiguous
+    assert classify_headers(GSTR_2B_PREVIEW + BANK_PREVIEW) == (None, 0)
+
+    prediction = classify_intent("please take a look", GSTR_2B_PREVIEW)
+    assert prediction.intent == "GST_MATCHING"
+    assert prediction.confidence >= INTENT_CONFIDENCE_THRESHOLD
+    print("✓ GSTR-2B and bank statement recognized from their headers")
+
+
+def test_conflicting_message_lowers_confidence():
+    print("Testing conflict between files and message...")
+    prediction = classify_intent("Reconcile my GSTR-2B invoices for input tax credit", BANK_PREVIEW)
+    assert prediction.confidence < INTENT_CONFIDENCE_THRESHOLD
+    print("✓ Conflict deferred to the LLM")
+
+
+def test_keywords():
+    print("Testing keyword scoring...")
+    prediction = classify_intent("Find tax deductions in my business expenses", "")
+    assert prediction.intent == "DEDUCTION_ANALYSIS"
+    assert prediction.confidence >= INTENT_CONFIDENCE_THRESHOLD
+
+    prediction = classify_intent("ok", "")
+    assert prediction.confidence == 0.0
+    print("✓ Clear keywords classified, vague message left to the LLM")
+
+
+def test_orchestrator_skips_llm_when_confident():
+    print("Testing orchestrator fast path...")
+    with patch("backend_sme.agents.orchestrator.call_llm", new_callable=AsyncMock) as mock_llm:
+        result = asyncio.run(run_orchestrator_agent("check these", GSTR_2B_PREVIEW))
+        assert result.intent == "GST_MATCHING"
+        mock_llm.assert_not_called()
+
+        mock_llm.return_value = '{"intent": "GENERAL_QUERY", "reason": "Small talk."}'
+        result = asyncio.run(run_orchestrator_agent("ok", ""))
+        assert result.intent == "GENERAL_QUERY"
+        mock_llm.assert_called_once()
+    print("✓ LLM only called for the uncertain message")
+
+
+if __name__ == "__main__":
+    test_headers_identify_documents()
+    test_conflicting_message_lowers_confidence()
+    test_keywords()
+    test_orchestrator_skips_llm_when_confident()
+    print("\nALL TESTS PASSED ✓")
@@ -0,0 +1,62 @@
+"""
+Tests for the two-tier LLM response cache (in-memory LRU + SQLite).
+"""
+import sys
+import os
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.utils.llm_cache import LLMCache, make_cache_key
+
+
+def test_key_ignores_whitespace_differences():
+    print("Testing cache key normalization...")
+    a = make_cache_key("model-a", "Analyze   this\n\nstatement ")
+    b = make_cache_key("model-a", "Analyze this statement")
+    c = make_cache_key("model-b", "Analyze this statement")
+    assert a == b
+    assert a != c
+    print("✓ Keys are whitespace-insensitive and model-specific")
+
+
+def test_memory_lru_eviction():
+    print("Testing LRU eviction...")
+    cache = LLMCache(max_entries=2, db_path="")
+    cache.set("k1", "v1")
+    cache.set("k2", "v2")
+    assert cache.get("k1") == "v1"  # k1 becomes most recently used
+    cache.set("k3", "v3")
+    assert cache.get("k2") is None
+    assert cache.get("k1") == "v1"
+    assert cache.get("k3") == "v3"
+
+    stats = cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["entries"] == 2
+    print(f"✓ Stats: {stats}")
+
+
+def test_disk_tier_survives_restart_and_expires():
+    print("Testing disk tier...")
+    db_path = os.path.join(tempfile.mkdtemp(), "llm_cache.db")
+
+    cache = LLMCache(max_entries=4, db_path=db_path, ttl=60)
+    cache.set("k1", '{"deductions": []}')
+
+    restarted = LLMCache(max_entries=4, db_path=db_path, ttl=60)
+    assert restarted.get("k1") == '{"deductions": []}'
+    assert restarted.stats()["disk_hits"] == 1
+
+    expired = LLMCache(max_entries=4, db_path=db_path, ttl=-1)
+    assert expired.get("k1") is None
+    print("✓ Disk entries are reused across instances and honour the TTL")
+
+
+if __name__ == "__main__":
+    test_key_ignores_whitespace_differences()
+    test_memory_lru_eviction()
+    test_disk_tier_survives_restart_and_expires()
+    print("\nALL TESTS PASSED ✓")
@@ -0,0 +1,111 @@
+"""
+Tests for the persistent, self-learning merchant dictionary.
+"""
+import sys
+import os
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.deductions.analysis import merge_deductions, prepare_deduction_input
+from backend_sme.deductions.dictionary import MerchantDictionary, canonical_merchant
+from backend_sme.models.schemas import DeductionResponse, MerchantClassification
+
+STATEMENT = (
+    "Date,Description,Reference,Debit,Credit\n"
+    "01-04-2024,UPI/412345678901/SWIGGY/swiggy@icici/Bangalore,U-1,1200.00,\n"
+    "09-04-2024,UPI/412345679999/SWIGGY/swiggy@icici/Mumbai,U-2,800.00,\n"
+    "12-04-2024,NEFT/N123/KUMAR AND CO CHARTERED ACC,N-1,25000.00,\n"
+)
+
+
+def _classification(description: str, section: str = "37(1)", confidence: float = 0.9, merchant: str = "Swiggy"):
+    return MerchantClassification(description=description, merchant=merchant, category="Staff welfare",
+                                  section=section, confidence=confidence)
+
+
+def test_canonical_keys():
+    print("Testing description canonicalization...")
+    assert canonical_merchant("UPI/412345678901/SWIGGY/swiggy@icici/Bangalore") == "SWIGGY"
+    assert canonical_merchant("POS 4021XXXX1234 SWIGGY NEW DELHI IN") == "SWIGGY"
+    assert canonical_merchant("IMPS-998877-Zomato Pvt Ltd-REF 77") == "ZOMATO"
+    assert canonical_merchant("NEFT/N123/KUMAR AND CO CHARTERED ACC") == "KUMAR AND CO CHARTERED"
+    assert canonical_merchant("UPI/123/456") == ""
+    # Hyphen-delimited (HDFC style) narrations keep the payee, not the text after the VPA
+    assert canonical_merchant("UPI-SWIGGY-SWIGGY@ICICI-ICIC0DC0099-412345678901-PAYMENT FROM PHONE") == "SWIGGY"
+    assert canonical_merchant("UPI-SWIGGY-swiggy@icici") == "SWIGGY"
+    assert canonical_merchant("UPI-ZOMATO LTD-zomato.order@hdfcbank-HDFC0000001-412345678902-NA") == "ZOMATO"
+    assert canonical_merchant("UPI/P2M/swiggy@icici/SWIGGY") == "SWIGGY"
+    print("Canonical keys ✓")
+
+
+def test_learned_merchants_skip_the_agent_next_time():
+    print("Testing learning across sessions...")
+    with tempfile.TemporaryDirectory() as folder:
+        db_path = os.path.join(folder, "merchants.db")
+        path = os.path.join(folder, "statement.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(STATEMENT)
+
+        first = MerchantDictionary(db_path)
+        prepared = prepare_deduction_input([path], dictionary=first)
+        assert prepared.stats["unknown_rows"] == 3
+        answer = DeductionResponse(deductions=[], estimated_tax_saved=0, merchants=[
+            _classification("UPI/412345678901/SWIGGY/swiggy@icici/Bangalore"),
+            _classification("NEFT/N123/KUMAR AND CO CHARTERED ACC", "44AB", 0.5, "Kumar & Co"),
+        ])
+        merged = merge_deductions(prepared, [answer], first, "client-a")
+        assert merged.merchants == []
+        # The same client again and one other: two sources, not trusted yet
+        merge_deductions(prepared, [answer], first, "client-a")
+        merge_deductions(prepared, [answer], first, "client-b")
+        assert prepare_deduction_input([path], dictionary=MerchantDictionary(db_path)).stats["unknown_rows"] == 3
+        merge_deductions(prepared, [answer], first, "client-c")
+
+        # A new process: entries come back from SQLite
+        second = MerchantDictionary(db_path)
+        prepared = prepare_deduction_input([path], dictionary=second)
+        assert prepared.stats["unknown_rows"] == 1  # the low-confidence answer is not trusted
+        assert [(item.title, item.amount, item.section) for item in prepared.deductions] == [("Swiggy", 2000.0, "37(1)")]
+        merge_deductions(prepared, [], second)
+        assert MerchantDictionary(db_path).stats() == {"merchants": 2, "trusted": 1, "hits": 2}
+    print("Learning ✓")
+
+
+def test_confident_answers_win():
+    print("Testing updates of known merchants...")
+    with tempfile.TemporaryDirectory() as folder:
+        dictionary = MerchantDictionary(os.path.join(folder, "merchants.db"), min_confirmations=1)
+        assert dictionary.learn([_classification("SWIGGY BLR", confidence=0.95)]) == 1
+        assert dictionary.learn([_classification("SWIGGY MUMBAI", section="", confidence=0.6)]) == 0
+        assert dictionary.lookup("Swiggy Pune").section == "37(1)"
+        assert dictionary.learn([_classification("SWIGGY", section="", confidence=0.99)]) == 1
+        assert MerchantDictionary(dictionary.db_path, min_confirmations=1).lookup("swiggy").section == ""
+    print("Updates ✓")
+
+
+def test_one_answer_is_not_trusted_for_everyone():
+    print("Testing confirmations...")
+    with tempfile.TemporaryDirectory() as folder:
+        dictionary = MerchantDictionary(os.path.join(folder, "merchants.db"), min_confirmations=2)
+        # A confident but wrong answer for one client stays with that answer only
+        dictionary.learn([_classification("ACME TOOLS", confidence=1.0, merchant="Acme")], "client-a")
+        dictionary.learn([_classification("ACME TOOLS", confidence=1.0, merchant="Acme")], "client-a")
+        assert dictionary.lookup("ACME TOOLS") is None
+        # A different answer restarts the count
+        dictionary.learn([_classification("ACME TOOLS", section="32", confidence=1.0, merchant="Acme")], "client-b")
+        dictionary.learn([_classification("ACME TOOLS", confidence=0.9, merchant="acme")], "client-c")
+        assert dictionary.lookup("ACME TOOLS") is None
+        dictionary.learn([_classification("ACME TOOLS", section="32", confidence=0.9, merchant="Acme")], "client-c")
+        assert dictionary.lookup("ACME TOOLS").section == "32"
+        assert MerchantDictionary(dictionary.db_path, min_confirmations=2).stats()["trusted"] == 1
+    print("Confirmations ✓")
+
+
+if __name__ == "__main__":
+    test_canonical_keys()
+    test_learned_merchants_skip_the_agent_next_time()
+    test_confident_answers_win()
+    test_one_answer_is_not_trusted_for_everyone()
+    print("\nALL TESTS PASSED ✓")
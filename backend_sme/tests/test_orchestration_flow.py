@@ -1,22 +1,24 @@
 import sys
 import os
 import asyncio
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, patch
 from fastapi import UploadFile
 
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
-from backend_sme.routes.chat import chat_endpoint, sessions
+from backend_sme.routes.chat import UPLOAD_DIR, chat_endpoint, chat_stream_endpoint, sessions
 from backend_sme.models.schemas import DeductionResponse, DeductionItem, GSTMatcherResponse, MissingITCItem
 from backend_sme.agents.orchestrator import OrchestratorResponse
 
+TEST_DATA = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../test_data"))
+
 async def test_deduction_flow():
     print("Testing Deduction Flow...")
     
     # Mock dependencies
-    with patch("backend_sme.routes.chat.run_orchestrator_agent") as mock_orch, \
-         patch("backend_sme.routes.chat.run_deduction_agent") as mock_deduction:
+    with patch("backend_sme.routes.chat.run_orchestrator_agent", new_callable=AsyncMock) as mock_orch, \
+         patch("backend_sme.routes.chat.run_deduction_agent", new_callable=AsyncMock) as mock_deduction:
         
         # Setup mocks
         mock_orch.return_value = OrchestratorResponse(intent="DEDUCTION_ANALYSIS", reason="Test")
@@ -38,7 +40,16 @@ async def test_deduction_flow():
         
         # Verify response
         print(f"Response: {response.message}")
-        assert "worth ₹3000.0" in response.message
+        assert "worth ₹3000.0" in response.message  # 30% of the deductions found
+
+        # The agent gets the prepared document (the message, no statement rows), the history and memory
+        mock_orch.assert_awaited_once()
+        assert mock_orch.call_args[0][:2] == ("Here is my bank statement", "No files uploaded.")
+        mock_deduction.assert_awaited_once()
+        document, history, memory_context = mock_deduction.call_args[0]
+        assert document.startswith("Here is my bank statement")
+        assert history is sessions[session_id]["history"] and history[0]["content"] == "Here is my bank statement"
+        assert memory_context == mock_orch.call_args[0][3]
         
         # Verify session update (and that no AttributeError occurred)
         details = sessions[session_id]["savings"]["details"]
@@ -51,8 +62,8 @@ async def test_deduction_flow():
 async def test_gst_flow():
     print("\nTesting GST Flow...")
     
-    with patch("backend_sme.routes.chat.run_orchestrator_agent") as mock_orch, \
-         patch("backend_sme.routes.chat.run_gst_agent") as mock_gst:
+    with patch("backend_sme.routes.chat.run_orchestrator_agent", new_callable=AsyncMock) as mock_orch, \
+         patch("backend_sme.routes.chat.run_gst_agent", new_callable=AsyncMock) as mock_gst:
         
         mock_orch.return_value = OrchestratorResponse(intent="GST_MATCHING", reason="Test")
         
@@ -72,6 +83,12 @@ async def test_gst_flow():
         
         print(f"Response: {response.message}")
         assert "worth ₹500.0" in response.message
+
+        # No invoice lists uploaded: the agent reads the message and files itself
+        mock_gst.assert_awaited_once()
+        combined_input, history, memory_context = mock_gst.call_args[0]
+        assert combined_input == "Check my GST\n" and history is sessions[session_id]["history"]
+        assert memory_context == mock_orch.call_args[0][3]
         
         details = sessions[session_id]["savings"]["details"]
         print(f"Session Details: {details}")
@@ -80,8 +97,57 @@ async def test_gst_flow():
         assert "INV-001" in details[0]["description"]
         print("GST Flow Passed!")
 
+async def test_gst_flow_reconciles_uploads():
+    print("\nTesting GST Flow with invoice uploads...")
+    session_id = "test_session_3"
+    names = ["gstr_2b.csv", "purchase_register.csv"]
+    uploads = [UploadFile(file=open(os.path.join(TEST_DATA, name), "rb"), filename=name) for name in names]
+    with patch("backend_sme.routes.chat.run_orchestrator_agent", new_callable=AsyncMock) as mock_orch, \
+         patch("backend_sme.routes.chat.run_gst_agent", new_callable=AsyncMock) as mock_gst, \
+         patch("backend_sme.gst.reconciliation.run_gst_agent", new_callable=AsyncMock) as mock_residue:
+        mock_orch.return_value = OrchestratorResponse(intent="GST_MATCHING", reason="Test")
+        mock_residue.return_value = GSTMatcherResponse(missing_itc=[], total_itc_missed=0)
+        try:
+            response = await chat_endpoint(message="Match my GST", files=uploads, session_id=session_id)
+        finally:
+            for upload in uploads:
+                upload.file.close()
+            for name in names:
+                os.remove(os.path.join(UPLOAD_DIR, f"{session_id}_{name}"))
+
+    print(f"Response: {response.message}")
+    # The rules reconcile the files; the agent only sees the ambiguous residue
+    mock_gst.assert_not_awaited()
+    mock_residue.assert_awaited_once()
+    sent = mock_residue.call_args[0][0]
+    assert "INV-001-DUP" in sent and "--- File: purchase_register.csv ---" not in sent
+    details = sessions[session_id]["savings"]["details"]
+    assert details[0]["result_set_id"] and "worth ₹" in response.message
+    print("GST Flow with uploads Passed!")
+
+async def _stream_events(**form) -> list:
+    response = await chat_stream_endpoint(files=None, **form)
+    body = "".join([chunk if isinstance(chunk, str) else chunk.decode() async for chunk in response.body_iterator])
+    return [line[len("event: "):] for line in body.splitlines() if line.startswith("event: ")]
+
+async def test_stream_reports_setup_errors():
+    print("\nTesting stream errors before the agent starts...")
+    # Without an API key the orchestrator falls back instead of failing the stream
+    with patch.dict(os.environ, {"OPENROUTER_API_KEY": ""}):
+        # Not classifiable locally, so the orchestrator calls the LLM
+        events = await _stream_events(message="hmm", session_id="test_session_4")
+    assert events[0] == "intent" and events[-1] == "result"
+
+    with patch("backend_sme.routes.chat.build_memory_context", new_callable=AsyncMock, side_effect=RuntimeError("boom")):
+        events = await _stream_events(message="What can you do?", session_id="test_session_5")
+    assert events == ["error"]
+    assert sessions["test_session_5"]["history"] == []
+    print("Stream errors Passed!")
+
 if __name__ == "__main__":
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     loop.run_until_complete(test_deduction_flow())
     loop.run_until_complete(test_gst_flow())
+    loop.run_until_complete(test_gst_flow_reconciles_uploads())
+    loop.run_until_complete(test_stream_reports_setup_errors())
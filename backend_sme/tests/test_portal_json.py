@@ -0,0 +1,94 @@
+"""
+Tests for the streaming GSTR-2B portal JSON parser.
+"""
+import sys
+import os
+import json
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import backend_sme.gst.portal_json as portal_json
+from backend_sme.gst.portal_json import is_portal_json, iter_portal_invoices
+from backend_sme.gst.sources import open_invoices
+from backend_sme.gst.invoices import GSTR_2B, load_invoices
+from backend_sme.gst.reconciliation import reconcile
+from backend_sme.utils.file_parser import parse_file_content
+
+TEST_DATA = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../test_data"))
+
+PORTAL_2B = {
+    "chksum": "abc",
+    "data": {
+        "gstin": "27AAACT0000A1Z5",
+        "rtnprd": "042024",
+        "docdata": {
+            "b2b": [
+                {"trdnm": "Tech Solutions Pvt Ltd", "ctin": "27ABCDE1234F1Z5", "inv": [
+                    {"inum": "INV-001", "dt": "02-04-2024", "val": 11800, "items": [
+                        {"num": 1, "rt": 18, "txval": 6000, "igst": 0, "cgst": 540, "sgst": 540, "cess": 0},
+                        {"num": 2, "rt": 18, "txval": 4000, "igst": 0, "cgst": 360, "sgst": 360, "cess": 0}]},
+                    {"inum": "INV-005", "dt": "15-04-2024", "val": 29500, "items": [
+                        {"num": 1, "rt": 18, "txval": 25000, "igst": 0, "cgst": 2250, "sgst": 2250, "cess": 0}]}]},
+                # GSTR-2A layout, ctin after the invoices
+                {"inv": [{"inum": "CS-999", "idt": "05-04-2024", "val": 5900, "itms": [
+                    {"num": 1, "itm_det": {"rt": 18, "txval": 5000, "iamt": 900}}]}],
+                 "ctin": "29XYZPQ5678L1Z1", "trdnm": "Cloud Services Inc"},
+                {"trdnm": "Office Supplies Co", "ctin": "27LMNOP9012R1Z9", "inv": [
+                    {"inum": "OS-2024-55", "dt": "10-04-2024", "val": 2360, "items": [
+                        {"num": 1, "rt": 18, "txval": 2000, "igst": 0, "cgst": 180, "sgst": 180, "cess": 0}]}]},
+            ],
+            "cdnr": [{"ctin": "27ABCDE1234F1Z5", "nt": [{"ntnum": "CN-1", "val": 100}]}],
+        },
+    },
+}
+
+
+def _write_portal(doc: dict) -> str:
+    f = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8")
+    json.dump(doc, f)
+    f.close()
+    return f.name
+
+
+def test_flattens_suppliers_invoices_items():
+    print("Testing portal JSON flattening...")
+    path = _write_portal(PORTAL_2B)
+    chunk, portal_json.CHUNK_SIZE = portal_json.CHUNK_SIZE, 16  # force values across chunk borders
+    try:
+        invoices = list(iter_portal_invoices(path))
+    finally:
+        portal_json.CHUNK_SIZE = chunk
+        os.remove(path)
+    assert [i.invoice_no for i in invoices] == ["INV-001", "INV-005", "CS-999", "OS-2024-55"]
+    first = invoices[0]
+    assert (first.taxable_value, first.cgst, first.sgst, first.invoice_value) == (10000.0, 900.0, 900.0, 11800.0)
+    assert first.invoice_date == "2024-04-02" and first.party == "Tech Solutions Pvt Ltd"
+    assert (invoices[2].gstin, invoices[2].igst) == ("29XYZPQ5678L1Z1", 900.0)
+    print("✓ Items summed per invoice, 2A and 2B layouts, other sections skipped")
+
+
+def test_reconciles_like_csv():
+    print("Testing portal JSON in reconciliation...")
+    path = _write_portal(PORTAL_2B)
+    try:
+        assert is_portal_json(path)
+        kind, invoices = open_invoices(path)
+        assert kind == GSTR_2B
+        _, register = load_invoices(os.path.join(TEST_DATA, "purchase_register.csv"))
+        result = reconcile(list(invoices), register)
+        assert [(i.invoice_no, i.amount) for i in result.missing_itc] == [("MISSED-INV-88", 900.0)]
+
+        text = parse_file_content(path)
+        assert text.startswith("GSTIN,Trade/Legal Name,Invoice Number") and "  " not in text
+        assert len(text) < len(json.dumps(PORTAL_2B))
+    finally:
+        os.remove(path)
+    print("✓ Same findings as the CSV export; prompt text is flat rows")
+
+
+if __name__ == "__main__":
+    test_flattens_suppliers_invoices_items()
+    test_reconciles_like_csv()
+    print("\nALL TESTS PASSED ✓")
@@ -0,0 +1,196 @@
+"""
+Tests for the LLM resilience layer: retries, circuit breaker and hedging.
+"""
+import sys
+import os
+import asyncio
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.utils.resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    LLMError,
+    LLMUnavailableError,
+    RetryPolicy,
+    call_with_resilience,
+    hedged,
+)
+
+
+def _flaky(failures: int, status_code: int = 503):
+    """Returns a coroutine factory that fails `failures` times, then succeeds."""
+    calls = {"count": 0}
+
+    async def make_call():
+        calls["count"] += 1
+        if calls["count"] <= failures:
+            raise LLMError("boom", status_code=status_code, retryable=status_code != 400)
+        return "ok"
+
+    return make_call, calls
+
+
+def test_retries_transient_errors():
+    print("Testing retry on 503...")
+    make_call, calls = _flaky(2)
+    result = asyncio.run(call_with_resilience(
+        make_call, CircuitBreaker(failure_threshold=5), RetryPolicy(max_attempts=3, base_delay=0.01), LatencyTracker(), budget=5,
+    ))
+    assert result == "ok"
+    assert calls["count"] == 3
+    print("✓ Succeeded on the third attempt")
+
+
+def test_does_not_retry_client_errors():
+    print("Testing no retry on 400...")
+    make_call, calls = _flaky(1, status_code=400)
+    try:
+        asyncio.run(call_with_resilience(
+            make_call, CircuitBreaker(), RetryPolicy(max_attempts=3, base_delay=0.01), LatencyTracker(), budget=5,
+        ))
+        assert False, "Expected LLMError"
+    except LLMError as e:
+        assert e.status_code == 400
+    assert calls["count"] == 1
+    print("✓ Client error raised immediately")
+
+
+def test_breaker_opens_and_fails_fast():
+    print("Testing circuit breaker...")
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    make_call, calls = _flaky(100)
+    try:
+        asyncio.run(call_with_resilience(
+            make_call, breaker, RetryPolicy(max_attempts=5, base_delay=0.01), LatencyTracker(), budget=5,
+        ))
+        assert False, "Expected LLMUnavailableError"
+    except LLMUnavailableError:
+        pass
+    assert breaker.state == "open"
+    assert calls["count"] == 2
+
+    try:
+        asyncio.run(call_with_resilience(make_call, breaker, RetryPolicy(), LatencyTracker(), budget=5))
+        assert False, "Expected LLMUnavailableError"
+    except LLMUnavailableError:
+        pass
+    assert calls["count"] == 2
+    print("✓ Breaker opened after 2 failures and short-circuited the next call")
+
+
+def test_half_open_trial_closes_breaker():
+    print("Testing half-open recovery...")
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+    print("✓ Successful trial closed the breaker")
+
+
+def test_half_open_trial_is_always_released():
+    print("Testing half-open trial release...")
+    # A non-retryable error means the provider answered: the breaker closes
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    make_call, _ = _flaky(1, status_code=400)
+    try:
+        asyncio.run(call_with_resilience(make_call, breaker, RetryPolicy(), LatencyTracker(), budget=5))
+        assert False, "Expected LLMError"
+    except LLMError as e:
+        assert not isinstance(e, LLMUnavailableError)
+    assert breaker.state == "closed" and breaker.allow()
+
+    # A cancelled trial frees the slot for the next one
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    async def stuck():
+        await asyncio.sleep(10)
+
+    async def cancelled():
+        task = asyncio.ensure_future(call_with_resilience(stuck, breaker, RetryPolicy(), LatencyTracker(), budget=5))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(cancelled())
+    assert breaker.state == "half_open" and breaker.allow()
+    print("✓ Trial slot released after a client error and after cancellation")
+
+
+def test_hedged_request_beats_stuck_call():
+    print("Testing hedged requests...")
+    calls = {"count": 0}
+
+    async def make_call():
+        calls["count"] += 1
+        if calls["count"] == 1:
+            await asyncio.sleep(10)  # the stuck request
+            return "slow"
+        return "fast"
+
+    async def run():
+        return await asyncio.wait_for(hedged(make_call, hedge_after=0.05), timeout=2)
+
+    assert asyncio.run(run()) == "fast"
+    assert calls["count"] == 2
+    print("✓ Duplicate request answered while the first one hung")
+
+
+def test_hedged_cancellation_cancels_attempts():
+    print("Testing hedged cancellation...")
+    cancelled = []
+
+    async def make_call():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        # The caller gives up before the hedge fires
+        try:
+            await asyncio.wait_for(hedged(make_call, hedge_after=1.0), timeout=0.05)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(0.01)
+        # Checked inside the loop: asyncio.run() would cancel leftovers anyway
+        return list(cancelled)
+
+    assert asyncio.run(run()) == [True]
+    print("✓ First attempt cancelled along with the caller")
+
+
+def test_latency_budget():
+    print("Testing latency budget...")
+
+    async def make_call():
+        await asyncio.sleep(10)
+
+    try:
+        asyncio.run(call_with_resilience(make_call, CircuitBreaker(), RetryPolicy(), LatencyTracker(), budget=0.05))
+        assert False, "Expected LLMError"
+    except LLMError as e:
+        assert "budget" in str(e)
+    print("✓ Call cut off at the budget")
+
+
+if __name__ == "__main__":
+    test_retries_transient_errors()
+    test_does_not_retry_client_errors()
+    test_breaker_opens_and_fails_fast()
+    test_half_open_trial_closes_breaker()
+    test_half_open_trial_is_always_released()
+    test_hedged_request_beats_stuck_call()
+    test_hedged_cancellation_cancels_attempts()
+    test_latency_budget()
+    print("\nALL TESTS PASSED ✓")
@@ -0,0 +1,101 @@
+"""
+Tests for single-flight coalescing of identical in-flight agent calls.
+"""
+import sys
+import os
+import asyncio
+from unittest.mock import patch
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.utils.single_flight import SingleFlight, input_hash
+
+
+def test_concurrent_identical_calls_share_one_run():
+    print("Testing coalescing...")
+    flight = SingleFlight()
+    calls = {"count": 0}
+
+    async def work():
+        calls["count"] += 1
+        await asyncio.sleep(0.05)
+        return "report"
+
+    async def run():
+        key = ("report", "job-1", input_hash({"rent": 1000}))
+        return await asyncio.gather(*[flight.do(key, work) for _ in range(5)])
+
+    assert asyncio.run(run()) == ["report"] * 5
+    assert calls["count"] == 1
+    assert flight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 4}
+    print("✓ 5 concurrent requests, 1 call")
+
+
+def test_different_keys_and_errors():
+    print("Testing distinct keys and shared errors...")
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        results = await asyncio.gather(
+            flight.do(("a",), fail), flight.do(("a",), fail), flight.do(("b",), fail), return_exceptions=True,
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+        # Finished calls are forgotten, the next one runs again
+        await asyncio.gather(flight.do(("a",), fail), return_exceptions=True)
+
+    asyncio.run(run())
+    assert flight.calls == 3
+    assert flight.coalesced == 1
+    print("✓ Error shared by coalesced callers, keys kept apart")
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    print("Testing cancellation...")
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run():
+        first = asyncio.create_task(flight.do(("k",), work))
+        second = asyncio.create_task(flight.do(("k",), work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "ok"
+    print("✓ Remaining caller still got the result")
+
+
+def test_deduction_agent_coalesces_llm_calls():
+    print("Testing agent integration...")
+    from backend_sme.agents.deduction_agent import run_deduction_agent
+    calls = {"count": 0}
+
+    async def fake_llm(prompt):
+        calls["count"] += 1
+        await asyncio.sleep(0.05)
+        return '{"deductions": [], "estimated_tax_saved": 0}'
+
+    async def run():
+        return await asyncio.gather(*[run_deduction_agent("Date,Description,Debit\n") for _ in range(3)])
+
+    with patch("backend_sme.agents.deduction_agent.call_llm", side_effect=fake_llm):
+        results = asyncio.run(run())
+    assert len(results) == 3
+    assert calls["count"] == 1
+    print("✓ Double-submitted deduction analysis made one LLM call")
+
+
+if __name__ == "__main__":
+    test_concurrent_identical_calls_share_one_run()
+    test_different_keys_and_errors()
+    test_cancelled_caller_does_not_cancel_others()
+    test_deduction_agent_coalesces_llm_calls()
+    print("\nALL TESTS PASSED ✓")
@@ -0,0 +1,83 @@
+"""
+Tests for de-duplication of bank statement rows across overlapping uploads.
+"""
+import sys
+import os
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from backend_sme.deductions.analysis import merge_deductions, prepare_deduction_input
+from backend_sme.deductions.dedup import TransactionDeduplicator, fingerprint
+from backend_sme.deductions.statements import Transaction
+
+HEADER = "Date,Description,Reference,Debit,Credit\n"
+APRIL = [
+    "01-04-2024,AWS EMEA SERVICE,AWS-1,12000.00,\n",
+    "05-04-2024,Chai Point,,100.00,\n",
+    "05-04-2024,Chai Point,,100.00,\n",  # two identical coffees the same day
+    "20-04-2024,Mystery Vendor,M-1,700.00,\n",
+]
+QUARTER = [
+    "20-04-2024,MYSTERY  VENDOR,M-1,700.00,\n",  # same row, other spacing and case
+    "05-04-2024,Chai Point,,100.00,\n",
+    "01-04-2024,AWS EMEA SERVICE,AWS-1,12000.00,\n",
+    "05-04-2024,Chai Point,,100.00,\n",
+    "05-04-2024,Chai Point,,100.00,\n",  # a third coffee only this export has
+    "02-05-2024,AWS EMEA SERVICE,AWS-2,12000.00,\n",
+]
+
+
+def _transaction(i: int, description: str = "Vendor") -> Transaction:
+    return Transaction(f"2024-04-{i % 28 + 1:02d}", f"{description} {i}", f"R-{i}", 100.0 + i, 0.0, "x.csv", i)
+
+
+def _write(folder: str, name: str, rows) -> str:
+    path = os.path.join(folder, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER + "".join(rows))
+    return path
+
+
+def test_fingerprint():
+    print("Testing fingerprints...")
+    row = Transaction("2024-04-01", "Swiggy (Staff Lunch)", "ref-1 ", 1200.0, 0.0, "a.csv", 2)
+    assert fingerprint(row) == fingerprint(row._replace(description="SWIGGY STAFF LUNCH", reference="REF-1", source="b.csv", row=9))
+    assert fingerprint(row) != fingerprint(row._replace(debit=1200.01))
+    assert fingerprint(row) != fingerprint(row._replace(date="2024-04-02"))
+    print("Fingerprints ✓")
+
+
+def test_overlapping_statements_counted_once():
+    print("Testing overlapping uploads...")
+    with tempfile.TemporaryDirectory() as folder:
+        paths = [_write(folder, "april.csv", APRIL), _write(folder, "q1.csv", QUARTER)]
+        prepared = prepare_deduction_input(paths, dictionary=None)
+    assert prepared.stats["statement_rows"] == 6 and prepared.stats["duplicate_rows"] == 4
+    by_title = {item.title: item for item in prepared.deductions}
+    assert by_title["AWS"].amount == 24000.0
+    assert "CHAI POINT,2024-04,3,300.00" in prepared.document
+    assert "MYSTERY VENDOR,2024-04,1,700.00" in prepared.document
+    assert merge_deductions(prepared, [], dictionary=None).duplicate_transactions == 4
+    print("Overlapping uploads ✓")
+
+
+def test_spills_to_disk():
+    print("Testing bounded memory...")
+    with tempfile.TemporaryDirectory() as folder:
+        with TransactionDeduplicator(max_memory=1000, spill_dir=folder) as dedup:
+            first = list(dedup.filter(_transaction(i) for i in range(20000)))
+            second = list(dedup.filter(_transaction(i) for i in reversed(range(10000, 30000))))
+            assert len(first) == 20000 and len(second) == 10000
+            assert dedup.removed == 10000 and dedup.seen.spilled >= 29000
+            assert len(dedup.seen._memory) < 1000 and len(os.listdir(folder)) == 1
+        assert os.listdir(folder) == []
+    print("Bounded memory ✓")
+
+
+if __name__ == "__main__":
+    test_fingerprint()
+    test_overlapping_statements_counted_once()
+    test_spills_to_disk()
+    print("\nALL TESTS PASSED ✓")
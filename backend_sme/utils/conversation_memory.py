@@ -0,0 +1,78 @@
+import os
+from backend_sme.utils.openrouter_llm import call_llm
+from backend_sme.utils.resilience import LLMError
+from backend_sme.utils.tokens import estimate_tokens
+from backend_sme.utils.prompt_registry import prompt_registry
+
+# Number of most recent messages always kept verbatim
+MEMORY_RECENT_MESSAGES = int(os.getenv("MEMORY_RECENT_MESSAGES", "6"))
+# Token budget for the whole history block (summary + verbatim messages)
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1500"))
+# Target size of the rolling summary
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "300"))
+
+NO_HISTORY = "No previous conversation."
+
+
+def format_history(messages: list) -> str:
+    history_text = ""
+    for msg in messages:
+        role = "User" if msg["role"] == "user" else "Assistant"
+        history_text += f"{role}: {msg['content']}\n"
+    return history_text
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else "..." + text[-max_chars:]
+
+
+async def _summarize(previous_summary: str, messages: list) -> str:
+    prompt = prompt_registry.render(
+        "summary_prompt",
+        previous_summary=previous_summary or "None yet.",
+        new_messages=format_history(messages),
+        max_words=int(MEMORY_SUMMARY_TOKENS * 0.75),
+    )
+    try:
+        summary = (await call_llm(prompt)).strip()
+    except LLMError as e:
+        # Keep going without the LLM: fold the raw messages into the summary
+        print(f"Conversation summary failed, using extractive fallback: {e}")
+        summary = f"{previous_summary}\n{format_history(messages)}".strip()
+    return _clip(summary, MEMORY_SUMMARY_TOKENS)
+
+
+async def build_memory_context(session: dict, history: list) -> str:
+    """
+    Renders the conversation context for agent prompts: a rolling summary of
+    older turns followed by the most recent messages verbatim, within
+    MEMORY_TOKEN_BUDGET. `history` ends with the current user message, which
+    is excluded (the agents receive it separately).
+
+    Older messages are folded into the summary incrementally - each message is
+    summarized once and the result is stored in session["memory"], so the
+    cost per turn stays flat however long the conversation gets. Call this
+    once per request and pass the result to every agent.
+    """
+    past = history[:-1]
+    if not past:
+        return NO_HISTORY
+
+    memory = session.setdefault("memory", {"summary": "", "summarized_upto": 0})
+    summarized_upto = min(memory["summarized_upto"], len(past))
+
+    # Keep the newest messages verbatim, shrinking the window if it is over budget
+    summary_budget = MEMORY_SUMMARY_TOKENS if (memory["summary"] or summarized_upto or len(past) > MEMORY_RECENT_MESSAGES) else 0
+    cut = max(summarized_upto, len(past) - MEMORY_RECENT_MESSAGES)
+    while cut < len(past) - 1 and estimate_tokens(format_history(past[cut:])) > MEMORY_TOKEN_BUDGET - summary_budget:
+        cut += 1
+
+    if cut > summarized_upto:
+        memory["summary"] = await _summarize(memory["summary"], past[summarized_upto:cut])
+        memory["summarized_upto"] = cut
+
+    recent_text = _clip(format_history(past[cut:]), MEMORY_TOKEN_BUDGET - summary_budget)
+    if memory["summary"]:
+        return f"Summary of earlier conversation: {memory['summary']}\n\nRecent messages:\n{recent_text}"
+    return recent_text
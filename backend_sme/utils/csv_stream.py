@@ -0,0 +1,168 @@
+import csv
+import os
+import re
+from datetime import date
+from itertools import islice
+from typing import Iterator, List, NamedTuple, Optional
+
+# Rows per batch handed to consumers
+CSV_BATCH_SIZE = int(os.getenv("CSV_BATCH_SIZE", "5000"))
+# Rows read up front to infer column types
+CSV_SNIFF_ROWS = int(os.getenv("CSV_SNIFF_ROWS", "200"))
+
+AMOUNT = "amount"
+DATE = "date"
+TEXT = "text"
+
+_AMOUNT = re.compile(r"^\(?-?[₹$]?\s*-?[\d,]*\.?\d+\)?$")
+_DATE = re.compile(r"^(\d{1,4})[-/.](\d{1,2})[-/.](\d{1,4})$")
+
+
+def parse_amount(value: str) -> Optional[float]:
+    """'1,200.50' -> 1200.5, '(500)' -> -500.0, '' -> None. Raises ValueError otherwise."""
+    cleaned = value.replace(",", "").replace("₹", "").replace("$", "").strip()
+    if not cleaned or cleaned == "-":
+        return None
+    if cleaned.startswith("(") and cleaned.endswith(")"):
+        cleaned = "-" + cleaned[1:-1]
+    return float(cleaned)
+
+
+def parse_date(value: str, dayfirst: bool = True) -> Optional[date]:
+    """
+    Accepts dd-mm-yyyy (or mm-dd-yyyy with dayfirst=False) and yyyy-mm-dd,
+    with - / or . separators. Two-digit years (dd/mm/yy bank exports) are
+    read as 20yy.
+    """
+    value = value.strip()
+    if not value:
+        return None
+    match = _DATE.match(value)
+    if not match:
+        raise ValueError(f"Not a date: {value!r}")
+    a, b, c = (int(part) for part in match.groups())
+    if len(match.group(1)) == 4:
+        return date(a, b, c)
+    if len(match.group(1)) > 2 or len(match.group(3)) not in (2, 4):
+        raise ValueError(f"Not a date: {value!r}")
+    if len(match.group(3)) == 2:
+        c += 2000
+    return date(c, b, a) if dayfirst else date(c, a, b)
+
+
+def _infer(values: List[str]):
+    """Returns (dtype, dayfirst) for a column from sample values."""
+    present = [v.strip() for v in values if v.strip() and v.strip() != "-"]
+    if not present:
+        return TEXT, True
+    if all(_AMOUNT.match(v) for v in present):
+        return AMOUNT, True
+    matches = [_DATE.match(v) for v in present]
+    if all(matches):
+        first = [int(m.group(1)) for m in matches if len(m.group(1)) <= 2]
+        second = [int(m.group(2)) for m in matches if len(m.group(1)) <= 2]
+        # Indian exports are day-first unless the data proves otherwise
+        dayfirst = not (second and max(second) > 12 and max(first) <= 12)
+        return DATE, dayfirst
+    return TEXT, True
+
+
+class RowBatch(NamedTuple):
+    rows: List[tuple]  # values converted per column dtype (float / date / str, None when empty)
+    first_line: int  # line number of rows[0] in the file (the header is line 1)
+
+
+class CSVStream:
+    """
+    Reads a CSV file as typed row batches with bounded memory: only the
+    current batch (and the sniffed prefix, while it is being replayed) is
+    held. Column types are inferred from the first CSV_SNIFF_ROWS rows as
+    amount, date or text; `dtypes` overrides that by header name, e.g. to keep
+    all-digit invoice numbers as text. Values that do not fit the type later
+    in the file become None and are counted in `bad_values`.
+
+        stream = CSVStream(path)
+        for batch in stream:
+            for row in batch.rows: ...
+    """
+
+    def __init__(self, file_path: str, batch_size: int = CSV_BATCH_SIZE, sniff_rows: int = CSV_SNIFF_ROWS,
+                 dtypes: Optional[dict] = None):
+        self.file_path = file_path
+        self.batch_size = batch_size
+        self.sniff_rows = sniff_rows
+        self.header: List[str] = []
+        self.dtypes: List[str] = []
+        self.rows_read = 0
+        self.bad_values = 0
+        self._file = open(file_path, "r", encoding="utf-8-sig", errors="ignore", newline="")
+        self._reader = csv.reader(self._file)
+        self.header = [name.strip() for name in next(self._reader, [])]
+        self._sample = list(islice(self._reader, sniff_rows))
+        overrides = {name.lower(): dtype for name, dtype in (dtypes or {}).items()}
+        self._dayfirst = []
+        for i, name in enumerate(self.header):
+            dtype, dayfirst = _infer([row[i] for row in self._sample if i < len(row)])
+            self.dtypes.append(overrides.get(name.lower(), dtype))
+            self._dayfirst.append(dayfirst)
+
+    def column(self, *names: str) -> Optional[int]:
+        """Index of the first header matching one of `names` (case-insensitive)."""
+        lowered = [name.lower() for name in self.header]
+        for name in names:
+            if name.lower() in lowered:
+                return lowered.index(name.lower())
+        return None
+
+    def _convert(self, row: List[str]) -> tuple:
+        values = []
+        for i, dtype in enumerate(self.dtypes):
+            raw = row[i] if i < len(row) else ""
+            try:
+                if dtype == AMOUNT:
+                    values.append(parse_amount(raw))
+                elif dtype == DATE:
+                    values.append(parse_date(raw, self._dayfirst[i]))
+                else:
+                    values.append(raw.strip())
+            except ValueError:
+                self.bad_values += 1
+                values.append(None)
+        return tuple(values)
+
+    def _rows(self) -> Iterator[List[str]]:
+        sample, self._sample = self._sample, []
+        yield from sample
+        yield from self._reader
+
+    def __iter__(self) -> Iterator[RowBatch]:
+        try:
+            batch, first_line = [], 0
+            for line, row in enumerate(self._rows(), start=2):
+                if not any(cell.strip() for cell in row):
+                    continue
+                if not batch:
+                    first_line = line
+                batch.append(self._convert(row))
+                self.rows_read += 1
+                if len(batch) >= self.batch_size:
+                    yield RowBatch(batch, first_line)
+                    batch = []
+            if batch:
+                yield RowBatch(batch, first_line)
+        finally:
+            self.close()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_csv_batches(file_path: str, batch_size: int = CSV_BATCH_SIZE) -> Iterator[RowBatch]:
+    """Shorthand for iterating CSVStream(file_path) when the header is not needed."""
+    return iter(CSVStream(file_path, batch_size))
@@ -1,12 +1,32 @@
 import os
 import json
 import csv
-import io
+from typing import Optional
 
-def parse_file_content(file_path: str) -> str:
+from backend_sme.gst.portal_json import is_portal_json, portal_rows
+
+# Characters of a single file handed to an LLM prompt (0 = no limit)
+FILE_PARSE_MAX_CHARS = int(os.getenv("FILE_PARSE_MAX_CHARS", "500000"))
+
+
+def _join_rows(reader, max_chars: Optional[int]) -> str:
+    """Joins CSV rows line by line, stopping once max_chars is reached."""
+    lines, size = [], 0
+    for row in reader:
+        line = ",".join(row)
+        if max_chars and size + len(line) > max_chars:
+            lines.append(f"[... truncated after {len(lines)} rows ...]")
+            break
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def parse_file_content(file_path: str, max_chars: Optional[int] = None) -> str:
     """
     Parses file content based on extension and returns a string representation.
-    Supports .txt, .csv, .json, .md.
+    Supports .txt, .csv, .json, .md. CSVs are read row by row and cut at
+    `max_chars`, so large statements never have to fit in memory twice.
     """
     _, ext = os.path.splitext(file_path)
     ext = ext.lower()
@@ -18,15 +38,16 @@ def parse_file_content(file_path: str) -> str:
         
         elif ext == ".csv":
             with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                reader = csv.reader(f)
-                rows = list(reader)
                 # Convert CSV to a readable string format
-                return "\n".join([",".join(row) for row in rows])
+                return _join_rows(csv.reader(f), max_chars)
         
         elif ext == ".json":
+            # Portal GSTR-2B downloads are flattened to invoice rows while streaming
+            if is_portal_json(file_path):
+                return portal_rows(file_path, max_chars)
             with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
                 data = json.load(f)
-                return json.dumps(data, indent=2)
+                return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
         
         # Placeholder for PDF - requires pypdf or similar
         elif ext == ".pdf":
@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))
+# Path of the SQLite file for the on-disk tier. Empty disables it.
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def make_cache_key(model: str, prompt: str) -> str:
+    """
+    Fingerprints a prompt for the given model. Whitespace runs are collapsed
+    so re-indented or re-wrapped copies of the same input share one entry.
+    """
+    normalized = _WHITESPACE.sub(" ", prompt).strip()
+    return hashlib.sha256(f"{model}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier cache for LLM responses: a bounded in-memory LRU in front of an
+    optional SQLite table whose entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_SIZE, db_path: str = LLM_CACHE_DB, ttl: float = LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _remember(self, key: str, response: str):
+        with self._lock:
+            self._memory[key] = response
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        if self.db_path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+            if row and time.time() - row[1] <= self.ttl:
+                self._remember(key, row[0])
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, response: str):
+        self._remember(key, response)
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, created_at) VALUES (?, ?, ?)",
+                    (key, response, time.time()),
+                )
+
+    async def aget(self, key: str) -> Optional[str]:
+        # The disk tier is blocking I/O, keep it off the event loop.
+        if self.db_path:
+            return await asyncio.to_thread(self.get, key)
+        return self.get(key)
+
+    async def aset(self, key: str, response: str):
+        if self.db_path:
+            await asyncio.to_thread(self.set, key, response)
+        else:
+            self.set(key, response)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_enabled": bool(self.db_path),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+llm_cache = LLMCache()
@@ -1,26 +1,146 @@
-import requests
-import os
+import asyncio
 import json
+import os
+
+import httpx
+
+from backend_sme.utils.llm_cache import llm_cache, make_cache_key
+from backend_sme.utils.resilience import (
+    LLM_LATENCY_BUDGET,
+    RETRYABLE_STATUS,
+    CircuitBreaker,
+    LatencyTracker,
+    LLMError,
+    LLMUnavailableError,
+    RetryPolicy,
+    call_with_resilience,
+)
+
+# Connection settings, overridable from the environment.
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "x-ai/grok-4.1-fast:free")
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+# One pooled client and semaphore per event loop. The client keeps connections
+# alive between calls; the semaphore caps how many LLM requests are in flight.
+_client = None
+_semaphore = None
+_loop = None
+
+# Shared across all calls so the breaker sees the provider's overall health.
+breaker = CircuitBreaker()
+retry_policy = RetryPolicy()
+latency_tracker = LatencyTracker()
+
 
-def call_llm(prompt: str):
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_client() -> httpx.AsyncClient:
     """
-    Calls the OpenRouter API with the given prompt.
-    Uses 'x-ai/grok-4.1-fast:free' model with reasoning enabled.
+    Returns the shared AsyncClient, creating it on first use (or when the
+    running event loop has changed, e.g. between asyncio.run() calls).
     """
+    global _client, _semaphore, _loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _loop is not loop:
+        _client = httpx.AsyncClient(
+            base_url=OPENROUTER_BASE_URL,
+            http2=_http2_available(),
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            ),
+        )
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _loop = loop
+    return _client
+
+
+async def close_client():
+    """Closes the shared client. Called on application shutdown."""
+    global _client, _semaphore, _loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _semaphore = None
+    _loop = None
+
+
+def _build_headers() -> dict:
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
         print("Warning: OPENROUTER_API_KEY not found in environment variables.")
-        raise ValueError("OPENROUTER_API_KEY is missing")
+        raise LLMError("OPENROUTER_API_KEY is missing")
 
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
+    return {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
         "HTTP-Referer": "http://localhost:3000",
         "X-Title": "TaxNova SME",
     }
+
+
+async def _post_completion(data: dict, headers: dict) -> str:
+    """Sends one chat completion request and returns the message content."""
+    client = get_client()
+    try:
+        async with _semaphore:
+            response = await client.post("/chat/completions", json=data, headers=headers)
+    except httpx.TransportError as e:
+        # Connect/read timeouts and dropped connections are worth retrying
+        raise LLMError(f"OpenRouter request failed: {e!r}", retryable=True) from e
+
+    if response.status_code >= 400:
+        raise LLMError(
+            f"OpenRouter returned HTTP {response.status_code}: {response.text[:200]}",
+            status_code=response.status_code,
+            retryable=response.status_code in RETRYABLE_STATUS,
+        )
+
+    try:
+        result = response.json()
+        # We return the content. The reasoning details are available in result['choices'][0]['message'].get('reasoning_details')
+        # if we ever need them, but for now the agents expect just the content string.
+        return result["choices"][0]["message"]["content"]
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        raise LLMError(f"Malformed OpenRouter response: {e!r}") from e
+
+
+async def call_llm(prompt: str, use_cache: bool = True, budget: float = LLM_LATENCY_BUDGET) -> str:
+    """
+    Calls the OpenRouter API with the given prompt.
+    Uses 'x-ai/grok-4.1-fast:free' model with reasoning enabled.
+
+    Requests go through a shared keep-alive connection pool and at most
+    LLM_MAX_CONCURRENCY of them run at once; the rest wait their turn without
+    blocking the event loop.
+
+    Successful responses are cached by model + prompt fingerprint. Pass
+    use_cache=False for prompts whose answer should not be reused.
+
+    Transient failures (429/5xx, timeouts) are retried with jittered backoff
+    within `budget` seconds. Raises LLMError when the call cannot succeed, and
+    LLMUnavailableError when the circuit breaker is open.
+    """
+    cache_key = make_cache_key(OPENROUTER_MODEL, prompt) if use_cache else None
+    if cache_key:
+        cached = await llm_cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+    headers = _build_headers()
     data = {
-        "model": "x-ai/grok-4.1-fast:free",
+        "model": OPENROUTER_MODEL,
         "messages": [
             {"role": "user", "content": prompt}
         ],
@@ -28,12 +148,89 @@ def call_llm(prompt: str):
     }
 
     try:
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        result = response.json()
-        # We return the content. The reasoning details are available in result['choices'][0]['message'].get('reasoning_details')
-        # if we ever need them, but for now the agents expect just the content string.
-        return result["choices"][0]["message"]["content"]
-    except Exception as e:
+        content = await call_with_resilience(
+            lambda: _post_completion(data, headers),
+            breaker=breaker,
+            policy=retry_policy,
+            tracker=latency_tracker,
+            budget=budget,
+        )
+    except LLMError as e:
         print(f"Error calling OpenRouter: {e}")
-        return f"Error: {str(e)}"
+        raise
+
+    if cache_key:
+        await llm_cache.aset(cache_key, content)
+    return content
+
+
+async def stream_llm(prompt: str, use_cache: bool = True):
+    """
+    Streaming variant of call_llm: yields content deltas as OpenRouter
+    produces them. A cached answer is yielded as a single chunk.
+
+    Streams are not retried (tokens may already have been forwarded), but
+    failures still count towards the circuit breaker.
+    """
+    cache_key = make_cache_key(OPENROUTER_MODEL, prompt) if use_cache else None
+    if cache_key:
+        cached = await llm_cache.aget(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    headers = _build_headers()
+    if not breaker.allow():
+        raise LLMUnavailableError("LLM circuit breaker is open, failing fast")
+
+    data = {
+        "model": OPENROUTER_MODEL,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "extra_body": {"reasoning": {"enabled": True}},
+        "stream": True,
+    }
+
+    client = get_client()
+    parts = []
+    try:
+        try:
+            async with _semaphore:
+                async with client.stream("POST", "/chat/completions", json=data, headers=headers) as response:
+                    if response.status_code >= 400:
+                        body = await response.aread()
+                        raise LLMError(
+                            f"OpenRouter returned HTTP {response.status_code}: {body[:200]!r}",
+                            status_code=response.status_code,
+                            retryable=response.status_code in RETRYABLE_STATUS,
+                        )
+                    async for line in response.aiter_lines():
+                        # Skip keep-alive comments such as ": OPENROUTER PROCESSING"
+                        if not line.startswith("data:"):
+                            continue
+                        payload = line[len("data:"):].strip()
+                        if payload == "[DONE]":
+                            break
+                        choices = json.loads(payload).get("choices") or [{}]
+                        delta = (choices[0].get("delta") or {}).get("content")
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+        except httpx.TransportError as e:
+            breaker.record_failure()
+            raise LLMError(f"OpenRouter stream failed: {e!r}", retryable=True) from e
+        except LLMError as e:
+            if e.retryable:
+                breaker.record_failure()
+            else:
+                # The provider answered; the request itself was bad
+                breaker.record_success()
+            raise
+
+        breaker.record_success()
+    finally:
+        # Cancelled or closed early by the consumer: free a half-open trial slot
+        breaker.release()
+    if cache_key:
+        await llm_cache.aset(cache_key, "".join(parts))
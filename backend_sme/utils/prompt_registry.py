@@ -0,0 +1,108 @@
+import os
+import re
+import threading
+from bisect import bisect_left
+from backend_sme.utils.tokens import estimate_tokens
+
+PROMPTS_DIR = os.path.join(os.path.dirname(__file__), "../prompts")
+
+# Upper bounds (in estimated tokens) of the prompt size histogram buckets
+PROMPT_TOKEN_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+_PLACEHOLDER = re.compile(r"{{(\w+)}}")
+
+
+class PromptTemplate:
+    """
+    A prompt file split once into literal text and {{placeholder}} slots.
+    Rendering is a single join, so values that happen to contain "{{...}}"
+    (user messages, uploaded files) are never substituted a second time.
+    """
+
+    def __init__(self, name: str, text: str, mtime: float = 0.0):
+        self.name = name
+        self.text = text
+        self.mtime = mtime
+        parts = _PLACEHOLDER.split(text)
+        self.literals = parts[0::2]
+        self.slots = parts[1::2]
+        self.placeholders = frozenset(self.slots)
+
+    def render(self, values: dict) -> str:
+        missing = self.placeholders - values.keys()
+        unknown = values.keys() - self.placeholders
+        if missing or unknown:
+            raise ValueError(
+                f"Prompt '{self.name}' expects {sorted(self.placeholders)}; "
+                f"missing {sorted(missing)}, unknown {sorted(unknown)}"
+            )
+        out = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            out.append(str(values[slot]))
+            out.append(literal)
+        return "".join(out)
+
+
+class PromptSizeStats:
+    """Histogram of rendered prompt sizes (estimated tokens) per prompt name."""
+
+    def __init__(self, buckets: tuple = PROMPT_TOKEN_BUCKETS):
+        self.buckets = buckets
+        self._prompts = {}
+
+    def record(self, name: str, tokens: int):
+        entry = self._prompts.setdefault(name, {"count": 0, "total": 0, "max": 0, "histogram": [0] * (len(self.buckets) + 1)})
+        entry["count"] += 1
+        entry["total"] += tokens
+        entry["max"] = max(entry["max"], tokens)
+        entry["histogram"][bisect_left(self.buckets, tokens)] += 1
+
+    def stats(self) -> dict:
+        labels = [f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            name: {
+                "renders": entry["count"],
+                "avg_tokens": round(entry["total"] / entry["count"]),
+                "max_tokens": entry["max"],
+                "histogram": {label: n for label, n in zip(labels, entry["histogram"]) if n},
+            }
+            for name, entry in self._prompts.items()
+        }
+
+
+class PromptRegistry:
+    """
+    Loads prompts/<name>.txt once and reuses the compiled template. A file is
+    re-read only when its mtime changes, so prompts can be edited on a running
+    server. Every render records its estimated token count.
+    """
+
+    def __init__(self, prompts_dir: str = PROMPTS_DIR):
+        self.prompts_dir = prompts_dir
+        self.size_stats = PromptSizeStats()
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> PromptTemplate:
+        path = os.path.join(self.prompts_dir, f"{name}.txt")
+        mtime = os.stat(path).st_mtime
+        template = self._templates.get(name)
+        if template is None or template.mtime != mtime:
+            with self._lock:
+                template = self._templates.get(name)
+                if template is None or template.mtime != mtime:
+                    with open(path, "r") as f:
+                        template = PromptTemplate(name, f.read(), mtime)
+                    self._templates[name] = template
+        return template
+
+    def render(self, name: str, /, **values) -> str:
+        prompt = self.get(name).render(values)
+        self.size_stats.record(name, estimate_tokens(prompt))
+        return prompt
+
+    def stats(self) -> dict:
+        return self.size_stats.stats()
+
+
+prompt_registry = PromptRegistry()
@@ -0,0 +1,205 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+# Retry / breaker / hedging settings, overridable from the environment.
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_LATENCY_BUDGET = float(os.getenv("LLM_LATENCY_BUDGET", "90"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when an LLM call fails. `retryable` marks transient failures."""
+
+    def __init__(self, message: str, status_code: int = None, retryable: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class LLMUnavailableError(LLMError):
+    """Raised without calling the provider: breaker open or budget spent."""
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+
+    def __init__(self, max_attempts: int = LLM_MAX_ATTEMPTS, base_delay: float = LLM_BACKOFF_BASE, max_delay: float = LLM_BACKOFF_MAX):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures and fails
+    fast for `reset_timeout` seconds. After that a single trial call is let
+    through (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_THRESHOLD, reset_timeout: float = LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Ends a call that recorded no outcome (cancelled, or failed with an
+        unexpected error). A half-open trial counts as a failure so the slot
+        is freed; otherwise nothing changes.
+        """
+        if self._trial_in_flight:
+            self.record_failure()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies, used to pick the hedge delay."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float):
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> dict:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "samples": len(self.samples),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+async def hedged(make_call, hedge_after: float):
+    """
+    Runs make_call(); if it has not finished after `hedge_after` seconds a
+    duplicate is started and whichever succeeds first wins. The loser is
+    cancelled, as are both if the caller is. If both fail, the first error
+    is raised.
+    """
+    pending = {asyncio.ensure_future(make_call())}
+    error = None
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if not done:
+            pending.add(asyncio.ensure_future(make_call()))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        # Also reached when the caller is cancelled (e.g. its deadline passed)
+        for task in pending:
+            task.cancel()
+
+
+async def call_with_resilience(make_call, breaker: CircuitBreaker, policy: RetryPolicy, tracker: LatencyTracker, budget: float = LLM_LATENCY_BUDGET, hedge: bool = LLM_HEDGE_ENABLED):
+    """
+    Calls make_call() with retries on transient LLMErrors, all within a total
+    latency budget, behind the circuit breaker. With hedging on, an attempt
+    that outlives the observed p95 latency gets a duplicate request.
+    """
+    if not breaker.allow():
+        raise LLMUnavailableError("LLM circuit breaker is open, failing fast")
+
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget
+        last_error = None
+
+        for attempt in range(policy.max_attempts):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+
+            started = loop.time()
+            try:
+                p95 = tracker.percentile(0.95) if hedge else None
+                if p95 is not None:
+                    call = hedged(make_call, max(p95, LLM_HEDGE_MIN_DELAY))
+                else:
+                    call = make_call()
+                result = await asyncio.wait_for(call, timeout=remaining)
+            except asyncio.TimeoutError:
+                last_error = LLMError(f"LLM call exceeded the {budget:.0f}s latency budget", retryable=True)
+                breaker.record_failure()
+                break
+            except LLMError as e:
+                last_error = e
+                if not e.retryable:
+                    # The provider answered; the request itself was bad
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if not breaker.allow():
+                    break
+            else:
+                tracker.record(loop.time() - started)
+                breaker.record_success()
+                return result
+
+            if attempt + 1 < policy.max_attempts:
+                await asyncio.sleep(min(policy.delay(attempt), max(0.0, deadline - loop.time())))
+
+        if isinstance(last_error, LLMError) and breaker.state == "open":
+            raise LLMUnavailableError(f"LLM unavailable: {last_error}", status_code=last_error.status_code)
+        raise last_error or LLMUnavailableError("LLM latency budget exhausted")
+    finally:
+        # Never leave a half-open trial slot taken (cancellation, unexpected errors)
+        breaker.release()
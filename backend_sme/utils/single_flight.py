@@ -0,0 +1,46 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Hashable
+
+
+def input_hash(*parts: Any) -> str:
+    """Stable hash of the inputs that determine an operation's result."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight work: while a call for `key` is running,
+    further calls with the same key await the same future instead of starting
+    their own. Nothing is kept once the call finishes (that is the cache's job).
+
+    Keys name the operation and its inputs, e.g. (operation, session id,
+    input_hash(...)); for the agents the prompt hash already covers the
+    session context. The shared call is shielded, so a cancelled caller does
+    not cancel the work for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = asyncio.ensure_future(make_call())
+        self._calls[key] = future
+        future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "calls": self.calls, "coalesced": self.coalesced}
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,47 @@
+import json
+import re
+
+
+def sse_event(event: str, data) -> str:
+    """Formats one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class PartialJSONItems:
+    """
+    Pulls completed objects out of a JSON array while the document is still
+    being streamed, e.g. each finished entry of "deductions": [...] as soon
+    as its closing brace arrives.
+    """
+
+    def __init__(self, key: str):
+        self._start = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        self._decoder = json.JSONDecoder()
+        self.buffer = ""
+        self._pos = None
+
+    def feed(self, text: str) -> list:
+        self.buffer += text
+        if self._pos is None:
+            match = self._start.search(self.buffer)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        items = []
+        buf = self.buffer
+        while True:
+            i = self._pos
+            while i < len(buf) and buf[i] in " \t\r\n,":
+                i += 1
+            self._pos = i
+            if i >= len(buf) or buf[i] == "]":
+                break
+            try:
+                obj, end = self._decoder.raw_decode(buf, i)
+            except json.JSONDecodeError:
+                # Object not complete yet, wait for more text
+                break
+            items.append(obj)
+            self._pos = end
+        return items
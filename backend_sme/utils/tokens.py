@@ -0,0 +1,8 @@
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English/CSV text).
+    Good enough for budgeting prompts without a tokenizer dependency.
+    """
+    if not text:
+        return 0
+    return (len(text) + 3) // 4